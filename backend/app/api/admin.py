@@ -1,9 +1,12 @@
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.session import get_db
-from app.db.crud import admin_crud
+from app.db.crud import admin_crud, compare_crud
 from app.db.schemas import admin as schemas
 from app.core.dependencies import is_admin_user
+from app.services.ingest_pipeline import pipeline_metrics
+from app.utils.async_minio import async_minio
 from uuid import UUID
 from datetime import datetime
 
@@ -147,13 +150,35 @@ async def get_documents(db: AsyncSession = Depends(get_db), current_admin=Depend
             "userId": d.owner_id,
             "uploadedAt": d.uploaded_at,
             "status": "processed",
-            "size": len((d.meta_data or {}).get("text", "")),
+            "size": d.size,
         }
         for d in docs
     ]
     return {"success": True, "data": {"documents": data}}
 
 
+# 6b. GET /api/admin/compare-cache
+@router.get("/compare-cache")
+async def get_compare_cache_stats(
+    db: AsyncSession = Depends(get_db), current_admin=Depends(is_admin_user)
+):
+    stats = await compare_crud.get_cache_stats(db)
+    return {"success": True, "data": {"compareCache": stats}}
+
+
+# 6c. GET /api/admin/storage
+@router.get("/storage")
+async def get_storage_metrics(current_admin=Depends(is_admin_user)):
+    metrics = await asyncio.to_thread(async_minio.metrics)
+    return {"success": True, "data": {"storage": metrics}}
+
+
+# 6d. GET /api/admin/ingestion
+@router.get("/ingestion")
+async def get_ingestion_metrics(current_admin=Depends(is_admin_user)):
+    return {"success": True, "data": {"ingestion": pipeline_metrics.snapshot()}}
+
+
 # 7. GET /api/admin/activity
 @router.get("/activity")
 async def get_activity(current_admin=Depends(is_admin_user)):
@@ -2,7 +2,6 @@
 import uuid
 import time
 from datetime import datetime
-import os
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.session import get_db
@@ -10,23 +9,11 @@ from app.db.crud import chat_crud
 from app.db.schemas.chat import ChatRequest, ChatResponse
 from app.services.rag_pipeline import run_rag_pipeline
 from app.core.security import get_current_user
-from langchain_google_genai import ChatGoogleGenerativeAI
+from app.services.llm_clients import GEMINI_MODEL, get_llm
 from uuid import UUID
-from dotenv import load_dotenv
 
 router = APIRouter(tags=["Chat"])
 
-load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise RuntimeError("❌ GEMINI_API_KEY not found in environment variables.")
-
-gemini = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash",
-    google_api_key=GEMINI_API_KEY,
-    temperature=0.2,
-)
-
 
 # ===========================================================
 # POST /api/chat/query
@@ -45,7 +32,7 @@ async def chat_query(
 
         # Run RAG pipeline (retrieve + generate)
         llm_output, sources = await run_rag_pipeline(
-            request.message, request.document_id, current_user.id, db, llm=gemini
+            request.message, request.document_id, current_user.id, db, llm=get_llm()
         )
 
         # Log chat session and messages
@@ -81,7 +68,7 @@ async def chat_query(
                 "sources": sources,
                 "timestamp": datetime.utcnow().isoformat() + "Z",
                 "metadata": {
-                    "model": "gemini-2.5-flash",
+                    "model": GEMINI_MODEL,
                     "tokens": tokens_used,
                     "processingTime": processing_time,
                 },
@@ -1,19 +1,25 @@
 import uuid
 from datetime import datetime
+import json
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
-from app.db.session import get_db
-from app.db.models import Document
+from sqlalchemy import select
+from app.db.session import AsyncSessionLocal, get_db
+from app.core.config import settings
+from app.db.models import BatchJob, Document
 from app.core.security import get_current_user
-from app.services.compare_service import compare_documents
-from app.services.compare_service import run_document_comparison
+from app.services.compare_service import run_document_comparison, store_result_changes
 from app.db.crud import compare_crud
+from app.services import compare_batch
+from app.utils.pagination import decode_cursor, encode_cursor
+from app.services.artifact_renderer import artifact_renderer, artifact_urls, delete_artifacts
 from app.db.models import Comparison  # assuming you’ll add this model
 from app.db.schemas.compare import (
     CompareHistoryResponse,
     CompareDetailResponse,
     CompareDeleteResponse,
+    CompareChangesResponse,
     CompareBatchRequest,
     CompareBatchResponse,
     ComparisonRequest,
@@ -39,19 +45,95 @@ async def compare_documents_api(
     if not doc1 or not doc2:
         raise HTTPException(status_code=404, detail="One or both documents not found")
 
-    # Run comparison
+    # Run comparison (served from the content cache when possible)
     result = await run_document_comparison(
-        doc1, doc2, request.comparisonType, request.options.dict()
+        doc1, doc2, request.comparisonType, request.options.dict(), db=db
     )
 
+    # Same pair, same options, already in this user's history → reuse the row
+    if result["cached"]:
+        existing = await compare_crud.find_user_comparison(
+            db, current_user.id, doc1.id, doc2.id, result["cacheKey"]
+        )
+        if existing:
+            changes, next_cursor = await compare_crud.list_changes(
+                db, existing.id, limit=settings.COMPARE_CHANGES_PAGE_SIZE
+            )
+            data = {
+                **existing.to_dict(),
+                **(await artifact_urls(existing)),
+                "changes": changes,
+                "changesNextCursor": next_cursor,
+            }
+            return {"success": True, "data": {"comparison": data}}
+
     # Persist
     comparison = await compare_crud.create_comparison(
-        db, current_user.id, doc1.id, doc2.id, request.comparisonType, meta_data=result
+        db,
+        current_user.id,
+        doc1.id,
+        doc2.id,
+        request.comparisonType,
+        meta_data=result,
+        cache_key=result["cacheKey"],
+    )
+    await store_result_changes(db, comparison.id, result)
+    await db.commit()
+    result["id"] = str(comparison.id)
+    result.pop("cacheSource", None)
+
+    # Diff / side-by-side PDFs are rendered in the background
+    artifact_renderer.submit(comparison.id)
+
+    # First page of changes only; the rest via GET /compare/{id}/changes
+    result["changes"], result["changesNextCursor"] = await compare_crud.list_changes(
+        db, comparison.id, limit=settings.COMPARE_CHANGES_PAGE_SIZE
     )
 
     return {"success": True, "data": {"comparison": result}}
 
 
+# ===========================================================
+# 3. GET /api/compare/history
+# ===========================================================
+# Declared before GET /{id} so "history" is not parsed as an id.
+@router.get("/history", response_model=CompareHistoryResponse)
+async def get_comparison_history(
+    cursor: str | None = Query(None, description="nextCursor of the previous page"),
+    limit: int = Query(20, ge=1, le=100),
+    documentId: uuid.UUID | None = None,
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """
+    Get comparison history for the current user, newest first, paginated
+    with a keyset cursor on (createdAt, id).
+    """
+    try:
+        after = decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    comparisons, has_more = await compare_crud.get_comparison_history(
+        db, current_user.id, document_id=documentId, limit=limit, after=after
+    )
+    total_items = await compare_crud.count_comparisons(db, current_user.id, document_id=documentId)
+
+    last = comparisons[-1] if comparisons else None
+    return {
+        "success": True,
+        "data": {
+            "comparisons": [cmp.to_summary() for cmp in comparisons],
+            "pagination": {
+                "limit": limit,
+                "totalItems": total_items,
+                "totalPages": (total_items + limit - 1) // limit,
+                "nextCursor": encode_cursor(last.created_at, last.id) if has_more else None,
+            },
+        },
+    }
+
+
 # ===========================================================
 # 2. GET /api/compare/{id}
 # ===========================================================
@@ -63,55 +145,90 @@ async def get_comparison_result(
     current_user=Depends(get_current_user),
 ):
     """
-    Get comparison results by ID.
+    Get comparison results by ID. With `includeDetails` the first page of
+    changes is included; page on with GET /compare/{id}/changes.
     """
-    q = select(Comparison).where(Comparison.id == id, Comparison.user_id == current_user.id)
+    cmp = await _get_user_comparison(db, id, current_user.id)
+
+    data = {**cmp.to_dict(), **(await artifact_urls(cmp))}
+    if includeDetails:
+        data["changes"], data["changesNextCursor"] = await compare_crud.list_changes(
+            db, cmp.id, limit=settings.COMPARE_CHANGES_PAGE_SIZE
+        )
+    return {"success": True, "data": {"comparison": data}}
+
+
+async def _get_user_comparison(db: AsyncSession, id: uuid.UUID, user_id):
+    q = select(Comparison).where(Comparison.id == id, Comparison.user_id == user_id)
     res = await db.execute(q)
     cmp = res.scalars().first()
     if not cmp:
         raise HTTPException(status_code=404, detail="Comparison not found")
-
-    return {"success": True, "data": {"comparison": cmp.to_dict(includeDetails)}}
+    return cmp
 
 
 # ===========================================================
-# 3. GET /api/compare/history
+# 2b. GET /api/compare/{id}/changes (paged) and /changes/stream (NDJSON)
 # ===========================================================
-@router.get("/history", response_model=CompareHistoryResponse)
-async def get_comparison_history(
-    page: int = Query(1, ge=1),
-    limit: int = Query(20, le=100),
-    documentId: uuid.UUID | None = None,
+@router.get("/{id}/changes", response_model=CompareChangesResponse)
+async def get_comparison_changes(
+    id: uuid.UUID,
+    cursor: int | None = Query(None, ge=0, description="nextCursor of the previous page"),
+    limit: int = Query(None, ge=1),
+    page: int | None = Query(None, ge=1),
+    document: int | None = Query(None, ge=1, le=2),
+    type: str | None = None,
+    category: str | None = None,
+    severity: str | None = None,
     db: AsyncSession = Depends(get_db),
     current_user=Depends(get_current_user),
 ):
     """
-    Get comparison history for the current user.
+    Page through a comparison's changes in result order, optionally filtered
+    by page, document, change type, category or severity.
     """
-    query = select(Comparison).where(Comparison.user_id == current_user.id)
-    if documentId:
-        query = query.where(
-            (Comparison.document_id1 == documentId) | (Comparison.document_id2 == documentId)
-        )
-    result = await db.execute(query.order_by(Comparison.created_at.desc()))
-    comparisons = result.scalars().all()
+    cmp = await _get_user_comparison(db, id, current_user.id)
+    limit = min(limit or settings.COMPARE_CHANGES_PAGE_SIZE, settings.COMPARE_CHANGES_MAX_PAGE_SIZE)
 
-    total_items = len(comparisons)
-    total_pages = (total_items + limit - 1) // limit
-    start = (page - 1) * limit
-    paginated = comparisons[start : start + limit]
+    changes, next_cursor = await compare_crud.list_changes(
+        db,
+        cmp.id,
+        after=cursor,
+        limit=limit,
+        page=page,
+        document=document,
+        type=type,
+        category=category,
+        severity=severity,
+    )
+    return {"success": True, "data": {"changes": changes, "nextCursor": next_cursor}}
 
-    return {
-        "success": True,
-        "data": {
-            "comparisons": [cmp.to_summary() for cmp in paginated],
-            "pagination": {
-                "currentPage": page,
-                "totalPages": total_pages,
-                "totalItems": total_items,
-            },
-        },
-    }
+
+@router.get("/{id}/changes/stream")
+async def stream_comparison_changes(
+    id: uuid.UUID,
+    page: int | None = Query(None, ge=1),
+    document: int | None = Query(None, ge=1, le=2),
+    type: str | None = None,
+    category: str | None = None,
+    severity: str | None = None,
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """
+    All matching changes as NDJSON (one change per line), read from the
+    database in batches so memory stays flat whatever the diff size.
+    """
+    cmp = await _get_user_comparison(db, id, current_user.id)
+    filters = dict(page=page, document=document, type=type, category=category, severity=severity)
+
+    async def lines():
+        # Own session: the request-scoped one is closed before the body is sent
+        async with AsyncSessionLocal() as stream_db:
+            async for change in compare_crud.stream_changes(stream_db, cmp.id, **filters):
+                yield json.dumps(change, default=str) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 
 # ===========================================================
@@ -124,14 +241,11 @@ async def delete_comparison(
     """
     Delete a comparison result.
     """
-    q = select(Comparison).where(Comparison.id == id, Comparison.user_id == current_user.id)
-    res = await db.execute(q)
-    cmp = res.scalars().first()
-    if not cmp:
-        raise HTTPException(status_code=404, detail="Comparison not found")
+    cmp = await _get_user_comparison(db, id, current_user.id)
 
     await db.delete(cmp)
     await db.commit()
+    await delete_artifacts(cmp)
 
     return {
         "success": True,
@@ -150,18 +264,108 @@ async def batch_compare_documents(
 ):
     """
     Compare multiple document pairs in batch mode.
+
+    Identical requests (same pair and type) share one comparison; the work
+    runs in the background — poll GET /compare/batch/{batchId}.
     """
-    comparisons = []
-    batch_id = f"batch_{uuid.uuid4().hex[:10]}"
-    for cmp_req in request.comparisons:
-        cmp_id = f"cmp_{uuid.uuid4().hex[:10]}"
-        comparisons.append({"id": cmp_id, "status": "queued"})
+    if not request.comparisons:
+        raise HTTPException(status_code=400, detail="No comparisons requested")
+    if len(request.comparisons) > settings.COMPARE_BATCH_MAX_PAIRS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch may contain at most {settings.COMPARE_BATCH_MAX_PAIRS} comparisons",
+        )
+
+    # Ownership of every referenced document, in one query
+    requested_ids = {c.documentId1 for c in request.comparisons} | {
+        c.documentId2 for c in request.comparisons
+    }
+    res = await db.execute(
+        select(Document.id).where(
+            Document.id.in_(requested_ids), Document.owner_id == current_user.id
+        )
+    )
+    missing = requested_ids - set(res.scalars().all())
+    if missing:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Documents not found: {', '.join(sorted(str(m) for m in missing))}",
+        )
+
+    distinct_pairs = list(
+        dict.fromkeys((c.documentId1, c.documentId2, c.comparisonType) for c in request.comparisons)
+    )
+
+    batch = BatchJob(
+        user_id=current_user.id,
+        kind=compare_batch.BATCH_KIND,
+        status="queued",
+        options={"comparison": request.options.dict()},
+    )
+    db.add(batch)
+    await db.flush()
+    rows = await compare_crud.create_batch_comparisons(
+        db, current_user.id, batch.id, distinct_pairs
+    )
+
+    compare_batch.compare_batch_runner.submit(batch.id)
+
+    ids = {pair: row.id for pair, row in zip(distinct_pairs, rows)}
+    comparisons = [
+        {
+            "id": str(ids[(c.documentId1, c.documentId2, c.comparisonType)]),
+            "documentId1": str(c.documentId1),
+            "documentId2": str(c.documentId2),
+            "status": "queued",
+        }
+        for c in request.comparisons
+    ]
 
     return {
         "success": True,
         "data": {
-            "batchId": batch_id,
+            "batchId": str(batch.id),
             "comparisons": comparisons,
             "message": "Batch comparison initiated. Check status for updates.",
         },
     }
+
+
+# ===========================================================
+# 6. GET /api/compare/batch/{batch_id}
+# ===========================================================
+@router.get("/batch/{batch_id}", response_model=CompareBatchResponse)
+async def get_batch_compare_status(
+    batch_id: uuid.UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """
+    Status of a batch and of each comparison in it.
+    """
+    batch = await db.get(BatchJob, batch_id)
+    if not batch or batch.user_id != current_user.id or batch.kind != compare_batch.BATCH_KIND:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    comparisons = await compare_crud.get_batch_comparisons(db, batch_id)
+    counts = {}
+    for cmp in comparisons:
+        counts[cmp.status] = counts.get(cmp.status, 0) + 1
+
+    return {
+        "success": True,
+        "data": {
+            "batchId": str(batch.id),
+            "status": batch.status,
+            "createdAt": batch.created_at.isoformat(),
+            "completedAt": batch.completed_at.isoformat() if batch.completed_at else None,
+            "progress": {"total": len(comparisons), **counts},
+            "comparisons": [
+                {
+                    **cmp.to_dict(),
+                    "error": (cmp.meta_data or {}).get("error"),
+                }
+                for cmp in comparisons
+            ],
+        },
+    }
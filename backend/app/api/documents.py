@@ -1,23 +1,69 @@
-from fastapi import APIRouter, Response, UploadFile, File, Depends, HTTPException
-import fitz
+import asyncio
+import hashlib
+from datetime import datetime
+from typing import List
+
+from fastapi import APIRouter, Request, Response, UploadFile, File, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from uuid import UUID
+from uuid import UUID, uuid4
 
 from app.db.session import get_db
 from app.db.models import Document
-from app.db.crud import doc_crud
+from app.db.crud import batch_crud, doc_crud
 from app.core.security import get_current_user
 from app.core.config import settings
 
-from app.processing.extract_content import extract_content
+from app.processing.render_pages import FORMATS
+from app.db.schemas.document import DirectUploadRequest
 from app.services.document_service import process_and_store_document
+from app.services.ingestion import (
+    AWAITING_UPLOAD,
+    BATCH_KIND as INGEST_BATCH_KIND,
+    ingestion_runner,
+    plan_uploads,
+    stage_files,
+    staged_object_name,
+    upload_expired,
+)
+from app.services.page_images import image_etag, page_image_service
+from app.services.revisions import apply_revision, revision_object_name
 
-from app.utils.async_minio import async_minio
+from app.utils.async_minio import STREAM_CHUNK, async_minio
 
 
 router = APIRouter(tags=["Documents"])
 
 
+async def _store_upload(file: UploadFile, object_name: str):
+    """
+    Stream an upload once: SHA-256 + multipart upload to MinIO + a local
+    copy in the blob cache (no whole-file buffer; read it through
+    async_minio.local_copy with the returned ETag). Returns
+    (upload_stream result, sha256).
+    """
+    first_chunk = await file.read(STREAM_CHUNK)
+    if not first_chunk:
+        raise HTTPException(400, "Empty file uploaded")
+
+    hasher = hashlib.sha256()
+
+    async def body():
+        chunk = first_chunk
+        while chunk:
+            hasher.update(chunk)
+            yield chunk
+            chunk = await file.read(STREAM_CHUNK)
+
+    stored = await async_minio.upload_stream(
+        bucket=settings.MINIO_DOCUMENT_BUCKET,
+        object_name=object_name,
+        chunks=body(),
+        content_type=file.content_type,
+        keep_local=True,
+    )
+    return stored, hasher.hexdigest()
+
+
 # ===========================
 # POST /upload
 # ===========================
@@ -28,32 +74,37 @@ async def upload_document(
     current_user=Depends(get_current_user),
 ):
     try:
-        # Read only ONCE
-        file_bytes = await file.read()
-        if not file_bytes:
-            raise HTTPException(400, "Empty file uploaded")
-
-        # Upload to MinIO via async wrapper
         object_name = f"{current_user.id}/{file.filename}"
-        minio_uri = await async_minio.upload_bytes(
-            bucket=settings.MINIO_DOCUMENT_BUCKET,
-            object_name=object_name,
-            data=file_bytes,
-            content_type=file.content_type,
-        )
-
-        # Extract content from bytes (not UploadFile)
-        extracted = extract_content(file_bytes, filename=file.filename)
-
-        # Store in DB
-        doc = await process_and_store_document(
-            db=db,
+        stored, content_hash = await _store_upload(file, object_name)
+        minio_uri = stored["uri"]
+
+        # Stream the local copy through the ingestion pipeline
+        async with async_minio.local_copy(
+            settings.MINIO_DOCUMENT_BUCKET, object_name, stored["etag"]
+        ) as path:
+            if not path:
+                raise HTTPException(500, "Upload failed: stored file not readable")
+            doc = await process_and_store_document(
+                db=db,
+                owner_id=current_user.id,
+                filename=file.filename,
+                path=path,
+                content_type=file.content_type,   
+                size=stored["size"],
+                metadata={"minio_uri": minio_uri},
+                content_hash=content_hash,
+            )
+
+        if doc.meta_data.get("extension") == "pdf":
+            page_image_service.prerender_thumbnails(doc)
+
+        near_duplicates = await doc_crud.find_near_duplicates(
+            db,
             owner_id=current_user.id,
-            filename=file.filename,
-            content=extracted,
-            content_type=file.content_type,   
-            size=len(file_bytes),
-            metadata={"minio_uri": minio_uri},
+            signature=doc.minhash,
+            exclude_id=doc.id,
+            threshold=settings.NEAR_DUPLICATE_THRESHOLD,
+            limit=5,
         )
 
         return {
@@ -65,23 +116,272 @@ async def upload_document(
                 "size": doc.size,
                 "uploaded_at": doc.uploaded_at,
             },
+            "nearDuplicates": near_duplicates,
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload failed: {e}")
 
 
+# ===========================
+# POST /upload/bulk
+# ===========================
+@router.post("/upload/bulk", status_code=202)
+async def bulk_upload(
+    files: List[UploadFile] = File(...),
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """
+    Many files and/or ZIP archives in one request. Each file (or archive
+    entry) is streamed to MinIO, then ingested in the background by the
+    ingestion workers; progress per file at GET /batch/{batchId}.
+    """
+    try:
+        plan = await plan_uploads(files)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    if not plan:
+        raise HTTPException(400, "No files to upload")
+    if len(plan) > settings.UPLOAD_BATCH_MAX_FILES:
+        raise HTTPException(400, f"Too many files (max {settings.UPLOAD_BATCH_MAX_FILES})")
+
+    staged = await stage_files(current_user.id, plan)
+
+    batch, items = await batch_crud.create_batch(
+        db,
+        current_user.id,
+        INGEST_BATCH_KIND,
+        [None] * len(staged),
+        options={"source": "bulk"},
+        errors={i: error for i, (_, error) in enumerate(staged) if error},
+        item_values=[
+            {
+                "result_id": source["documentId"],
+                "meta_data": {k: v for k, v in source.items() if k != "documentId"},
+            }
+            if source
+            else {"meta_data": {"filename": filename}}
+            for (source, _), (filename, *_) in zip(staged, plan)
+        ],
+    )
+
+    await ingestion_runner.enqueue([item.id for item in items if item.status == "queued"])
+
+    return {
+        "success": True,
+        "data": {
+            "batchId": str(batch.id),
+            "files": [
+                {
+                    **item.to_dict(),
+                    "documentId": str(item.result_id) if item.result_id else None,
+                    "filename": item.meta_data["filename"],
+                }
+                for item in items
+            ],
+            "message": "Files queued for ingestion. Poll the batch status endpoint for progress.",
+        },
+    }
+
+
+# ===========================
+# POST /upload-url
+# ===========================
+@router.post("/upload-url")
+async def create_upload_urls(
+    req: DirectUploadRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """
+    Presigned POST forms for uploading files straight to MinIO. The browser
+    posts each file to its `uploadUrl` with `fields`, then calls `completeUrl`;
+    ingestion runs in the background (progress at GET /batch/{batchId}).
+    """
+    if not req.files:
+        raise HTTPException(400, "files must not be empty")
+    if len(req.files) > settings.UPLOAD_BATCH_MAX_FILES:
+        raise HTTPException(400, f"Too many files (max {settings.UPLOAD_BATCH_MAX_FILES})")
+
+    max_bytes = settings.UPLOAD_MAX_MB * 1024 * 1024
+    for f in req.files:
+        if f.size is not None and f.size > max_bytes:
+            raise HTTPException(413, f"{f.filename} exceeds {settings.UPLOAD_MAX_MB} MB")
+
+    document_ids = [uuid4() for _ in req.files]
+    sources = [
+        {
+            "objectName": staged_object_name(current_user.id, doc_id, f.filename),
+            "filename": f.filename,
+            "contentType": f.contentType,
+        }
+        for doc_id, f in zip(document_ids, req.files)
+    ]
+
+    batch, items = await batch_crud.create_batch(
+        db,
+        current_user.id,
+        INGEST_BATCH_KIND,
+        [None] * len(req.files),
+        options={"source": "direct"},
+        item_values=[
+            {"status": AWAITING_UPLOAD, "result_id": doc_id, "meta_data": source}
+            for doc_id, source in zip(document_ids, sources)
+        ],
+    )
+
+    expires = settings.DIRECT_UPLOAD_EXPIRES_SECONDS
+    forms = await asyncio.gather(
+        *[
+            async_minio.generate_presigned_post(
+                settings.MINIO_DOCUMENT_BUCKET,
+                source["objectName"],
+                source["contentType"],
+                max_bytes,
+                expires,
+            )
+            for source in sources
+        ]
+    )
+    if not all(forms):
+        raise HTTPException(500, "Failed generating upload URLs")
+
+    return {
+        "success": True,
+        "data": {
+            "batchId": str(batch.id),
+            "expiresIn": expires,
+            "uploads": [
+                {
+                    "documentId": str(doc_id),
+                    "filename": source["filename"],
+                    "uploadUrl": form["url"],
+                    "fields": form["fields"],
+                    "completeUrl": f"/api/documents/{doc_id}/complete",
+                }
+                for doc_id, source, form in zip(document_ids, sources, forms)
+            ],
+        },
+    }
+
+
+# ===========================
+# POST /{id}/complete
+# ===========================
+@router.post("/{id}/complete", status_code=202)
+async def complete_upload(
+    id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """Confirm a direct upload and queue it for ingestion (idempotent)."""
+    item = await batch_crud.get_item_by_result(db, current_user.id, INGEST_BATCH_KIND, id)
+    if not item:
+        raise HTTPException(404, "Upload not found")
+
+    if item.status == AWAITING_UPLOAD:
+        if upload_expired(item):
+            await batch_crud.transition_item(
+                db, item.id, AWAITING_UPLOAD, status="failed", progress=100, error="Upload expired"
+            )
+            await batch_crud.refresh_batch_status(db, item.batch_id)
+            raise HTTPException(410, "Upload expired")
+
+        stat = await async_minio.stat_object(
+            settings.MINIO_DOCUMENT_BUCKET, item.meta_data["objectName"]
+        )
+        if not stat:
+            raise HTTPException(409, "File has not been uploaded yet")
+
+        if await batch_crud.transition_item(db, item.id, AWAITING_UPLOAD, status="queued"):
+            await batch_crud.refresh_batch_status(db, item.batch_id)
+            await ingestion_runner.enqueue([item.id])
+        await db.refresh(item)
+
+    return {
+        "success": True,
+        "data": {
+            "documentId": str(id),
+            "batchId": str(item.batch_id),
+            "status": item.status,
+            "error": item.error,
+        },
+    }
+
+
+# ===========================
+# GET /batch/{batch_id}
+# ===========================
+@router.get("/batch/{batch_id}")
+async def get_upload_batch(
+    batch_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    batch = await batch_crud.get_batch(db, batch_id, current_user.id)
+    if not batch or batch.kind != INGEST_BATCH_KIND:
+        raise HTTPException(404, "Batch not found")
+
+    files = [
+        {
+            **item.to_dict(),
+            "documentId": str(item.result_id) if item.result_id else None,
+            "filename": (item.meta_data or {}).get("filename"),
+        }
+        for item in batch.items
+    ]
+    counts = {}
+    for f in files:
+        counts[f["status"]] = counts.get(f["status"], 0) + 1
+
+    return {
+        "success": True,
+        "data": {
+            "batchId": str(batch.id),
+            "status": batch.status,
+            "createdAt": batch.created_at.isoformat() + "Z",
+            "completedAt": batch.completed_at.isoformat() + "Z" if batch.completed_at else None,
+            "progress": {
+                "total": len(files),
+                "completed": counts.get("completed", 0),
+                "failed": counts.get("failed", 0),
+                "percent": round(sum(f["progress"] for f in files) / len(files), 1) if files else 0,
+                "byStatus": counts,
+            },
+            "files": files,
+        },
+    }
+
+
 # ===========================
 # GET /list
 # ===========================
 @router.get("/list")
 async def list_documents(
-    limit: int = 20,
-    offset: int = 0,
+    limit: int = Query(20, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    tags: List[str] = Query(None, description="Repeat for several tags"),
+    tagMatch: str = Query("all", pattern="^(all|any)$"),
+    contentType: str | None = None,
+    uploadedFrom: datetime | None = None,
+    uploadedTo: datetime | None = None,
     db: AsyncSession = Depends(get_db),
     current_user=Depends(get_current_user),
 ):
-    docs = await doc_crud.get_user_documents(db, user_id=current_user.id, limit=limit, offset=offset)
+    docs = await doc_crud.get_user_documents(
+        db,
+        user_id=current_user.id,
+        limit=limit,
+        offset=offset,
+        tags=tags,
+        match_all_tags=tagMatch == "all",
+        content_type=contentType,
+        uploaded_from=uploadedFrom,
+        uploaded_to=uploadedTo,
+    )
 
     return {
         "success": True,
@@ -91,7 +391,8 @@ async def list_documents(
                 "filename": doc.filename,
                 "mimeType": doc.content_type,
                 "uploadedAt": doc.uploaded_at.isoformat() if doc.uploaded_at else None,
-                "summary": (doc.meta_data or {}).get("summary"),
+                "summary": doc.summary,
+                "tags": doc.tags or [],
                 # "extractedText": (doc.meta_data or {}).get("text"),
                 "status": "completed",  # customizable
                 "downloadUrl": f"/api/documents/{doc.id}/download",
@@ -118,7 +419,43 @@ async def get_document(
         "mimeType": doc.content_type,
         "uploadedAt": doc.uploaded_at,
         "metadata": doc.meta_data,
-        "content": doc.content,
+        "pageCount": doc.page_count,
+        "revision": doc.revision or 1,
+        "pagesUrl": f"/api/documents/{doc.id}/pages",
+    }
+
+
+# ===========================
+# GET /{id}/pages
+# ===========================
+@router.get("/{id}/pages")
+async def get_document_pages(
+    id: UUID,
+    first: int = Query(1, alias="from", ge=1),
+    last: int | None = Query(None, alias="to", ge=1),
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """Extracted text of pages `from`..`to` (inclusive), loaded on demand."""
+    doc = await doc_crud.get_document_by_id(db, id)
+    if not doc or doc.owner_id != current_user.id:
+        raise HTTPException(404, "Document not found")
+
+    max_last = first + settings.DOCUMENT_PAGES_MAX_RANGE - 1
+    last = min(last or max_last, max_last)
+    if last < first:
+        raise HTTPException(400, "`to` must be greater than or equal to `from`")
+
+    rows = await doc_crud.get_pages(db, id, first, last)
+    return {
+        "success": True,
+        "data": {
+            "documentId": str(doc.id),
+            "pageCount": doc.page_count,
+            "from": first,
+            "to": last,
+            "pages": [{"page": page, "content": content} for page, content in rows],
+        },
     }
 
 
@@ -140,6 +477,116 @@ async def update_document(
     return {"success": True, "updated": updated}
 
 
+# ===========================
+# PUT /{id}/content
+# ===========================
+@router.put("/{id}/content")
+async def update_document_content(
+    id: UUID,
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """
+    Upload a new revision of a document's file. Only pages whose text
+    changed are rewritten and only new chunks are embedded; vectors of
+    unchanged chunks are kept and those of removed chunks deleted. History
+    at GET /{id}/revisions.
+    """
+    doc = await doc_crud.get_document_by_id(db, id)
+    if not doc or doc.owner_id != current_user.id:
+        raise HTTPException(404, "Document not found")
+
+    bucket = settings.MINIO_DOCUMENT_BUCKET
+    object_name = revision_object_name(current_user.id, doc.id, file.filename)
+    try:
+        stored, content_hash = await _store_upload(file, object_name)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Upload failed: {e}")
+
+    if content_hash == doc.content_hash:
+        await async_minio.delete_object(bucket, object_name)
+        return {
+            "success": True,
+            "data": {"documentId": str(doc.id), "revision": doc.revision or 1, "unchanged": True},
+        }
+
+    try:
+        async with async_minio.local_copy(bucket, object_name, stored["etag"]) as path:
+            if not path:
+                raise RuntimeError("stored file not readable")
+            result = await apply_revision(
+                db,
+                doc.id,
+                {
+                    "filename": file.filename,
+                    "content_type": file.content_type,
+                    "path": path,
+                    "size": stored["size"],
+                    "content_hash": content_hash,
+                    "minio_uri": stored["uri"],
+                },
+            )
+    except Exception as e:
+        await async_minio.delete_object(bucket, object_name)
+        if isinstance(e, LookupError):
+            raise HTTPException(404, str(e))
+        if isinstance(e, ValueError):
+            raise HTTPException(400, str(e))
+        raise HTTPException(status_code=500, detail=f"Revision failed: {e}")
+
+    doc = result["document"]
+    if doc.meta_data.get("extension") == "pdf":
+        page_image_service.prerender_thumbnails(doc)
+
+    return {
+        "success": True,
+        "data": {
+            "documentId": str(doc.id),
+            "revision": result["revision"],
+            "filename": doc.filename,
+            "pageCount": doc.page_count,
+            "changes": result["changes"],
+        },
+    }
+
+
+# ===========================
+# GET /{id}/revisions
+# ===========================
+@router.get("/{id}/revisions")
+async def list_document_revisions(
+    id: UUID, db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)
+):
+    doc = await doc_crud.get_document_by_id(db, id)
+    if not doc or doc.owner_id != current_user.id:
+        raise HTTPException(404, "Document not found")
+
+    revisions = await doc_crud.get_revisions(db, id)
+    return {
+        "success": True,
+        "data": {
+            "documentId": str(doc.id),
+            "revision": doc.revision or 1,
+            "revisions": [
+                {
+                    "revision": r.revision,
+                    "filename": r.filename,
+                    "mimeType": r.content_type,
+                    "size": r.size,
+                    "contentHash": r.content_hash,
+                    "pageCount": r.page_count,
+                    "changes": r.changes,
+                    "createdAt": r.created_at,
+                }
+                for r in revisions
+            ],
+        },
+    }
+
+
 # ===========================
 # DELETE /{id}
 # ===========================
@@ -190,6 +637,41 @@ async def download_document(
     }
 
 
+# ===========================
+# GET /{id}/near-duplicates
+# ===========================
+@router.get("/{id}/near-duplicates")
+async def get_near_duplicates(
+    id: UUID,
+    threshold: float = Query(None, ge=0.0, le=1.0),
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """
+    Existing documents that are almost the same as this one (re-scans,
+    re-exports), via the MinHash LSH index — no scan over the whole corpus.
+    """
+    doc = await doc_crud.get_document_by_id(db, id)
+    if not doc or doc.owner_id != current_user.id:
+        raise HTTPException(404, "Document not found")
+
+    if doc.minhash is None:
+        # Stored before signatures existed; the startup backfill computes it
+        raise HTTPException(409, "Document has no similarity signature yet")
+
+    matches = await doc_crud.find_near_duplicates(
+        db,
+        owner_id=current_user.id,
+        signature=doc.minhash,
+        exclude_id=doc.id,
+        threshold=settings.NEAR_DUPLICATE_THRESHOLD if threshold is None else threshold,
+        limit=limit,
+    )
+
+    return {"success": True, "data": {"documentId": str(doc.id), "nearDuplicates": matches}}
+
+
 # ===========================
 # GET /{id}/page/{page}/image
 # ===========================
@@ -197,11 +679,16 @@ async def download_document(
 async def get_pdf_page_image(
     id: UUID,
     page: int,
+    request: Request,
+    dpi: int = Query(None, ge=24, le=300),
+    format: str = Query("png", pattern="^(png|webp)$"),
+    thumbnail: bool = Query(False, description="Pre-rendered low-DPI thumbnail"),
     db: AsyncSession = Depends(get_db),
     current_user=Depends(get_current_user),
 ):
     """
-    Returns a PDF page as an image (PNG). Useful for citation previews or rendering pages.
+    Returns a PDF page as an image (PNG or WebP). Useful for citation previews or rendering pages.
+    Images are cached server-side and carry an ETag so browsers can revalidate for free.
     """
 
     # 1️⃣ Validate document
@@ -212,36 +699,25 @@ async def get_pdf_page_image(
     if doc.content_type not in ("application/pdf", "pdf"):
         raise HTTPException(400, "Document is not a PDF")
 
-    # 2️⃣ Get MinIO reference
-    minio_uri = (doc.meta_data or {}).get("minio_uri")
-    if not minio_uri:
-        raise HTTPException(400, "Document storage reference missing")
+    if doc.page_count and not 1 <= page <= doc.page_count:
+        raise HTTPException(400, f"Page {page} out of range. PDF has {doc.page_count} pages.")
 
-    bucket, object_name = minio_uri.split("/", 1)
-
-    # 3️⃣ Download file bytes from MinIO
-    # pdf_bytes = await async_minio.get_object_bytes(bucket, object_name)
-    pdf_bytes = await async_minio.download_bytes(bucket, object_name)
+    if thumbnail:
+        dpi, format = settings.PAGE_THUMBNAIL_DPI, settings.PAGE_THUMBNAIL_FORMAT
+    dpi = dpi or settings.PAGE_IMAGE_DEFAULT_DPI
 
-    if not pdf_bytes:
-        raise HTTPException(500, "Failed retrieving document from storage")
+    # 2️⃣ Browser already has it
+    etag = image_etag(doc.id, page, dpi, format, doc.revision)
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=86400, immutable"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
 
-    # 4️⃣ Open and render specific page
+    # 3️⃣ Memory → disk → MinIO → render
     try:
-        pdf = fitz.open(stream=pdf_bytes, filetype="pdf")
-
-        # Fix page indexing (API expects 1-based, PyMuPDF uses 0-based)
-        page_index = page - 1
-
-        if page_index < 0 or page_index >= len(pdf):
-            raise HTTPException(400, f"Page {page} out of range. PDF has {len(pdf)} pages.")
-
-        page_obj = pdf[page_index]
-        pix = page_obj.get_pixmap(dpi=150)  # good quality
-
-        img_bytes = pix.tobytes("png")
-
-        return Response(content=img_bytes, media_type="image/png")
-
+        img_bytes = await page_image_service.get_image(doc, page, dpi, format)
+    except (LookupError, ValueError) as e:  # page out of range, missing source, bad format
+        raise HTTPException(400, str(e))
     except Exception as e:
         raise HTTPException(500, f"Failed to render page: {e}")
+
+    return Response(content=img_bytes, media_type=FORMATS[format], headers=headers)
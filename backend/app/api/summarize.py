@@ -1,12 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 from app.db.session import get_db
+from app.core.config import settings
 from app.core.security import get_current_user
+from app.db.crud import batch_crud
 from app.db.models import Document
 from app.db.models import Summary
-from app.db.schemas.summary import SummaryCreateRequest, SummaryResponse
+from app.db.schemas.summary import (
+    SummaryBatchRequest,
+    SummaryCreateRequest,
+    SummaryOptions,
+    SummaryResponse,
+)
 from app.services.summarizer import generate_summary
+from app.services.summary_batch import BATCH_KIND, summary_batch_runner
 from typing import List
 import uuid
 
@@ -123,28 +132,96 @@ async def delete_summary(
 # -------------------------
 @router.post("/batch", response_model=dict)
 async def batch_summarize(
-    req: dict, db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)
+    req: SummaryBatchRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user),
 ):
-    now = datetime.utcnow()
-    batch_id = f"batch_{uuid.uuid4().hex[:10]}"
-    docs = req.get("documentIds", [])
-    summaries = []
-
-    for i, doc_id in enumerate(docs):
-        summaries.append(
-            {
-                "documentId": doc_id,
-                "status": "queued",
-                "estimatedCompletionTime": (now + timedelta(minutes=i + 2)).isoformat() + "Z",
-            }
+    if not req.documentIds:
+        raise HTTPException(status_code=400, detail="documentIds must not be empty")
+    if len(req.documentIds) > settings.SUMMARY_BATCH_MAX_DOCUMENTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch too large (max {settings.SUMMARY_BATCH_MAX_DOCUMENTS} documents)",
+        )
+
+    # Validate ownership in one query instead of one lookup per document
+    parsed_ids = []
+    for doc_id in req.documentIds:
+        try:
+            parsed_ids.append(uuid.UUID(str(doc_id)))
+        except ValueError:
+            parsed_ids.append(None)
+
+    result = await db.execute(
+        select(Document.id).where(
+            Document.id.in_([d for d in parsed_ids if d]),
+            Document.owner_id == current_user.id,
         )
+    )
+    owned = set(result.scalars().all())
+
+    errors = {
+        i: "Document not found" for i, doc_id in enumerate(parsed_ids) if doc_id not in owned
+    }
+    options = (req.options or SummaryOptions(length="medium", style="executive")).dict()
+
+    batch, items = await batch_crud.create_batch(
+        db,
+        current_user.id,
+        BATCH_KIND,
+        [d if d in owned else None for d in parsed_ids],
+        options=options,
+        errors=errors,
+    )
+
+    await summary_batch_runner.enqueue([item.id for item in items if item.status == "queued"])
+
+    return {
+        "success": True,
+        "data": {
+            "batchId": str(batch.id),
+            "summaries": [
+                {**item.to_dict(), "documentId": req.documentIds[item.position]}
+                for item in items
+            ],
+            "message": "Batch summarization queued. Poll the batch status endpoint for progress.",
+        },
+    }
+
+
+# -------------------------
+# 5b. GET /api/summarize/batch/:batchId
+# -------------------------
+@router.get("/batch/{batch_id}", response_model=dict)
+async def get_batch_status(
+    batch_id: uuid.UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    batch = await batch_crud.get_batch(db, batch_id, current_user.id)
+    if not batch or batch.kind != BATCH_KIND:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    items = [item.to_dict() for item in batch.items]
+    counts = {}
+    for item in items:
+        counts[item["status"]] = counts.get(item["status"], 0) + 1
 
     return {
         "success": True,
         "data": {
-            "batchId": batch_id,
-            "summaries": summaries,
-            "message": "Batch summarization initiated. Check individual document summaries for updates.",
+            "batchId": str(batch.id),
+            "status": batch.status,
+            "createdAt": batch.created_at.isoformat() + "Z",
+            "completedAt": batch.completed_at.isoformat() + "Z" if batch.completed_at else None,
+            "progress": {
+                "total": len(items),
+                "completed": counts.get("completed", 0),
+                "failed": counts.get("failed", 0),
+                "percent": round(sum(i["progress"] for i in items) / len(items), 1) if items else 0,
+                "byStatus": counts,
+            },
+            "summaries": items,
         },
     }
 
@@ -27,6 +27,8 @@ class Settings(BaseSettings):
     OPENAI_EMBEDDING_MODEL: str = "text-embedding-3-small"
 
     HUGGINGFACE_EMBEDDING_MODEL: str = os.getenv("HUGGINGFACE_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+    # Window used when the embedding model does not report its own
+    EMBEDDING_MAX_TOKENS: int = int(os.getenv("EMBEDDING_MAX_TOKENS", 256))
     HUGGINGFACE_EMBEDDING_DIM: int = os.getenv("HUGGINGFACE_EMBEDDING_DIM", 384)
 
     VECTOR_DB_PATH: str = "./app/data/faiss_index"
@@ -42,6 +44,61 @@ class Settings(BaseSettings):
 
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://redis:6379/0")
 
+    # LLM throughput (shared by every Gemini call in the process)
+    LLM_REQUESTS_PER_MINUTE: int = int(os.getenv("LLM_REQUESTS_PER_MINUTE", 60))
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+
+    # Batch summarization
+    SUMMARY_BATCH_WORKERS: int = int(os.getenv("SUMMARY_BATCH_WORKERS", 4))
+    SUMMARY_BATCH_GROUP_SIZE: int = int(os.getenv("SUMMARY_BATCH_GROUP_SIZE", 16))
+    SUMMARY_BATCH_MAX_DOCUMENTS: int = int(os.getenv("SUMMARY_BATCH_MAX_DOCUMENTS", 5000))
+
+    # Summarizer context
+    SUMMARY_CONTEXT_TOKENS: int = int(os.getenv("SUMMARY_CONTEXT_TOKENS", 6000))
+    SUMMARY_TOC_MAX_SECTIONS: int = int(os.getenv("SUMMARY_TOC_MAX_SECTIONS", 12))
+    SUMMARY_TOC_HITS_PER_SECTION: int = int(os.getenv("SUMMARY_TOC_HITS_PER_SECTION", 3))
+    SUMMARY_TOC_FOLLOWING_CHUNKS: int = int(os.getenv("SUMMARY_TOC_FOLLOWING_CHUNKS", 2))
+
+    # CPU worker processes (diffs, rendering)
+    PROCESS_POOL_WORKERS: int = int(
+        os.getenv("PROCESS_POOL_WORKERS", max((os.cpu_count() or 2) - 1, 1))
+    )
+    COMPARE_PAGES_PER_TASK: int = int(os.getenv("COMPARE_PAGES_PER_TASK", 25))
+
+    # Comparison change paging
+    COMPARE_CHANGES_PAGE_SIZE: int = int(os.getenv("COMPARE_CHANGES_PAGE_SIZE", 200))
+    COMPARE_CHANGES_MAX_PAGE_SIZE: int = int(os.getenv("COMPARE_CHANGES_MAX_PAGE_SIZE", 1000))
+
+    # Comparison cache: entries unused this long, or beyond the most recent N, are evicted
+    COMPARE_CACHE_MAX_ENTRIES: int = int(os.getenv("COMPARE_CACHE_MAX_ENTRIES", 100000))
+    COMPARE_CACHE_MAX_AGE_DAYS: int = int(os.getenv("COMPARE_CACHE_MAX_AGE_DAYS", 30))
+
+    # Comparison artifacts (diff / side-by-side PDFs)
+    ARTIFACT_RENDER_CONCURRENCY: int = int(os.getenv("ARTIFACT_RENDER_CONCURRENCY", 2))
+
+    # Batch comparison
+    COMPARE_BATCH_CONCURRENCY: int = int(os.getenv("COMPARE_BATCH_CONCURRENCY", 4))
+    COMPARE_BATCH_MAX_PAIRS: int = int(os.getenv("COMPARE_BATCH_MAX_PAIRS", 1000))
+
+    # Rendered page images (GET /documents/{id}/page/{page}/image)
+    PAGE_RENDER_WORKERS: int = int(os.getenv("PAGE_RENDER_WORKERS", 4))
+    PAGE_IMAGE_MEMORY_CACHE_MB: int = int(os.getenv("PAGE_IMAGE_MEMORY_CACHE_MB", 128))
+    PAGE_IMAGE_CACHE_DIR: str = os.getenv("PAGE_IMAGE_CACHE_DIR", "/tmp/page-image-cache")
+    PAGE_IMAGE_DISK_CACHE_MB: int = int(os.getenv("PAGE_IMAGE_DISK_CACHE_MB", 2048))
+    PAGE_IMAGE_DEFAULT_DPI: int = int(os.getenv("PAGE_IMAGE_DEFAULT_DPI", 150))
+    PAGE_THUMBNAIL_DPI: int = int(os.getenv("PAGE_THUMBNAIL_DPI", 36))
+    PAGE_THUMBNAIL_FORMAT: str = os.getenv("PAGE_THUMBNAIL_FORMAT", "png")
+    PAGE_THUMBNAIL_MAX_PAGES: int = int(os.getenv("PAGE_THUMBNAIL_MAX_PAGES", 500))
+
+    # GET /documents/{id}/pages
+    DOCUMENT_PAGES_MAX_RANGE: int = int(os.getenv("DOCUMENT_PAGES_MAX_RANGE", 100))
+
+    # Near-duplicate detection (estimated Jaccard on MinHash signatures)
+    NEAR_DUPLICATE_THRESHOLD: float = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", 0.8))
+
+    # Startup backfills of rows stored by earlier versions (documents per transaction)
+    BACKFILL_BATCH_SIZE: int = int(os.getenv("BACKFILL_BATCH_SIZE", 50))
+
     # MinIO Credentials
     MINIO_ENDPOINT: str = os.getenv("MINIO_ENDPOINT", "minio:9000")
     MINIO_ACCESS_KEY: str = os.getenv("MINIO_ACCESS_KEY", "minioadmin")
@@ -51,6 +108,34 @@ class Settings(BaseSettings):
     MINIO_DOCUMENT_BUCKET: str = os.getenv("MINIO_DOCUMENT_BUCKET", "documents")
     MINIO_SUMMARY_BUCKET: str = os.getenv("MINIO_SUMMARY_BUCKET", "summaries")
     MINIO_COMPARISON_BUCKET: str = os.getenv("MINIO_COMPARISON_BUCKET", "comparisons")
+    MINIO_PAGE_IMAGE_BUCKET: str = os.getenv("MINIO_PAGE_IMAGE_BUCKET", "page-images")
+
+    # Persistent S3 clients
+    MINIO_MAX_POOL_CONNECTIONS: int = int(os.getenv("MINIO_MAX_POOL_CONNECTIONS", 50))
+    MINIO_TCP_KEEPALIVE: bool = os.getenv("MINIO_TCP_KEEPALIVE", "true").lower() == "true"
+
+    # Streaming uploads: S3 multipart part size (minimum 5 MB)
+    MINIO_UPLOAD_PART_MB: int = max(int(os.getenv("MINIO_UPLOAD_PART_MB", 8)), 5)
+
+    # Direct (browser → MinIO) uploads and ingestion workers
+    UPLOAD_MAX_MB: int = int(os.getenv("UPLOAD_MAX_MB", 512))
+    UPLOAD_BATCH_MAX_FILES: int = int(os.getenv("UPLOAD_BATCH_MAX_FILES", 500))
+    DIRECT_UPLOAD_EXPIRES_SECONDS: int = int(os.getenv("DIRECT_UPLOAD_EXPIRES_SECONDS", 900))
+    UPLOAD_STAGE_CONCURRENCY: int = int(os.getenv("UPLOAD_STAGE_CONCURRENCY", 4))
+    INGEST_WORKERS: int = int(os.getenv("INGEST_WORKERS", 4))
+    INGEST_GROUP_SIZE: int = int(os.getenv("INGEST_GROUP_SIZE", 16))
+
+    # Streaming ingestion pipeline: bounded queues between stages (pages →
+    # chunks → vectors → Qdrant) cap memory per running group
+    INGEST_PAGE_QUEUE: int = int(os.getenv("INGEST_PAGE_QUEUE", 32))
+    INGEST_CHUNK_QUEUE: int = int(os.getenv("INGEST_CHUNK_QUEUE", 512))
+    INGEST_VECTOR_QUEUE: int = int(os.getenv("INGEST_VECTOR_QUEUE", 512))
+    EMBED_BATCH_SIZE: int = int(os.getenv("EMBED_BATCH_SIZE", 64))
+    QDRANT_WRITE_BATCH: int = int(os.getenv("QDRANT_WRITE_BATCH", 256))
+
+    # Local disk cache of downloaded objects (source documents)
+    MINIO_BLOB_CACHE_DIR: str = os.getenv("MINIO_BLOB_CACHE_DIR", "/tmp/minio-blob-cache")
+    MINIO_BLOB_CACHE_MB: int = int(os.getenv("MINIO_BLOB_CACHE_MB", 4096))
 
     # ✅ NEW — Needed for browser access
     MINIO_INTERNAL_ENDPOINT: str = os.getenv("MINIO_INTERNAL_ENDPOINT", "minio:9000")
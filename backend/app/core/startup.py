@@ -67,8 +67,13 @@ async def init_qdrant():
         print(f"✅ Qdrant collection '{collection}' already exists. Recreated")
 
 async def init_minio():
-    await async_minio.ensure_bucket_exists(settings.MINIO_DOCUMENT_BUCKET)
-    print(f"🪣 MinIO bucket ensured: {settings.MINIO_DOCUMENT_BUCKET}")
+    for bucket in (
+        settings.MINIO_DOCUMENT_BUCKET,
+        settings.MINIO_COMPARISON_BUCKET,
+        settings.MINIO_PAGE_IMAGE_BUCKET,
+    ):
+        await async_minio.ensure_bucket_exists(bucket)
+        print(f"🪣 MinIO bucket ensured: {bucket}")
 
 
 async def startup_tasks():
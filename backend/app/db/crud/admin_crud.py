@@ -2,7 +2,7 @@ from datetime import datetime, timedelta
 import random
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import load_only
 from app.db.models import Summary, User, Document, ChatSession, Comparison
 from typing import List, Optional
 from uuid import UUID
@@ -64,7 +64,20 @@ async def delete_user(db: AsyncSession, user: User):
 
 # Get all documents
 async def get_all_documents(db: AsyncSession, skip=0, limit=20):
-    q = select(Document).offset(skip).limit(limit)
+    q = (
+        select(Document)
+        .options(
+            load_only(
+                Document.id,
+                Document.filename,
+                Document.owner_id,
+                Document.uploaded_at,
+                Document.size,
+            )
+        )
+        .offset(skip)
+        .limit(limit)
+    )
     result = await db.execute(q)
     return result.scalars().all()
 
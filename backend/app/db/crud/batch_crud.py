@@ -0,0 +1,176 @@
+# app/db/crud/batch_crud.py
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.db.models import BatchItem, BatchJob
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+
+# ------------------------------------------------------
+# Create a batch with one item per document
+# ------------------------------------------------------
+async def create_batch(
+    db: AsyncSession,
+    user_id: UUID,
+    kind: str,
+    document_ids: List[Optional[UUID]],
+    options: dict = None,
+    errors: dict = None,
+    item_values: List[dict] = None,
+):
+    """
+    `errors` maps a position to an error message for items rejected up front
+    (e.g. unknown document) — they are stored as already failed.
+    `item_values` holds extra column values per position (e.g. meta_data).
+    """
+    errors = errors or {}
+    item_values = item_values or [{}] * len(document_ids)
+    batch = BatchJob(user_id=user_id, kind=kind, status="queued", options=options or {})
+    db.add(batch)
+    await db.flush()
+
+    items = []
+    for position, document_id in enumerate(document_ids):
+        error = errors.get(position)
+        items.append(
+            BatchItem(
+                batch_id=batch.id,
+                position=position,
+                document_id=document_id,
+                status="failed" if error else "queued",
+                progress=100 if error else 0,
+                error=error,
+                **item_values[position],
+            )
+        )
+    db.add_all(items)
+    await db.commit()
+    return batch, items
+
+
+async def get_batch(db: AsyncSession, batch_id: UUID, user_id: UUID):
+    q = (
+        select(BatchJob)
+        .options(selectinload(BatchJob.items))
+        .where(BatchJob.id == batch_id, BatchJob.user_id == user_id)
+    )
+    res = await db.execute(q)
+    return res.scalars().first()
+
+
+async def get_pending_item_ids(db: AsyncSession, kind: str):
+    """Items not yet finished — re-queued after a restart."""
+    q = (
+        select(BatchItem.id)
+        .join(BatchJob, BatchJob.id == BatchItem.batch_id)
+        .where(BatchJob.kind == kind, BatchItem.status.notin_(TERMINAL_STATUSES))
+        .order_by(BatchJob.created_at.asc(), BatchItem.position.asc())
+    )
+    res = await db.execute(q)
+    return res.scalars().all()
+
+
+async def get_item_by_result(db: AsyncSession, user_id: UUID, kind: str, result_id: UUID):
+    """The item of a user's batch of `kind` that produces (or produced) `result_id`."""
+    q = (
+        select(BatchItem)
+        .join(BatchJob, BatchJob.id == BatchItem.batch_id)
+        .where(BatchJob.kind == kind, BatchJob.user_id == user_id, BatchItem.result_id == result_id)
+    )
+    res = await db.execute(q)
+    return res.scalars().first()
+
+
+async def transition_item(db: AsyncSession, item_id: UUID, from_status: str, **values) -> bool:
+    """Update an item only if it is still in `from_status` (safe against double submits)."""
+    values.setdefault("updated_at", datetime.utcnow())
+    res = await db.execute(
+        update(BatchItem)
+        .where(BatchItem.id == item_id, BatchItem.status == from_status)
+        .values(**values)
+    )
+    await db.commit()
+    return res.rowcount == 1
+
+
+async def expire_items(db: AsyncSession, kind: str, status: str, before: datetime, error: str):
+    """Fail items of `kind` stuck in `status` since before `before`; returns their batch ids."""
+    q = (
+        update(BatchItem)
+        .where(
+            BatchItem.status == status,
+            BatchItem.updated_at < before,
+            BatchItem.batch_id.in_(select(BatchJob.id).where(BatchJob.kind == kind)),
+        )
+        .values(status="failed", progress=100, error=error, updated_at=datetime.utcnow())
+        .returning(BatchItem.batch_id)
+    )
+    batch_ids = set((await db.execute(q)).scalars().all())
+    await db.commit()
+    return batch_ids
+
+
+async def fail_unfinished_items(
+    db: AsyncSession, item_ids: List[UUID], error: str, skip_statuses: tuple = ()
+):
+    """
+    Fail those of `item_ids` not finished yet (nor in `skip_statuses`);
+    returns their batch ids.
+    """
+    if not item_ids:
+        return set()
+    q = (
+        update(BatchItem)
+        .where(
+            BatchItem.id.in_(item_ids),
+            BatchItem.status.notin_(TERMINAL_STATUSES + tuple(skip_statuses)),
+        )
+        .values(status="failed", progress=100, error=error, updated_at=datetime.utcnow())
+        .returning(BatchItem.batch_id)
+    )
+    batch_ids = set((await db.execute(q)).scalars().all())
+    await db.commit()
+    return batch_ids
+
+
+async def update_items(db: AsyncSession, item_ids: List[UUID], **values):
+    if not item_ids:
+        return
+    values.setdefault("updated_at", datetime.utcnow())
+    await db.execute(update(BatchItem).where(BatchItem.id.in_(item_ids)).values(**values))
+    await db.commit()
+
+
+async def refresh_batch_status(db: AsyncSession, batch_id: UUID):
+    """Roll item statuses up into the parent batch."""
+    q = (
+        select(BatchItem.status, func.count())
+        .where(BatchItem.batch_id == batch_id)
+        .group_by(BatchItem.status)
+    )
+    counts = dict((await db.execute(q)).all())
+    await set_batch_status(db, batch_id, counts)
+    return counts
+
+
+async def set_batch_status(db: AsyncSession, batch_id: UUID, counts: dict):
+    """Derive a batch status from per-status counts of its units of work."""
+    total = sum(counts.values())
+    finished = sum(counts.get(s, 0) for s in TERMINAL_STATUSES)
+
+    if total and finished == total:
+        status = "completed_with_errors" if counts.get("failed") else "completed"
+        values = {"status": status, "completed_at": datetime.utcnow()}
+    elif any(s != "queued" for s in counts):
+        values = {"status": "processing"}
+    else:
+        values = {"status": "queued"}
+
+    await db.execute(update(BatchJob).where(BatchJob.id == batch_id).values(**values))
+    await db.commit()
@@ -1,8 +1,11 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, update, func, insert, literal, or_, tuple_
+from sqlalchemy.orm import load_only
+from sqlalchemy.exc import IntegrityError
 from uuid import UUID, uuid4
-from datetime import datetime
-from app.db.models import Comparison
+from datetime import datetime, timedelta
+from app.db.crud import batch_crud
+from app.db.models import Comparison, ComparisonCache, ComparisonChangeEntry
 
 
 async def create_comparison(
@@ -12,20 +15,34 @@ async def create_comparison(
     document_id_2: UUID,
     comparison_type: str,
     meta_data: dict = None,
+    cache_key: str = None,
 ):
+    """
+    Add a comparison. When `meta_data` is a finished result (as returned by
+    run_document_comparison) its summary is stored in its own columns; the
+    caller stores its changes (compare_service.store_result_changes) and
+    commits.
+    """
+    result = meta_data or {}
+    completed = result.get("status") == "completed"
     comparison = Comparison(
         id=uuid4(),
         user_id=user_id,
         document_id1=document_id_1,
         document_id2=document_id_2,
         comparison_type=comparison_type,
-        status="processing",
-        meta_data=meta_data or {},
+        status=result.get("status", "processing"),
+        summary=result.get("summary", {}),
+        changes=[],
+        category_breakdown=result.get("categoryBreakdown", {}),
+        artifacts_status="pending" if completed else None,
+        meta_data={k: v for k, v in result.items() if k not in RESULT_PAYLOAD},
+        cache_key=cache_key,
         created_at=datetime.utcnow(),
+        completed_at=datetime.utcnow() if completed else None,
     )
     db.add(comparison)
-    await db.commit()
-    await db.refresh(comparison)
+    await db.flush()
     return comparison
 
 
@@ -35,22 +52,415 @@ async def get_comparison_by_id(db: AsyncSession, comparison_id: UUID):
 
 
 async def get_comparison_history(
-    db: AsyncSession, user_id: UUID, document_id: UUID = None, limit: int = 20, offset: int = 0
+    db: AsyncSession,
+    user_id: UUID,
+    document_id: UUID = None,
+    limit: int = 20,
+    after: tuple = None,
 ):
+    """
+    Keyset page of a user's comparisons, newest first, ordered by
+    (created_at, id) and backed by ix_comparisons_user_created. Only the
+    columns to_summary() needs are loaded. `after` is the (created_at, id)
+    of the previous page's last row.
+
+    Returns (comparisons, has_more).
+    """
     query = (
         select(Comparison)
+        .options(
+            load_only(Comparison.id, Comparison.status, Comparison.created_at, Comparison.summary)
+        )
         .where(Comparison.user_id == user_id)
-        .order_by(Comparison.created_at.desc())
     )
     if document_id:
         query = query.where(
-            (Comparison.document_id_1 == document_id) | (Comparison.document_id_2 == document_id)
+            (Comparison.document_id1 == document_id) | (Comparison.document_id2 == document_id)
         )
-    result = await db.execute(query.limit(limit).offset(offset))
-    return result.scalars().all()
+    if after:
+        query = query.where(tuple_(Comparison.created_at, Comparison.id) < tuple_(*after))
+
+    query = query.order_by(Comparison.created_at.desc(), Comparison.id.desc()).limit(limit + 1)
+    rows = (await db.execute(query)).scalars().all()
+    return rows[:limit], len(rows) > limit
+
+
+async def count_comparisons(db: AsyncSession, user_id: UUID, document_id: UUID = None) -> int:
+    """Index-only count of a user's comparisons (optionally for one document)."""
+    query = select(func.count()).select_from(Comparison).where(Comparison.user_id == user_id)
+    if document_id:
+        query = query.where(
+            (Comparison.document_id1 == document_id) | (Comparison.document_id2 == document_id)
+        )
+    return (await db.execute(query)).scalar_one()
 
 
 async def delete_comparison(db: AsyncSession, comparison_id: UUID):
     await db.execute(delete(Comparison).where(Comparison.id == comparison_id))
     await db.commit()
     return True
+
+
+async def find_user_comparison(
+    db: AsyncSession, user_id: UUID, document_id_1: UUID, document_id_2: UUID, cache_key: str
+):
+    """An existing comparison of the same pair/options by this user, if any."""
+    q = (
+        select(Comparison)
+        .where(
+            Comparison.user_id == user_id,
+            Comparison.document_id1 == document_id_1,
+            Comparison.document_id2 == document_id_2,
+            Comparison.cache_key == cache_key,
+            Comparison.status == "completed",
+        )
+        .order_by(Comparison.created_at.desc())
+        .limit(1)
+    )
+    result = await db.execute(q)
+    return result.scalars().first()
+
+
+# ------------------------------------------------------
+# Content-addressed result cache
+# ------------------------------------------------------
+async def get_cache_entry(db: AsyncSession, key: str):
+    return await db.get(ComparisonCache, key)
+
+
+async def record_cache_hit(db: AsyncSession, key: str):
+    now = datetime.utcnow()
+    await db.execute(
+        update(ComparisonCache)
+        .where(ComparisonCache.key == key)
+        .values(hits=ComparisonCache.hits + 1, last_hit_at=now, last_used_at=now)
+    )
+    await db.commit()
+
+
+async def store_cache_entry(db: AsyncSession, entry: ComparisonCache):
+    # Concurrent misses on the same key: first writer wins
+    existing = await db.get(ComparisonCache, entry.key)
+    if existing:
+        if existing.comparison_id is None:
+            # Its changes are gone (or it predates change rows): take the new result
+            existing.result = entry.result
+            existing.size_bytes = entry.size_bytes
+            existing.last_used_at = entry.last_used_at
+            await db.commit()
+        return existing
+    db.add(entry)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        return await db.get(ComparisonCache, entry.key)
+    return entry
+
+
+async def point_cache_entry(db: AsyncSession, key: str, comparison_id: UUID, flipped: bool):
+    """Make `comparison_id`'s rows the entry's changes unless it has some (caller commits)."""
+    await db.execute(
+        update(ComparisonCache)
+        .where(ComparisonCache.key == key, ComparisonCache.comparison_id.is_(None))
+        .values(comparison_id=comparison_id, source_flipped=flipped)
+    )
+
+
+async def evict_cache_entries(db: AsyncSession, max_entries: int, max_age: timedelta) -> int:
+    """
+    Drop entries unused for `max_age`, then all but the `max_entries` most
+    recently used. Change rows belong to their comparisons and stay.
+    """
+    cutoff = datetime.utcnow() - max_age
+    stale = await db.execute(
+        delete(ComparisonCache).where(
+            or_(ComparisonCache.last_used_at.is_(None), ComparisonCache.last_used_at < cutoff)
+        )
+    )
+    surplus = (
+        select(ComparisonCache.key)
+        .order_by(ComparisonCache.last_used_at.desc())
+        .offset(max_entries)
+        .scalar_subquery()
+    )
+    over = await db.execute(delete(ComparisonCache).where(ComparisonCache.key.in_(surplus)))
+    return stale.rowcount + over.rowcount
+
+
+async def get_cache_stats(db: AsyncSession):
+    entries, hits, stored, saved = (
+        await db.execute(
+            select(
+                func.count(ComparisonCache.key),
+                func.coalesce(func.sum(ComparisonCache.hits), 0),
+                func.coalesce(func.sum(ComparisonCache.size_bytes), 0),
+                func.coalesce(func.sum(ComparisonCache.hits * ComparisonCache.size_bytes), 0),
+            )
+        )
+    ).one()
+
+    # Every entry was created by exactly one miss
+    lookups = hits + entries
+    return {
+        "entries": int(entries),
+        "hits": int(hits),
+        "misses": int(entries),
+        "hitRate": round(hits / lookups, 4) if lookups else 0.0,
+        "bytesStored": int(stored),
+        "bytesSaved": int(saved),
+    }
+
+
+# ------------------------------------------------------
+# Batch comparisons (one Comparison row per distinct pair)
+# ------------------------------------------------------
+async def create_batch_comparisons(
+    db: AsyncSession, user_id: UUID, batch_id: UUID, pairs: list
+):
+    """`pairs` are distinct (document_id1, document_id2, comparison_type) tuples."""
+    now = datetime.utcnow()
+    rows = [
+        Comparison(
+            id=uuid4(),
+            user_id=user_id,
+            document_id1=d1,
+            document_id2=d2,
+            comparison_type=ctype,
+            status="queued",
+            batch_id=batch_id,
+            created_at=now,
+        )
+        for d1, d2, ctype in pairs
+    ]
+    db.add_all(rows)
+    await db.commit()
+    return rows
+
+
+async def get_batch_comparisons(db: AsyncSession, batch_id: UUID, pending_only: bool = False):
+    q = select(Comparison).where(Comparison.batch_id == batch_id).order_by(Comparison.created_at)
+    if pending_only:
+        q = q.where(Comparison.status.in_(("queued", "processing")))
+    result = await db.execute(q)
+    return result.scalars().all()
+
+
+async def set_comparisons_status(db: AsyncSession, comparison_ids: list, status: str):
+    if not comparison_ids:
+        return
+    await db.execute(
+        update(Comparison).where(Comparison.id.in_(comparison_ids)).values(status=status)
+    )
+    await db.commit()
+
+
+async def complete_comparison(db: AsyncSession, comparison_id: UUID, result: dict, cache_key: str):
+    """Record a finished result (caller stores its changes and commits)."""
+    await db.execute(
+        update(Comparison)
+        .where(Comparison.id == comparison_id)
+        .values(
+            status="completed",
+            summary=result.get("summary", {}),
+            category_breakdown=result.get("categoryBreakdown", {}),
+            artifacts_status="pending",
+            cache_key=cache_key,
+            completed_at=datetime.utcnow(),
+        )
+    )
+    await db.execute(
+        delete(ComparisonChangeEntry).where(ComparisonChangeEntry.comparison_id == comparison_id)
+    )
+
+
+async def fail_comparison(db: AsyncSession, comparison_id: UUID, error: str):
+    await db.execute(
+        update(Comparison)
+        .where(Comparison.id == comparison_id)
+        .values(status="failed", meta_data={"error": error}, completed_at=datetime.utcnow())
+    )
+    await db.commit()
+
+
+async def refresh_batch_status(db: AsyncSession, batch_id: UUID):
+    """Roll the batch's comparison statuses up into its BatchJob."""
+    q = (
+        select(Comparison.status, func.count())
+        .where(Comparison.batch_id == batch_id)
+        .group_by(Comparison.status)
+    )
+    counts = dict((await db.execute(q)).all())
+    await batch_crud.set_batch_status(db, batch_id, counts)
+    return counts
+
+
+async def get_pending_batch_ids(db: AsyncSession):
+    """Batches with comparisons not yet finished — resumed after a restart."""
+    q = (
+        select(Comparison.batch_id)
+        .where(Comparison.batch_id.isnot(None), Comparison.status.in_(("queued", "processing")))
+        .distinct()
+    )
+    return (await db.execute(q)).scalars().all()
+
+
+# ------------------------------------------------------
+# Rendered artifacts (diff / side-by-side PDFs in MinIO)
+# ------------------------------------------------------
+async def set_artifacts(
+    db: AsyncSession,
+    comparison_id: UUID,
+    status: str,
+    diff_uri: str = None,
+    side_by_side_uri: str = None,
+):
+    await db.execute(
+        update(Comparison)
+        .where(Comparison.id == comparison_id)
+        .values(artifacts_status=status, diff_url=diff_uri, side_by_side_url=side_by_side_uri)
+    )
+    await db.commit()
+
+
+async def get_pending_artifact_ids(db: AsyncSession):
+    q = select(Comparison.id).where(
+        Comparison.status == "completed", Comparison.artifacts_status == "pending"
+    )
+    return (await db.execute(q)).scalars().all()
+
+
+# ------------------------------------------------------
+# Change entries (paged / streamed instead of one JSON blob)
+# ------------------------------------------------------
+CHANGE_INSERT_BATCH = 1000
+CHANGE_COLUMNS = ("document", "page", "type", "category", "severity", "data")
+
+# Result keys that are not comparison metadata
+RESULT_PAYLOAD = ("summary", "changes", "cacheSource")
+
+
+def _change_row(comparison_id: UUID, seq: int, change: dict) -> dict:
+    location = change.get("location") or {}
+    return {
+        "comparison_id": comparison_id,
+        "seq": seq,
+        "document": location.get("document"),
+        "page": location.get("page"),
+        "type": change.get("type"),
+        "category": change.get("category"),
+        "severity": change.get("severity"),
+        "data": change,
+    }
+
+
+async def store_changes(db: AsyncSession, comparison_id: UUID, changes: list):
+    """Insert a comparison's changes in order (caller commits)."""
+    for start in range(0, len(changes), CHANGE_INSERT_BATCH):
+        rows = [
+            _change_row(comparison_id, seq, change)
+            for seq, change in enumerate(changes[start : start + CHANGE_INSERT_BATCH], start=start)
+        ]
+        await db.execute(insert(ComparisonChangeEntry), rows)
+
+
+async def copy_changes(db: AsyncSession, source_id: UUID, comparison_id: UUID):
+    """Copy another comparison's changes in one INSERT … SELECT (caller commits)."""
+    columns = [getattr(ComparisonChangeEntry, c) for c in CHANGE_COLUMNS]
+    await db.execute(
+        insert(ComparisonChangeEntry).from_select(
+            ["comparison_id", "seq", *CHANGE_COLUMNS],
+            select(literal(comparison_id), ComparisonChangeEntry.seq, *columns).where(
+                ComparisonChangeEntry.comparison_id == source_id
+            ),
+        )
+    )
+
+
+async def copy_changes_flipped(db: AsyncSession, source_id: UUID, comparison_id: UUID, flip):
+    """
+    Copy another comparison's changes through `flip` (a change seen from the
+    other document), CHANGE_INSERT_BATCH rows at a time, then renumber them
+    in result order — (page, line, document), ties in source order — in SQL
+    (caller commits).
+    """
+    after = -1
+    while True:
+        res = await db.execute(
+            select(ComparisonChangeEntry.seq, ComparisonChangeEntry.data)
+            .where(
+                ComparisonChangeEntry.comparison_id == source_id,
+                ComparisonChangeEntry.seq > after,
+            )
+            .order_by(ComparisonChangeEntry.seq)
+            .limit(CHANGE_INSERT_BATCH)
+        )
+        rows = res.all()
+        if not rows:
+            break
+        # Negative provisional seqs never collide with the final ones
+        await db.execute(
+            insert(ComparisonChangeEntry),
+            [_change_row(comparison_id, -1 - seq, flip(data)) for seq, data in rows],
+        )
+        after = rows[-1].seq
+
+    entry = ComparisonChangeEntry
+    ranked = (
+        select(
+            entry.seq,
+            (
+                func.row_number().over(
+                    order_by=(
+                        func.coalesce(entry.page, 0),
+                        func.coalesce(entry.data["location"]["lineNumber"].as_integer(), 0),
+                        entry.document,
+                        entry.seq.desc(),
+                    )
+                )
+                - 1
+            ).label("new_seq"),
+        )
+        .where(entry.comparison_id == comparison_id)
+        .subquery()
+    )
+    await db.execute(
+        update(entry)
+        .where(entry.comparison_id == comparison_id, entry.seq == ranked.c.seq)
+        .values(seq=ranked.c.new_seq)
+    )
+
+
+def _changes_query(comparison_id: UUID, after: int = None, **filters):
+    q = select(ComparisonChangeEntry.seq, ComparisonChangeEntry.data).where(
+        ComparisonChangeEntry.comparison_id == comparison_id
+    )
+    if after is not None:
+        q = q.where(ComparisonChangeEntry.seq > after)
+    for column in ("page", "document", "type", "category", "severity"):
+        value = filters.get(column)
+        if value is not None:
+            q = q.where(getattr(ComparisonChangeEntry, column) == value)
+    return q.order_by(ComparisonChangeEntry.seq)
+
+
+async def list_changes(
+    db: AsyncSession, comparison_id: UUID, after: int = None, limit: int = 100, **filters
+):
+    """
+    One page of changes, keyset-paginated on `seq`.
+    Returns (changes, next_cursor); next_cursor is None on the last page.
+    """
+    res = await db.execute(_changes_query(comparison_id, after, **filters).limit(limit + 1))
+    rows = res.all()
+    next_cursor = rows[limit - 1].seq if len(rows) > limit else None
+    return [row.data for row in rows[:limit]], next_cursor
+
+
+async def stream_changes(db: AsyncSession, comparison_id: UUID, batch_size: int = 500, **filters):
+    """Yield every matching change, fetched `batch_size` rows at a time."""
+    result = await db.stream(
+        _changes_query(comparison_id, **filters).execution_options(yield_per=batch_size)
+    )
+    async for row in result:
+        yield row.data
@@ -1,13 +1,57 @@
+import hashlib
+import json
+from datetime import datetime
+from typing import List, Optional
+
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete, update
-from app.db.models import Document
+from sqlalchemy import select, delete, update, func, insert, literal, or_, tuple_
+from sqlalchemy.dialects.postgresql import JSONB
+from app.db.models import Document, DocumentLSHBand, DocumentPage, DocumentRevision
+from app.processing.similarity import estimate_jaccard, lsh_buckets
 from uuid import UUID
 
 
-async def get_user_documents(db: AsyncSession, user_id: UUID, limit: int = 20, offset: int = 0):
-    q = select(Document).where(Document.owner_id == user_id).limit(limit).offset(offset)
+async def get_user_documents(
+    db: AsyncSession,
+    user_id: UUID,
+    limit: int = 20,
+    offset: int = 0,
+    tags: Optional[List[str]] = None,
+    match_all_tags: bool = True,
+    content_type: Optional[str] = None,
+    uploaded_from: Optional[datetime] = None,
+    uploaded_to: Optional[datetime] = None,
+):
+    """
+    A user's documents, newest first, filtered in SQL. Tag filters are
+    `meta_data @> {"tags": [...]}` containment checks served by the GIN index.
+    Rows carry only what the listing shows (id, filename, content_type,
+    uploaded_at, summary, tags): meta_data itself is never loaded.
+    """
+    q = select(
+        Document.id,
+        Document.filename,
+        Document.content_type,
+        Document.uploaded_at,
+        Document.meta_data["summary"].label("summary"),
+        Document.meta_data["tags"].label("tags"),
+    ).where(Document.owner_id == user_id)
+
+    if tags:
+        if match_all_tags:
+            q = q.where(Document.meta_data.contains({"tags": tags}))
+        else:
+            q = q.where(or_(*[Document.meta_data.contains({"tags": [tag]}) for tag in tags]))
+    if content_type:
+        q = q.where(Document.content_type == content_type)
+    if uploaded_from:
+        q = q.where(Document.uploaded_at >= uploaded_from)
+    if uploaded_to:
+        q = q.where(Document.uploaded_at < uploaded_to)
+
+    q = q.order_by(Document.uploaded_at.desc()).limit(limit).offset(offset)
     res = await db.execute(q)
-    return res.scalars().all()
+    return res.all()
 
 
 async def get_document_by_id(db: AsyncSession, doc_id: UUID):
@@ -20,7 +64,11 @@ async def update_document_metadata(db: AsyncSession, doc_id: UUID, metadata: dic
     q = (
         update(Document)
         .where(Document.id == doc_id)
-        .values(meta_data=Document.meta_data.op("||")(metadata))
+        .values(
+            meta_data=func.coalesce(Document.meta_data, literal({}, JSONB)).op("||")(
+                literal(metadata, JSONB)
+            )
+        )
         .returning(Document)
     )
     res = await db.execute(q)
@@ -31,3 +79,181 @@ async def update_document_metadata(db: AsyncSession, doc_id: UUID, metadata: dic
 async def delete_document(db: AsyncSession, doc_id: UUID):
     await db.execute(delete(Document).where(Document.id == doc_id))
     await db.commit()
+
+
+async def lock_document(db: AsyncSession, doc_id: UUID):
+    """The document row, locked until the transaction ends (one revision at a time)."""
+    q = (
+        select(Document)
+        .where(Document.id == doc_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)  # not a copy read before the lock
+    )
+    res = await db.execute(q)
+    return res.scalars().first()
+
+
+# ------------------------------------------------------
+# Extracted pages (document_pages)
+# ------------------------------------------------------
+PAGE_INSERT_BATCH = 500
+
+
+def page_text(content) -> str:
+    """Extracted page content as text (structured content, e.g. JSON, is serialized)."""
+    return content if isinstance(content, str) else json.dumps(content, ensure_ascii=False)
+
+
+def page_hash(content) -> str:
+    """md5 of the stored page text, as Postgres computes it with md5(content)."""
+    return hashlib.md5(page_text(content).encode("utf-8")).hexdigest()
+
+
+async def get_page_hashes(db: AsyncSession, doc_id: UUID) -> dict:
+    """{page: md5 of its text}, hashed in SQL so page text is not transferred."""
+    res = await db.execute(
+        select(DocumentPage.page, func.md5(DocumentPage.content)).where(
+            DocumentPage.document_id == doc_id
+        )
+    )
+    return dict(res.all())
+
+
+async def replace_pages(db: AsyncSession, doc_id: UUID, pages: list, page_count: int):
+    """Rewrite the given pages and drop those past `page_count` (caller commits)."""
+    numbers = [p["page"] for p in pages]
+    await db.execute(
+        delete(DocumentPage).where(
+            DocumentPage.document_id == doc_id,
+            or_(DocumentPage.page.in_(numbers), DocumentPage.page > page_count),
+        )
+    )
+    await store_pages(db, doc_id, pages)
+
+
+async def store_pages(db: AsyncSession, doc_id: UUID, pages: list):
+    """Insert extracted `{"page", "content"}` entries (caller commits)."""
+    for start in range(0, len(pages), PAGE_INSERT_BATCH):
+        await db.execute(
+            insert(DocumentPage),
+            [
+                {"document_id": doc_id, "page": p["page"], "content": page_text(p["content"])}
+                for p in pages[start : start + PAGE_INSERT_BATCH]
+            ],
+        )
+
+
+async def get_pages(db: AsyncSession, doc_id: UUID, first: int = None, last: int = None):
+    """(page, content) rows of a document, in page order, optionally a range."""
+    q = select(DocumentPage.page, DocumentPage.content).where(DocumentPage.document_id == doc_id)
+    if first is not None:
+        q = q.where(DocumentPage.page >= first)
+    if last is not None:
+        q = q.where(DocumentPage.page <= last)
+    res = await db.execute(q.order_by(DocumentPage.page))
+    return res.all()
+
+
+async def get_pages_of(db: AsyncSession, doc_ids):
+    """{document id: [page content, ...]} of several documents, in one query."""
+    q = (
+        select(DocumentPage.document_id, DocumentPage.content)
+        .where(DocumentPage.document_id.in_(list(doc_ids)))
+        .order_by(DocumentPage.document_id, DocumentPage.page)
+    )
+    pages = {}
+    for doc_id, content in (await db.execute(q)).all():
+        pages.setdefault(doc_id, []).append(content)
+    return pages
+
+
+# ------------------------------------------------------
+# Near-duplicate index (MinHash LSH)
+# ------------------------------------------------------
+def lsh_rows(doc_id: UUID, owner_id: UUID, signature: list):
+    """Index rows of a signature (none for an empty one: no words, no neighbours)."""
+    return [
+        DocumentLSHBand(document_id=doc_id, owner_id=owner_id, band=band, bucket=bucket)
+        for band, bucket in lsh_buckets(signature)
+    ]
+
+
+async def replace_lsh_rows(db: AsyncSession, doc: Document):
+    """Re-index a document whose signature changed (caller commits)."""
+    await db.execute(delete(DocumentLSHBand).where(DocumentLSHBand.document_id == doc.id))
+    db.add_all(lsh_rows(doc.id, doc.owner_id, doc.minhash))
+
+
+async def find_near_duplicates(
+    db: AsyncSession,
+    owner_id: UUID,
+    signature: list,
+    exclude_id: UUID = None,
+    threshold: float = 0.5,
+    limit: int = 10,
+    max_candidates: int = 200,
+):
+    """
+    Documents of `owner_id` whose estimated Jaccard with `signature` is at
+    least `threshold`. Candidates come from the bucket index (documents
+    sharing at least one band), so cost depends on matches, not corpus size.
+    """
+    if not signature:
+        return []
+
+    keys = lsh_buckets(signature)
+    q = (
+        select(DocumentLSHBand.document_id, func.count().label("hits"))
+        .where(
+            DocumentLSHBand.owner_id == owner_id,
+            tuple_(DocumentLSHBand.band, DocumentLSHBand.bucket).in_(keys),
+        )
+        .group_by(DocumentLSHBand.document_id)
+        .order_by(func.count().desc())
+        .limit(max_candidates)
+    )
+    if exclude_id:
+        q = q.where(DocumentLSHBand.document_id != exclude_id)
+
+    candidate_ids = (await db.execute(q)).scalars().all()
+    if not candidate_ids:
+        return []
+
+    rows = (
+        await db.execute(
+            select(Document.id, Document.filename, Document.uploaded_at, Document.minhash).where(
+                Document.id.in_(candidate_ids)
+            )
+        )
+    ).all()
+
+    matches = []
+    for doc_id, filename, uploaded_at, minhash in rows:
+        if not minhash or len(minhash) != len(signature):
+            continue
+        score = estimate_jaccard(signature, minhash)
+        if score >= threshold:
+            matches.append(
+                {
+                    "id": str(doc_id),
+                    "filename": filename,
+                    "uploadedAt": uploaded_at.isoformat() if uploaded_at else None,
+                    "similarity": round(score, 4),
+                }
+            )
+
+    matches.sort(key=lambda m: m["similarity"], reverse=True)
+    return matches[:limit]
+
+
+# ------------------------------------------------------
+# Revisions
+# ------------------------------------------------------
+async def get_revisions(db: AsyncSession, doc_id: UUID):
+    """Revision history of a document, newest first."""
+    res = await db.execute(
+        select(DocumentRevision)
+        .where(DocumentRevision.document_id == doc_id)
+        .order_by(DocumentRevision.revision.desc())
+    )
+    return res.scalars().all()
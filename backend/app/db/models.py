@@ -2,7 +2,7 @@
 import sqlalchemy as sa
 from sqlalchemy.orm import relationship
 from app.db.session import Base
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 import uuid
 from datetime import datetime
 
@@ -21,7 +21,7 @@ class User(Base):
 
     avatar_url = sa.Column(sa.String(512), nullable=True)
     preferences = sa.Column(
-        sa.JSON, default=lambda: {"theme": "light", "language": "en", "notifications": True}
+        JSONB, default=lambda: {"theme": "light", "language": "en", "notifications": True}
     )
 
     # ✅ Relationships
@@ -43,13 +43,77 @@ class Document(Base):
     content_type = sa.Column(sa.String(128))
     uploaded_at = sa.Column(sa.DateTime(), default=datetime.utcnow)
 
-    meta_data = sa.Column(sa.JSON, default=dict)  # FIXED here
+    meta_data = sa.Column(JSONB, default=dict)  # light metadata; page text is in document_pages
+    page_count = sa.Column(sa.Integer, nullable=True)
+    minhash = sa.Column(JSONB, nullable=True)  # MinHash signature (app.processing.similarity)
+    # sha256 of the uploaded bytes
+    content_hash = sa.Column(sa.String(64), nullable=True, index=True)
+    # Current DocumentRevision (None: never revised)
+    revision = sa.Column(sa.Integer, nullable=True)
 
     owner = relationship("User", back_populates="documents")
     embeddings = relationship("Embedding", back_populates="document", cascade="all, delete-orphan")
     summaries = relationship("Summary", back_populates="document", cascade="all, delete-orphan")
 
 
+# Metadata filters (tags etc.) use @> containment → jsonb_path_ops GIN
+sa.Index(
+    "ix_documents_meta_data",
+    Document.meta_data,
+    postgresql_using="gin",
+    postgresql_ops={"meta_data": "jsonb_path_ops"},
+)
+# Listing: WHERE owner_id = ? [AND uploaded_at range] ORDER BY uploaded_at DESC
+sa.Index("ix_documents_owner_uploaded", Document.owner_id, Document.uploaded_at.desc())
+
+
+class DocumentPage(Base):
+    """Extracted text of one page; kept out of documents.meta_data so document rows stay light."""
+
+    __tablename__ = "document_pages"
+
+    document_id = sa.Column(
+        UUID(as_uuid=True), sa.ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True
+    )
+    page = sa.Column(sa.Integer, primary_key=True)  # 1-based
+    content = sa.Column(sa.Text, nullable=False, default="")
+
+
+class DocumentLSHBand(Base):
+    """MinHash LSH index: one row per (document, band); lookups hit the bucket index."""
+
+    __tablename__ = "document_lsh_bands"
+    __table_args__ = (sa.Index("ix_lsh_owner_band_bucket", "owner_id", "band", "bucket"),)
+
+    document_id = sa.Column(
+        UUID(as_uuid=True), sa.ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True
+    )
+    band = sa.Column(sa.SmallInteger, primary_key=True)
+    owner_id = sa.Column(UUID(as_uuid=True), nullable=False)
+    bucket = sa.Column(sa.BigInteger, nullable=False)
+
+
+class DocumentRevision(Base):
+    """One uploaded version of a document's file; the document row describes the latest."""
+
+    __tablename__ = "document_revisions"
+    __table_args__ = (sa.UniqueConstraint("document_id", "revision"),)
+
+    id = sa.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    document_id = sa.Column(
+        UUID(as_uuid=True), sa.ForeignKey("documents.id", ondelete="CASCADE"), nullable=False
+    )
+    revision = sa.Column(sa.Integer, nullable=False)  # 1 = the original upload
+    filename = sa.Column(sa.String(512))
+    content_type = sa.Column(sa.String(128))
+    size = sa.Column(sa.Integer)
+    content_hash = sa.Column(sa.String(64), nullable=True)
+    minio_uri = sa.Column(sa.String(1024), nullable=True)
+    page_count = sa.Column(sa.Integer, nullable=True)
+    changes = sa.Column(JSONB, nullable=True)  # page / chunk diff against the previous revision
+    created_at = sa.Column(sa.DateTime(), default=datetime.utcnow)
+
+
 class ChatSession(Base):
     __tablename__ = "chat_sessions"
     id = sa.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
@@ -60,7 +124,7 @@ class ChatSession(Base):
         UUID(as_uuid=True), sa.ForeignKey("documents.id", ondelete="SET NULL"), nullable=True
     )
     name = sa.Column(sa.String(255), default="Conversation")
-    meta_data = sa.Column(sa.JSON, default={})
+    meta_data = sa.Column(JSONB, default={})
     created_at = sa.Column(sa.DateTime(), default=datetime.utcnow)
 
     user = relationship("User", back_populates="sessions")
@@ -77,7 +141,7 @@ class Message(Base):
     role = sa.Column(sa.Enum("user", "assistant", "system", name="role_enum"), nullable=False)
     content = sa.Column(sa.Text, nullable=False)
     created_at = sa.Column(sa.DateTime(), default=datetime.utcnow)
-    meta_data = sa.Column(sa.JSON, default={})
+    meta_data = sa.Column(JSONB, default={})
 
     session = relationship("ChatSession", back_populates="messages")
 
@@ -107,11 +171,11 @@ class Summary(Base):
     style = sa.Column(sa.String(64), default="executive")
     length = sa.Column(sa.String(32), default="medium")
     content = sa.Column(sa.Text, nullable=False)
-    key_points = sa.Column(sa.JSON, default=list)
+    key_points = sa.Column(JSONB, default=list)
     word_count = sa.Column(sa.Integer)
     confidence = sa.Column(sa.Float)
     created_at = sa.Column(sa.DateTime, default=datetime.utcnow)
-    meta_data = sa.Column(sa.JSON, default=dict)
+    meta_data = sa.Column(JSONB, default=dict)
 
     document = relationship("Document", back_populates="summaries")
 
@@ -129,20 +193,29 @@ class Comparison(Base):
     status = sa.Column(sa.String(50), default="processing")
     created_at = sa.Column(sa.DateTime, default=datetime.utcnow)
     completed_at = sa.Column(sa.DateTime, nullable=True)
-    summary = sa.Column(sa.JSON, default=dict)
-    changes = sa.Column(sa.JSON, default=dict)
-    category_breakdown = sa.Column(sa.JSON, default=dict)
+    summary = sa.Column(JSONB, default=dict)
+    changes = sa.Column(JSONB, default=dict)  # legacy; changes live in comparison_changes
+    category_breakdown = sa.Column(JSONB, default=dict)
     diff_url = sa.Column(sa.String(512))
-    side_by_side_url = sa.Column(sa.String(512))
-    meta_data = sa.Column(sa.JSON, default=dict)
+    side_by_side_url = sa.Column(sa.String(512))  # "bucket/object" once rendered
+    artifacts_status = sa.Column(sa.String(20), nullable=True)  # pending | ready | failed
+    meta_data = sa.Column(JSONB, default=dict)
+    cache_key = sa.Column(sa.String(64), nullable=True, index=True)
+    batch_id = sa.Column(
+        UUID(as_uuid=True),
+        sa.ForeignKey("batch_jobs.id", ondelete="SET NULL"),
+        nullable=True,
+        index=True,
+    )
 
     # ✅ Relationships
     user = relationship("User", back_populates="comparisons")
     document1 = relationship("Document", foreign_keys=[document_id1])
     document2 = relationship("Document", foreign_keys=[document_id2])
 
-    def to_dict(self, includeDetails: bool = True):
-        base = {
+    def to_dict(self):
+        """Comparison without its changes (page them from comparison_changes)."""
+        return {
             "id": str(self.id),
             "documentId1": str(self.document_id1) if self.document_id1 else None,
             "documentId2": str(self.document_id2) if self.document_id2 else None,
@@ -152,12 +225,10 @@ class Comparison(Base):
             "completedAt": self.completed_at.isoformat() if self.completed_at else None,
             "summary": self.summary or {},
             "categoryBreakdown": self.category_breakdown or {},
-            "diffUrl": self.diff_url,
-            "sideBySideUrl": self.side_by_side_url,
+            "diffUrl": None,
+            "sideBySideUrl": None,
+            "artifactsStatus": self.artifacts_status,
         }
-        if includeDetails:
-            base["changes"] = self.changes or {}
-        return base
 
     def to_summary(self):
         return {
@@ -171,3 +242,124 @@ class Comparison(Base):
                 "similarityScore": (self.summary or {}).get("similarityScore"),
             },
         }
+
+
+# History listing: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+sa.Index(
+    "ix_comparisons_user_created",
+    Comparison.user_id,
+    Comparison.created_at.desc(),
+    Comparison.id.desc(),
+)
+
+
+class ComparisonChangeEntry(Base):
+    """
+    One change of a comparison, in result order (`seq`). Large change sets
+    are paged / streamed from here instead of living in one JSON blob.
+    """
+
+    __tablename__ = "comparison_changes"
+    __table_args__ = (
+        sa.Index("ix_comparison_changes_page", "comparison_id", "page", "seq"),
+        sa.Index("ix_comparison_changes_category", "comparison_id", "category", "seq"),
+    )
+
+    comparison_id = sa.Column(
+        UUID(as_uuid=True), sa.ForeignKey("comparisons.id", ondelete="CASCADE"), primary_key=True
+    )
+    seq = sa.Column(sa.Integer, primary_key=True)
+    document = sa.Column(sa.SmallInteger)
+    page = sa.Column(sa.Integer, nullable=True)
+    type = sa.Column(sa.String(20))
+    category = sa.Column(sa.String(50))
+    severity = sa.Column(sa.String(20))
+    data = sa.Column(JSONB, nullable=False)  # the full change object
+
+
+class ComparisonCache(Base):
+    """
+    Computed comparison results keyed by content, not by document id.
+
+    The key covers both content hashes (in canonical order), the comparison
+    type, normalized options and the engine version. The summary is stored
+    in canonical orientation; the changes are the comparison_changes rows of
+    `comparison_id` (oriented as that comparison, `source_flipped` when it
+    is the reverse of canonical). Without a comparison the entry is a miss.
+    """
+
+    __tablename__ = "comparison_cache"
+
+    key = sa.Column(sa.String(64), primary_key=True)
+    content_hash1 = sa.Column(sa.String(80), nullable=False)
+    content_hash2 = sa.Column(sa.String(80), nullable=False)
+    comparison_type = sa.Column(sa.String(50))
+    options_hash = sa.Column(sa.String(64))
+    engine_version = sa.Column(sa.String(100))
+    result = sa.Column(JSONB, nullable=False)  # {"summary", "categoryBreakdown"}
+    comparison_id = sa.Column(
+        UUID(as_uuid=True), sa.ForeignKey("comparisons.id", ondelete="SET NULL"), nullable=True
+    )
+    source_flipped = sa.Column(sa.Boolean, nullable=True)
+    size_bytes = sa.Column(sa.Integer, default=0)  # of the change set, for hit-rate stats
+    hits = sa.Column(sa.Integer, default=0)
+    created_at = sa.Column(sa.DateTime, default=datetime.utcnow)
+    last_hit_at = sa.Column(sa.DateTime, nullable=True)
+    last_used_at = sa.Column(sa.DateTime, nullable=True, index=True)  # eviction order
+
+
+class BatchJob(Base):
+    __tablename__ = "batch_jobs"
+
+    id = sa.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    user_id = sa.Column(
+        UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    kind = sa.Column(sa.String(50), nullable=False)  # e.g. "summary"
+    status = sa.Column(sa.String(50), default="queued")
+    options = sa.Column(JSONB, default=dict)
+    created_at = sa.Column(sa.DateTime, default=datetime.utcnow)
+    completed_at = sa.Column(sa.DateTime, nullable=True)
+
+    items = relationship(
+        "BatchItem",
+        back_populates="batch",
+        cascade="all, delete-orphan",
+        order_by="BatchItem.position",
+    )
+
+
+class BatchItem(Base):
+    __tablename__ = "batch_items"
+
+    id = sa.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    batch_id = sa.Column(
+        UUID(as_uuid=True),
+        sa.ForeignKey("batch_jobs.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    position = sa.Column(sa.Integer, default=0)
+    document_id = sa.Column(
+        UUID(as_uuid=True), sa.ForeignKey("documents.id", ondelete="CASCADE"), nullable=True
+    )
+    # queued | retrieving | summarizing | completed | failed
+    status = sa.Column(sa.String(50), default="queued")
+    progress = sa.Column(sa.Integer, default=0)  # 0-100
+    result_id = sa.Column(UUID(as_uuid=True), nullable=True)  # e.g. Summary.id
+    error = sa.Column(sa.Text, nullable=True)
+    meta_data = sa.Column(JSONB, nullable=True)  # item input, e.g. the staged upload to ingest
+    updated_at = sa.Column(sa.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    batch = relationship("BatchJob", back_populates="items")
+
+    def to_dict(self):
+        return {
+            "itemId": str(self.id),
+            "documentId": str(self.document_id) if self.document_id else None,
+            "status": self.status,
+            "progress": self.progress or 0,
+            "resultId": str(self.result_id) if self.result_id else None,
+            "error": self.error,
+            "updatedAt": self.updated_at.isoformat() if self.updated_at else None,
+        }
@@ -11,12 +11,15 @@ class ComparisonOptions(BaseModel):
     ignoreFormatting: bool = True
     caseSensitive: bool = False
     highlightChanges: bool = True
+    similarityMode: str = Field(default="minhash", description="minhash | exact")
 
 
 class ComparisonRequest(BaseModel):
     documentId1: UUID
     documentId2: UUID
-    comparisonType: str = Field(default="full", description="full | structure | content | metadata")
+    comparisonType: str = Field(
+        default="full", description="full | structure | content (semantic) | metadata"
+    )
     options: Optional[ComparisonOptions] = ComparisonOptions()
 
 
@@ -46,6 +49,11 @@ class ComparisonSummary(BaseModel):
     modifications: int
     similarityScore: float
     changesPercentage: float
+    similarityMethod: Optional[str] = None
+    containment: Optional[Dict[str, float]] = None
+    moved: Optional[int] = None
+    matchedChunks: Optional[int] = None
+    semanticSimilarity: Optional[float] = None
 
 
 class ComparisonData(BaseModel):
@@ -60,9 +68,11 @@ class ComparisonData(BaseModel):
     completedAt: Optional[datetime] = None
     summary: Optional[ComparisonSummary] = None
     changes: Optional[List[ComparisonChange]] = []
+    changesNextCursor: Optional[int] = None  # page on via GET /compare/{id}/changes
     categoryBreakdown: Optional[Dict[str, int]] = {}
     diffUrl: Optional[str] = None
     sideBySideUrl: Optional[str] = None
+    artifactsStatus: Optional[str] = None  # pending | ready | failed
 
 
 # -------------------------------------------------
@@ -88,9 +98,10 @@ class CompareHistoryItem(BaseModel):
 
 
 class CompareHistoryPagination(BaseModel):
-    currentPage: int
-    totalPages: int
+    limit: int
     totalItems: int
+    totalPages: int
+    nextCursor: Optional[str] = None
 
 
 class CompareHistoryResponse(BaseModel):
@@ -98,6 +109,11 @@ class CompareHistoryResponse(BaseModel):
     data: Dict[str, Any]
 
 
+class CompareChangesResponse(BaseModel):
+    success: bool = True
+    data: Dict[str, Any]
+
+
 class CompareDeleteResponse(BaseModel):
     success: bool = True
     data: Dict[str, Any]
@@ -114,6 +130,7 @@ class CompareBatchItem(BaseModel):
 
 class CompareBatchRequest(BaseModel):
     comparisons: List[CompareBatchItem]
+    options: ComparisonOptions = ComparisonOptions()
 
 
 class CompareBatchResponse(BaseModel):
@@ -2,7 +2,7 @@
 from pydantic import BaseModel
 from uuid import UUID
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 
 class DocumentOut(BaseModel):
@@ -14,3 +14,13 @@ class DocumentOut(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class DirectUploadFile(BaseModel):
+    filename: str
+    contentType: str = "application/octet-stream"
+    size: Optional[int] = None  # bytes, checked against UPLOAD_MAX_MB up front
+
+
+class DirectUploadRequest(BaseModel):
+    files: List[DirectUploadFile]
@@ -28,3 +28,8 @@ class SummaryResponse(BaseModel):
     meta_data: Dict
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class SummaryBatchRequest(BaseModel):
+    documentIds: List[str]
+    options: Optional[SummaryOptions] = None
@@ -19,6 +19,61 @@ async def init_db():
 
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_upgrade_schema)
+
+
+def _upgrade_schema(conn):
+    """
+    create_all only creates missing tables. For tables that already exist,
+    add missing columns (with their foreign keys), convert json columns
+    declared as JSONB and create any missing indexes.
+
+    This is the schema migration: every model change must be one it can
+    apply — a new nullable column, or a NOT NULL one with a server_default.
+    Anything else is reported and needs a manual ALTER.
+    """
+    from sqlalchemy import inspect, text
+    from sqlalchemy.dialects.postgresql import JSONB
+
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {c["name"]: c for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                ddl = _column_ddl(conn, column)
+                if ddl is None:
+                    print(f"⚠️ {table.name}.{column.name}: missing, cannot be added automatically")
+                    continue
+                print(f"🔧 {table.name}.{column.name}: added")
+                conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN {ddl}'))
+                existing[column.name] = {"name": column.name, "type": column.type}
+            if not isinstance(column.type, JSONB):
+                continue
+            if type(existing[column.name]["type"]).__name__ == "JSON":
+                print(f"🔧 {table.name}.{column.name}: json → jsonb")
+                conn.execute(
+                    text(
+                        f'ALTER TABLE "{table.name}" ALTER COLUMN "{column.name}" '
+                        f'TYPE jsonb USING "{column.name}"::jsonb'
+                    )
+                )
+        for index in table.indexes:
+            if all(c.name in existing for c in index.columns):
+                index.create(conn, checkfirst=True)
+
+
+def _column_ddl(conn, column):
+    """Column definition for ADD COLUMN, or None when existing rows would break it."""
+    from sqlalchemy.schema import CreateColumn
+
+    if column.primary_key or (not column.nullable and column.server_default is None):
+        return None
+    ddl = str(CreateColumn(column).compile(dialect=conn.dialect))
+    for fk in column.foreign_keys:
+        ddl += f' REFERENCES "{fk.column.table.name}" ("{fk.column.name}")'
+        if fk.ondelete:
+            ddl += f" ON DELETE {fk.ondelete}"
+    return ddl
 
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
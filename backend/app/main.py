@@ -2,11 +2,21 @@
 
 import asyncio
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import admin, auth, chat, documents, users, summarize, compare
 from app.core.config import settings
 from app.db.session import init_db
 from app.core.startup import startup_tasks
+from app.services.artifact_renderer import artifact_renderer
+from app.services.backfills import backfill_runner
+from app.services.compare_batch import compare_batch_runner
+from app.services.ingestion import ingestion_runner
+from app.services.page_images import page_image_service
+from app.services.summary_batch import summary_batch_runner
+from app.services import llm_clients
+from app.utils.async_minio import async_minio
+from app.utils.process_pool import shutdown_process_pool
 
 app = FastAPI(
     title="GenAI Conversational Chatbot API",
@@ -42,16 +52,53 @@ async def startup_event():
         try:
             print(f"🔄 Initializing database (attempt {attempt+1}/{MAX_RETRIES})...")
             await init_db()
+            llm_clients.readiness["database"] = True
             print("✅ Database initialized successfully!")
             break
         except Exception as e:
             print(f"⏳ Database not ready yet: {e}")
             await asyncio.sleep(2)
 
+    await async_minio.start()
     await startup_tasks()
+    await summary_batch_runner.start()
+    await artifact_renderer.start()
+    await compare_batch_runner.start()
+    await ingestion_runner.start()
+    await backfill_runner.start()
+
+    # Load heavy models in the background; /ready reports when done
+    app.state.warmup_task = asyncio.create_task(llm_clients.warm_up())
     print("🚀 App started successfully!")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await summary_batch_runner.stop()
+    await compare_batch_runner.stop()
+    await artifact_renderer.stop()
+    await ingestion_runner.stop()
+    await backfill_runner.stop()
+    page_image_service.shutdown()
+
+    warmup_task = getattr(app.state, "warmup_task", None)
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
+
+    shutdown_process_pool()
+    await async_minio.close()
+
+
 @app.get("/health", tags=["Health"])
 async def root():
     return {"status": "ok", "message": "GenAI Chatbot API running 🚀"}
+
+
+@app.get("/ready", tags=["Health"])
+async def ready():
+    """Readiness probe: 200 only once the DB and models are loaded."""
+    ready = llm_clients.is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "starting", "checks": llm_clients.readiness},
+    )
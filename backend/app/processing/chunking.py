@@ -0,0 +1,276 @@
+# app/processing/chunking.py
+"""
+Token-bounded, structure-aware chunking for embeddings.
+
+Pages are broken into units (PDF blocks from extract_content, lines of
+text formats, records of CSV/JSON, otherwise paragraphs), every unit is
+measured with the embedding model's tokenizer in one batch call, and
+units are packed greedily into chunks of at most `max_tokens`, across page
+boundaries so tiny pages are merged; past half the budget a chunk ends at
+a content-defined point, so edits stay local. A heading never ends a
+chunk: it moves to the next one, together with its body. Final chunks are
+re-measured (again in one batch) and any that still overflow are split,
+so nothing is truncated by the model.
+
+`ChunkStream` does the same over pages that arrive in batches. Pure code:
+the token counter is passed in (`count_tokens(texts)` → token counts), so
+this module has no model dependency.
+"""
+
+import hashlib
+import json
+import re
+import zlib
+from typing import Callable, List
+
+TokenCounter = Callable[[List[str]], List[int]]
+
+UNIT_SEPARATOR = "\n\n"
+
+# Start a new chunk at a heading once the current one is at least this full
+HEADING_BREAK_FILL = 0.5
+
+# Past this fill a chunk also ends after any unit whose hash matches the
+# mask (~1 in 4), so boundaries depend on content rather than on everything
+# before them: an edit only changes the chunks around it, and re-indexing
+# a revision re-embeds just those (app.services.revisions)
+CONTENT_BREAK_FILL = 0.5
+CONTENT_BREAK_MASK = 0x3
+
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_SPLIT_POINT_RE = re.compile(r"(?<=[.!?;:])\s+|\n+|\s+")
+
+
+def chunk_hash(text: str) -> str:
+    """Content hash of a chunk (re-indexing reuses vectors of unchanged chunks)."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _text(content) -> str:
+    return content if isinstance(content, str) else json.dumps(content, ensure_ascii=False)
+
+
+def _units(pages: list) -> List[dict]:
+    """
+    {"page", "page_end", "lines", "records", "prefix", "joiner", "text",
+    "heading"} in reading order.
+    """
+    units = []
+
+    def add(page, text, heading=False, joiner=UNIT_SEPARATOR, **span):
+        text = text.strip()
+        if text:
+            units.append(
+                {
+                    "page": page,
+                    "page_end": page,
+                    "lines": span.get("lines"),
+                    "records": span.get("records"),
+                    "prefix": span.get("prefix"),
+                    "joiner": joiner,
+                    "text": text,
+                    "heading": heading,
+                }
+            )
+
+    for page in pages:
+        number = page["page"]
+        if page.get("records"):
+            # Structured formats: one unit per record; the header / JSON
+            # path heads the page content and is repeated on every chunk
+            first, prefix = page["records"][0], page.get("prefix")
+            rows = _text(page["content"]).split("\n")[1 if prefix is not None else 0 :]
+            for offset, row in enumerate(rows):
+                add(number, row, joiner="\n", records=[first + offset] * 2, prefix=prefix)
+        elif page.get("lines"):
+            # Line-oriented formats: one unit per source line, for exact citations
+            first = page["lines"][0]
+            for offset, line in enumerate(_text(page["content"]).split("\n")):
+                add(number, line, joiner="\n", lines=[first + offset] * 2)
+        elif page.get("blocks") is not None:
+            for block in page["blocks"]:
+                add(number, block["text"], heading=bool(block.get("heading")))
+        else:
+            for paragraph in _PARAGRAPH_RE.split(_text(page["content"])):
+                add(number, paragraph)
+    return units
+
+
+def _halves(text: str):
+    """Split near the middle, preferring sentence, line, then word boundaries."""
+    middle = len(text) // 2
+    best = None
+    for match in _SPLIT_POINT_RE.finditer(text):
+        if best is None or abs(match.start() - middle) < abs(best.start() - middle):
+            best = match
+    if best is None or best.start() == 0 or best.end() >= len(text):
+        return [text[:middle], text[middle:]]  # one long run without spaces
+    return [text[: best.start()], text[best.end() :]]
+
+
+def _fit(units: List[dict], count_tokens: TokenCounter, max_tokens: int) -> List[dict]:
+    """Set "tokens" on each unit, halving units over budget (order is kept)."""
+    for unit, tokens in zip(units, count_tokens([u["text"] for u in units]) if units else []):
+        unit["tokens"] = tokens
+
+    while True:
+        halves = {
+            i: [h for h in _halves(u["text"]) if h.strip()]
+            for i, u in enumerate(units)
+            if u["tokens"] > max_tokens and len(u["text"]) > 1
+        }
+        if not halves:
+            return units
+        counts = iter(count_tokens([h for parts in halves.values() for h in parts]))
+        rebuilt = []
+        for i, unit in enumerate(units):
+            if i not in halves:
+                rebuilt.append(unit)
+                continue
+            for part in halves[i]:
+                rebuilt.append({**unit, "text": part, "tokens": next(counts)})
+        units = rebuilt
+
+
+def _pack(units: List[dict], max_tokens: int, prefix_tokens: dict, current: List[dict] = ()):
+    """
+    Group units into chunks, continuing the open chunk `current`. Returns
+    (closed chunks, the still open last chunk).
+    """
+    current = list(current)
+    chunks, used = [], sum(u["tokens"] for u in current) + max(len(current) - 1, 0)
+
+    def budget(prefix):
+        return max_tokens - (prefix_tokens[prefix] + 1 if prefix is not None else 0)
+
+    for unit in units:
+        cost = unit["tokens"] + (1 if current else 0)
+        heading_break = unit["heading"] and used >= HEADING_BREAK_FILL * max_tokens
+        new_prefix = current and unit["prefix"] != current[0]["prefix"]
+        if current and (used + cost > budget(current[0]["prefix"]) or heading_break or new_prefix):
+            # Trailing headings move on with the body that follows them
+            carry = []
+            while len(current) > 1 and current[-1]["heading"]:
+                carry.insert(0, current.pop())
+            chunks.append(current)
+            current = carry
+            used = sum(u["tokens"] for u in current) + max(len(current) - 1, 0)
+            if current and used + unit["tokens"] + 1 > budget(unit["prefix"]):
+                chunks.append(current)
+                current, used = [], 0
+            cost = unit["tokens"] + (1 if current else 0)
+        current.append(unit)
+        used += cost
+        if (
+            not unit["heading"]
+            and used >= CONTENT_BREAK_FILL * budget(unit["prefix"])
+            and not zlib.crc32(unit["text"].encode("utf-8")) & CONTENT_BREAK_MASK
+        ):
+            chunks.append(current)
+            current, used = [], 0
+    return chunks, current
+
+
+def _span(group: List[dict], key: str):
+    if group[0][key] and group[-1][key]:
+        return [group[0][key][0], group[-1][key][1]]
+    return None
+
+
+def _join(group: List[dict]) -> str:
+    text = group[0]["text"] + "".join(u["joiner"] + u["text"] for u in group[1:])
+    prefix = group[0]["prefix"]
+    return text if prefix is None else f"{prefix}\n{text}"
+
+
+def _split_group(group: List[dict]) -> List[List[dict]]:
+    """Halve a chunk between its units, or a lone unit within its text."""
+    if len(group) > 1:
+        middle = len(group) // 2
+        return [group[:middle], group[middle:]]
+    return [[{**group[0], "text": h}] for h in _halves(group[0]["text"]) if h.strip()]
+
+
+class ChunkStream:
+    """
+    Incremental `chunk_pages` for pages that arrive in batches (streaming
+    ingestion): `feed()` returns the chunks that can no longer change and
+    keeps the open last chunk, which the next pages' units continue exactly
+    as a single pass would; `finish()` flushes it.
+    """
+
+    def __init__(self, count_tokens: TokenCounter, max_tokens: int):
+        self.count_tokens = count_tokens
+        self.max_tokens = max_tokens
+        self.prefix_tokens: dict = {}
+        self._open: List[dict] = []
+
+    def feed(self, pages: list) -> List[dict]:
+        units = _units(pages)
+        prefixes = list(
+            {u["prefix"] for u in units if u["prefix"] is not None} - self.prefix_tokens.keys()
+        )
+        if prefixes:
+            self.prefix_tokens.update(zip(prefixes, self.count_tokens(prefixes)))
+        # Records are fitted to what is left once the prefix is repeated
+        limit = (
+            self.max_tokens - max(self.prefix_tokens.values()) - 1
+            if self.prefix_tokens
+            else self.max_tokens
+        )
+        units = _fit(units, self.count_tokens, max(limit, 1))
+        # The open chunk is continued, not packed again: its units were
+        # already placed (e.g. headings carried over) exactly as one pass would
+        groups, self._open = _pack(units, self.max_tokens, self.prefix_tokens, self._open)
+        return self._emit(groups)
+
+    def finish(self) -> List[dict]:
+        groups, self._open = ([self._open] if self._open else []), []
+        return self._emit(groups)
+
+    def _emit(self, groups: List[List[dict]]) -> List[dict]:
+        counts = self.count_tokens([_join(g) for g in groups]) if groups else []
+        measured = list(zip(groups, counts))
+
+        # Joined text can tokenize differently; re-measure and split stragglers
+        # before joining again, so every piece keeps its header / JSON path
+        while True:
+            halves = {
+                i: _split_group(group)
+                for i, (group, tokens) in enumerate(measured)
+                if tokens > self.max_tokens and (len(group) > 1 or len(group[0]["text"]) > 1)
+            }
+            if not halves:
+                break
+            counts = iter(self.count_tokens([_join(p) for parts in halves.values() for p in parts]))
+            rebuilt = []
+            for i, item in enumerate(measured):
+                if i not in halves:
+                    rebuilt.append(item)
+                    continue
+                rebuilt.extend((part, next(counts)) for part in halves[i])
+            measured = rebuilt
+
+        return [
+            {
+                "page": group[0]["page"],
+                "page_end": group[-1]["page_end"],
+                "lines": _span(group, "lines"),
+                "records": _span(group, "records"),
+                "content": _join(group),
+                "tokens": tokens,
+            }
+            for group, tokens in measured
+        ]
+
+
+def chunk_pages(pages: list, count_tokens: TokenCounter, max_tokens: int) -> List[dict]:
+    """
+    Chunks of `pages` ([{"page", "content", "blocks"?, "lines"?,
+    "records"?, "prefix"?}]) as [{"page": first page, "page_end": last page,
+    "lines", "records", "content", "tokens"}]. "lines" / "records" are the
+    chunk's source line / record range for text / structured formats, else
+    None; a record chunk starts with its header or JSON path.
+    """
+    stream = ChunkStream(count_tokens, max_tokens)
+    return stream.feed(pages) + stream.finish()
@@ -0,0 +1,320 @@
+# app/processing/diff_engine.py
+"""
+Page-anchored document diff.
+
+1. Pages are hashed (after normalization) and aligned with a patience diff
+   over the hash sequences, so unchanged pages cost one hash each.
+2. Pages that changed are diffed line by line with a patience diff
+   (unique-line anchors + bounded fallback), which stays near-linear on
+   large inputs where difflib's worst case is quadratic.
+3. Lines replaced one-for-one get an intra-line word diff.
+
+Stdlib only on purpose: these functions run in spawned worker processes.
+"""
+
+import difflib
+import hashlib
+import re
+from bisect import bisect_left
+from typing import Any, Dict, List, Tuple
+
+ENGINE_VERSION = "page-patience-1"
+
+# Gaps without unique anchors larger than this (lines_a * lines_b) are
+# reported as a plain replace block instead of running SequenceMatcher.
+FALLBACK_CELLS = 250_000
+
+# Replaced line pairs below this similarity are a delete + add, not a modification
+MODIFICATION_RATIO = 0.5
+
+_WS = re.compile(r"\s+")
+
+
+# ----------------------------------------------
+# Normalization
+# ----------------------------------------------
+def normalize_line(line: str, options: Dict[str, Any]) -> str:
+    if options.get("ignoreFormatting", True):
+        line = _WS.sub(" ", line).strip()
+    if not options.get("caseSensitive", False):
+        line = line.lower()
+    return line
+
+
+def split_lines(text: str, options: Dict[str, Any]) -> List[str]:
+    lines = (text or "").splitlines()
+    if options.get("ignoreFormatting", True):
+        lines = [line for line in lines if line.strip()]
+    return lines
+
+
+def page_hash(lines: List[str], options: Dict[str, Any]) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for line in lines:
+        h.update(normalize_line(line, options).encode("utf-8"))
+        h.update(b"\n")
+    return h.hexdigest()
+
+
+# ----------------------------------------------
+# Patience diff
+# ----------------------------------------------
+def _unique_anchors(a, alo, ahi, b, blo, bhi) -> List[Tuple[int, int]]:
+    """Lines occurring exactly once in both ranges, as the LIS over b positions."""
+    counts: Dict[Any, List[int]] = {}
+    for i in range(alo, ahi):
+        entry = counts.setdefault(a[i], [0, 0, -1, -1])
+        entry[0] += 1
+        entry[2] = i
+    for j in range(blo, bhi):
+        entry = counts.get(b[j])
+        if entry is not None:
+            entry[1] += 1
+            entry[3] = j
+
+    pairs = sorted(
+        (e[2], e[3]) for e in counts.values() if e[0] == 1 and e[1] == 1
+    )
+    if not pairs:
+        return []
+
+    # Longest increasing subsequence on j (patience sorting)
+    tails: List[int] = []
+    tail_idx: List[int] = []
+    prev = [-1] * len(pairs)
+    for k, (_, j) in enumerate(pairs):
+        pos = bisect_left(tails, j)
+        if pos == len(tails):
+            tails.append(j)
+            tail_idx.append(k)
+        else:
+            tails[pos] = j
+            tail_idx[pos] = k
+        prev[k] = tail_idx[pos - 1] if pos > 0 else -1
+
+    lis = []
+    k = tail_idx[-1]
+    while k != -1:
+        lis.append(pairs[k])
+        k = prev[k]
+    lis.reverse()
+    return lis
+
+
+def patience_matches(a: List[Any], b: List[Any]) -> List[Tuple[int, int]]:
+    """Matched (i, j) index pairs between sequences `a` and `b`, ascending."""
+    matches: List[Tuple[int, int]] = []
+    stack = [(0, len(a), 0, len(b))]
+
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+
+        # Common prefix / suffix
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            matches.append((alo, blo))
+            alo += 1
+            blo += 1
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+            matches.append((ahi, bhi))
+
+        if alo >= ahi or blo >= bhi:
+            continue
+
+        anchors = _unique_anchors(a, alo, ahi, b, blo, bhi)
+        if anchors:
+            last_i, last_j = alo, blo
+            for i, j in anchors:
+                matches.append((i, j))
+                stack.append((last_i, i, last_j, j))
+                last_i, last_j = i + 1, j + 1
+            stack.append((last_i, ahi, last_j, bhi))
+            continue
+
+        # No unique anchors (repeated lines only): bounded fallback
+        if (ahi - alo) * (bhi - blo) <= FALLBACK_CELLS:
+            sm = difflib.SequenceMatcher(None, a[alo:ahi], b[blo:bhi], autojunk=False)
+            for block in sm.get_matching_blocks():
+                for k in range(block.size):
+                    matches.append((alo + block.a + k, blo + block.b + k))
+
+    matches.sort()
+    return matches
+
+
+def opcodes(a: List[Any], b: List[Any]) -> List[Tuple[str, int, int, int, int]]:
+    """difflib-style opcodes built from patience matches."""
+    ops = []
+    i = j = 0
+    for mi, mj in patience_matches(a, b) + [(len(a), len(b))]:
+        if i < mi and j < mj:
+            ops.append(("replace", i, mi, j, mj))
+        elif i < mi:
+            ops.append(("delete", i, mi, j, j))
+        elif j < mj:
+            ops.append(("insert", i, i, j, mj))
+
+        if mi < len(a) and mj < len(b):
+            if ops and ops[-1][0] == "equal" and ops[-1][2] == mi and ops[-1][4] == mj:
+                tag, i1, _, j1, _ = ops[-1]
+                ops[-1] = (tag, i1, mi + 1, j1, mj + 1)
+            else:
+                ops.append(("equal", mi, mi + 1, mj, mj + 1))
+        i, j = mi + 1, mj + 1
+    return ops
+
+
+# ----------------------------------------------
+# Word diff
+# ----------------------------------------------
+def word_diff(before: str, after: str) -> List[Dict[str, str]]:
+    a = before.split()
+    b = after.split()
+    out = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag == "equal":
+            out.append({"op": "equal", "text": " ".join(a[i1:i2])})
+            continue
+        if i2 > i1:
+            out.append({"op": "delete", "text": " ".join(a[i1:i2])})
+        if j2 > j1:
+            out.append({"op": "insert", "text": " ".join(b[j1:j2])})
+    return out
+
+
+# ----------------------------------------------
+# Page-level diff (runs in worker processes)
+# ----------------------------------------------
+def diff_page_pair(
+    page1: int, text1: str, page2: int, text2: str, options: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    """Line/word diff of two pages. Line numbers are 1-based within the page."""
+    lines1 = split_lines(text1, options)
+    lines2 = split_lines(text2, options)
+    norm1 = [normalize_line(line, options) for line in lines1]
+    norm2 = [normalize_line(line, options) for line in lines2]
+
+    changes = []
+
+    def addition(j):
+        changes.append(
+            {
+                "type": "addition",
+                "location": {"document": 2, "page": page2, "lineNumber": j + 1},
+                "content": lines2[j],
+            }
+        )
+
+    def deletion(i):
+        changes.append(
+            {
+                "type": "deletion",
+                "location": {"document": 1, "page": page1, "lineNumber": i + 1},
+                "content": lines1[i],
+            }
+        )
+
+    for tag, i1, i2, j1, j2 in opcodes(norm1, norm2):
+        if tag == "equal":
+            continue
+        if tag == "delete":
+            for i in range(i1, i2):
+                deletion(i)
+            continue
+        if tag == "insert":
+            for j in range(j1, j2):
+                addition(j)
+            continue
+
+        # replace: pair lines positionally, keep similar ones as modifications
+        paired = min(i2 - i1, j2 - j1)
+        for k in range(paired):
+            i, j = i1 + k, j1 + k
+            sm = difflib.SequenceMatcher(None, norm1[i], norm2[j], autojunk=False)
+            if sm.quick_ratio() >= MODIFICATION_RATIO and sm.ratio() >= MODIFICATION_RATIO:
+                changes.append(
+                    {
+                        "type": "modification",
+                        "location": {"document": 2, "page": page2, "lineNumber": j + 1},
+                        "content": {
+                            "before": lines1[i],
+                            "after": lines2[j],
+                            "beforeLocation": {"document": 1, "page": page1, "lineNumber": i + 1},
+                            "words": word_diff(lines1[i], lines2[j]),
+                        },
+                    }
+                )
+            else:
+                deletion(i)
+                addition(j)
+        for i in range(i1 + paired, i2):
+            deletion(i)
+        for j in range(j1 + paired, j2):
+            addition(j)
+
+    return changes
+
+
+def diff_page_pairs(pairs: List[Tuple[int, str, int, str]], options: Dict[str, Any]):
+    """Diff a chunk of page pairs — the unit of work sent to the process pool."""
+    out = []
+    for page1, text1, page2, text2 in pairs:
+        out.extend(diff_page_pair(page1, text1, page2, text2, options))
+    return out
+
+
+# ----------------------------------------------
+# Document-level alignment
+# ----------------------------------------------
+def align_pages(pages1: List[str], pages2: List[str], options: Dict[str, Any]):
+    """
+    Align pages by content hash.
+
+    Returns (modified_pairs, added_pages, deleted_pages, unchanged_count) with
+    1-based page numbers; modified_pairs is [(page1, text1, page2, text2)].
+    """
+    hashes1 = [page_hash(split_lines(p, options), options) for p in pages1]
+    hashes2 = [page_hash(split_lines(p, options), options) for p in pages2]
+
+    modified, added, deleted = [], [], []
+    unchanged = 0
+
+    for tag, i1, i2, j1, j2 in opcodes(hashes1, hashes2):
+        if tag == "equal":
+            unchanged += i2 - i1
+        elif tag == "delete":
+            deleted.extend(range(i1, i2))
+        elif tag == "insert":
+            added.extend(range(j1, j2))
+        else:
+            paired = min(i2 - i1, j2 - j1)
+            for k in range(paired):
+                modified.append((i1 + k + 1, pages1[i1 + k], j1 + k + 1, pages2[j1 + k]))
+            deleted.extend(range(i1 + paired, i2))
+            added.extend(range(j1 + paired, j2))
+
+    added_pages = [(j + 1, pages2[j]) for j in added]
+    deleted_pages = [(i + 1, pages1[i]) for i in deleted]
+    return modified, added_pages, deleted_pages, unchanged
+
+
+def whole_page_changes(added_pages, deleted_pages) -> List[Dict[str, Any]]:
+    changes = []
+    for page, text in deleted_pages:
+        changes.append(
+            {
+                "type": "deletion",
+                "location": {"document": 1, "page": page, "section": "page"},
+                "content": text,
+            }
+        )
+    for page, text in added_pages:
+        changes.append(
+            {
+                "type": "addition",
+                "location": {"document": 2, "page": page, "section": "page"},
+                "content": text,
+            }
+        )
+    return changes
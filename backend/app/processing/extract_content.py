@@ -1,24 +1,169 @@
+import io
 import os
-import json
+import zlib
 from pathlib import Path
-import fitz  # PyMuPDF
-from qdrant_client import QdrantClient
-from qdrant_client.models import PointStruct
-from uuid import uuid4
-from openai import OpenAI
 
-# Initialize OpenAI client (make sure OPENAI_API_KEY is set in your env)
-# openai_client = OpenAI()
+from app.processing.structured import iter_csv_records, iter_json_records
+
+# A block is a heading when its text is larger than the page's body text
+# by this factor, or entirely bold — and short
+HEADING_SIZE_RATIO = 1.15
+HEADING_MAX_CHARS = 200
+HEADING_MAX_LINES = 3
+BOLD_FLAG = 16
+
+
+def _pdf_page_blocks(page):
+    """
+    Page text (as get_text("text") gives it) and its text blocks,
+    [{"text", "heading"}], using PyMuPDF font sizes and flags.
+    """
+    blocks = []
+    size_chars = {}
+    for block in page.get_text("dict")["blocks"]:
+        if block.get("type") != 0:  # images
+            continue
+        lines, sizes, bold = [], [], True
+        for line in block["lines"]:
+            lines.append("".join(span["text"] for span in line["spans"]))
+            for span in line["spans"]:
+                if not span["text"].strip():
+                    continue
+                sizes.append(span["size"])
+                bold = bold and bool(span["flags"] & BOLD_FLAG)
+                size = round(span["size"], 1)
+                size_chars[size] = size_chars.get(size, 0) + len(span["text"])
+        blocks.append((lines, max(sizes, default=0), bold and bool(sizes)))
+
+    body_size = max(size_chars, key=size_chars.get) if size_chars else 0
+    content = "".join(line + "\n" for lines, _, _ in blocks for line in lines)
+    structured = []
+    for lines, size, bold in blocks:
+        text = "\n".join(lines)
+        short = len(text) <= HEADING_MAX_CHARS and len(lines) <= HEADING_MAX_LINES
+        larger = body_size and size >= body_size * HEADING_SIZE_RATIO
+        structured.append({"text": text, "heading": bool(short and (larger or bold))})
+    return content, structured
+
+
+# Line-oriented and structured formats are packed into pages of about this
+# many bytes. Past half the budget a page ends after any row whose hash
+# matches the mask (~1 in 16 rows), so boundaries depend on content and
+# an inserted row only changes the pages around it (diffs stay aligned).
+TEXT_PAGE_BYTES = 8 * 1024
+TEXT_PAGE_BREAK_MASK = 0xF
+
+
+def _pack_rows(rows, span_key: str, page_bytes: int = TEXT_PAGE_BYTES):
+    """
+    Yield pages of whole rows from (prefix, number, text) tuples:
+    {"page", "content", span_key: [first, last]} plus "prefix" when rows
+    have one (it heads the page content; a new prefix starts a new page).
+    """
+    page, buffer, size, first, last, current = 0, [], 0, None, None, None
+
+    def flush():
+        head = [current] if current is not None else []
+        entry = {"page": page, "content": "\n".join(head + buffer), span_key: [first, last]}
+        if current is not None:
+            entry["prefix"] = current
+        return entry
+
+    for prefix, number, text in rows:
+        if buffer and prefix != current:
+            page += 1
+            yield flush()
+            buffer, size = [], 0
+        if not buffer:
+            first, current = number, prefix
+        encoded = text.encode("utf-8")
+        buffer.append(text)
+        last = number
+        size += len(encoded) + 1
+        if size >= page_bytes or (
+            size >= page_bytes // 2 and not zlib.crc32(encoded) & TEXT_PAGE_BREAK_MASK
+        ):
+            page += 1
+            yield flush()
+            buffer, size = [], 0
+    if buffer:
+        page += 1
+        yield flush()
+
+
+def _text_rows(text):
+    for number, line in enumerate(text, start=1):
+        yield None, number, line.rstrip("\n")
+
+
+def file_extension(filename: str) -> str:
+    return Path(filename or "").suffix.lower().lstrip(".")
+
+
+def _source(file, filename: str | None):
+    """(filename, local path, bytes) of an UploadFile, bytes or a path."""
+    if hasattr(file, "filename"):
+        return file.filename, None, file.file.read()
+    if isinstance(file, bytes):
+        if not filename:
+            raise ValueError("filename must be provided when passing raw bytes")
+        return filename, None, file
+    if isinstance(file, (str, Path)):
+        # `filename` (when given) names the original upload, e.g. for cached files
+        return filename or os.path.basename(file), str(file), None
+    raise TypeError("file must be UploadFile, bytes, or a path")
+
+
+def iter_pages(file, filename: str | None = None):
+    """
+    Extracted pages of `file` one at a time (see `extract_content` for the
+    page format). Files are read incrementally, so a consumer that does not
+    keep the pages (streaming ingestion) holds one page in memory at a time.
+    """
+    filename, path, file_bytes = _source(file, filename)
+    extension = file_extension(filename)
+
+    if extension in {"txt", "log"}:
+        # Streamed line by line (universal newlines), never decoded whole
+        raw = open(path, "rb") if path else io.BytesIO(file_bytes)
+        with io.TextIOWrapper(raw, encoding="utf-8", errors="ignore") as text:
+            yield from _pack_rows(_text_rows(text), "lines")
+
+    elif extension in {"csv", "json"}:
+        # Records streamed and grouped under their header / JSON path
+        raw = open(path, "rb") if path else io.BytesIO(file_bytes)
+        with io.TextIOWrapper(raw, encoding="utf-8-sig", errors="ignore", newline="") as text:
+            records = iter_csv_records(text) if extension == "csv" else iter_json_records(text)
+            yield from _pack_rows(records, "records")
+
+    elif extension == "pdf":
+        import fitz  # PyMuPDF (imported lazily — heavy native module)
+
+        # From a path PyMuPDF reads the file directly, without a bytes copy
+        pdf = (
+            fitz.open(path, filetype="pdf")
+            if path
+            else fitz.open(stream=file_bytes, filetype="pdf")
+        )
+        with pdf as doc:
+            for i, page in enumerate(doc):
+                content, blocks = _pdf_page_blocks(page)
+                yield {"page": i + 1, "content": content, "blocks": blocks}
+
+    elif extension in {"jpg", "jpeg", "png"}:
+        # No OCR here — return raw indication only
+        yield {"page": 1, "content": "<IMAGE FILE - NO OCR>"}
+
+    else:
+        yield {"page": 1, "content": "<UNSUPPORTED FORMAT>"}
 
-# Initialize Qdrant client
-qdrant = QdrantClient(host="localhost", port=6333)
 
 def extract_content(file, filename: str | None = None):
     """
     Extracts content from:
     - UploadFile
     - bytes (memory buffer)
-    - local file path
+    - local file path (PDFs are opened in place)
 
     Returns only structured page-level content where applicable.
     Example:
@@ -26,62 +171,19 @@ def extract_content(file, filename: str | None = None):
         {"page": 1, "content": "..."},
         {"page": 2, "content": "..."}
     ]
+    PDF pages also carry "blocks" ([{"text", "heading"}]) for chunking;
+    txt/log lines are packed into pages that carry their line range
+    ("lines": [first, last]); csv/json records into pages that carry their
+    record range ("records") and header or JSON path ("prefix").
     """
-
-    import os, json
-    from pathlib import Path
-    import fitz  # PyMuPDF
-
-    # -----------------
-    # Determine input type
-    # -----------------
-    if hasattr(file, "filename"):                 
+    if hasattr(file, "filename"):
         filename = file.filename
-        file_bytes = file.file.read()             
-    elif isinstance(file, bytes):                 
-        file_bytes = file
-        if not filename:
-            raise ValueError("filename must be provided when passing raw bytes")
-    elif isinstance(file, (str, Path)):           
-        filename = os.path.basename(file)
-        with open(file, "rb") as f:
-            file_bytes = f.read()
-    else:
-        raise TypeError("file must be UploadFile, bytes, or a path")
-
-    extension = Path(filename).suffix.lower().lstrip(".")
-    page_data = []
-
-    # -----------------
-    # Extraction
-    # -----------------
-    if extension in {"txt", "csv", "log"}:
-        text = file_bytes.decode("utf-8", errors="ignore")
-        lines = text.splitlines()
-        page_data = [{"page": i + 1, "content": line} for i, line in enumerate(lines)]
-
-    elif extension == "json":
-        # JSON doesn't have pagination → wrap whole value in page 1
-        parsed = json.loads(file_bytes)
-        page_data = [{"page": 1, "content": parsed}]
-
-    elif extension == "pdf":
-        with fitz.open(stream=file_bytes, filetype="pdf") as doc:
-            page_data = [
-                {"page": i + 1, "content": page.get_text("text")}
-                for i, page in enumerate(doc)
-            ]
-
-    elif extension in {"jpg", "jpeg", "png"}:
-        # No OCR here — return raw indication only
-        page_data = [{"page": 1, "content": "<IMAGE FILE - NO OCR>"}]
-
-    else:
-        page_data = [{"page": 1, "content": "<UNSUPPORTED FORMAT>"}]
+    elif isinstance(file, (str, Path)):
+        filename = filename or os.path.basename(file)
 
     return {
-        "extension": extension,
-        "pages": page_data
+        "extension": file_extension(filename),
+        "pages": list(iter_pages(file, filename)),
     }
 
 # def process_text_and_save_to_qdrant(content: str, collection_name: str = "documents", chunk_size: int = 500):
@@ -0,0 +1,200 @@
+# app/processing/render_artifacts.py
+"""
+PDF artifacts for a finished comparison, rendered with PyMuPDF.
+
+- diff PDF: every change as a colored block (additions green, deletions
+  red, modifications yellow with before / after).
+- side-by-side PDF: both documents' extracted text page by page in two
+  columns, with changed lines highlighted.
+
+Runs in the shared process pool; fitz is imported inside the functions so
+the web process never loads it for this module.
+"""
+
+import textwrap
+from typing import Any, Dict, List, Tuple
+
+PAGE_W, PAGE_H = 595, 842  # A4 in points
+MARGIN = 36
+FONT = "helv"
+FONT_SIZE = 8
+LINE_H = 10.5
+
+COLORS = {
+    "addition": (0.80, 0.95, 0.80),
+    "deletion": (0.98, 0.82, 0.82),
+    "modification": (1.00, 0.95, 0.70),
+    "reworded": (1.00, 0.95, 0.70),
+    "moved": (0.82, 0.88, 1.00),
+}
+DEFAULT_COLOR = (0.92, 0.92, 0.92)
+
+
+def _wrap(text: str, width_pt: float) -> List[str]:
+    chars = max(int(width_pt / (FONT_SIZE * 0.5)), 10)
+    out = []
+    for line in (text or "").splitlines() or [""]:
+        out.extend(textwrap.wrap(line, chars) or [""])
+    return out
+
+
+class _Writer:
+    """
+    Line-by-line writer over fixed-size pages. Text and highlight rects are
+    buffered per page (TextWriter / Shape) and committed once, which is far
+    cheaper than one insert_text call per line.
+    """
+
+    def __init__(self, doc, title: str):
+        import fitz
+
+        self.fitz = fitz
+        self.doc = doc
+        self.title = title
+        self.font = fitz.Font(FONT)
+        self.page = None
+        self.y = 0.0
+        self._new_page()
+
+    def _new_page(self):
+        self.flush()
+        self.page = self.doc.new_page(width=PAGE_W, height=PAGE_H)
+        self.shape = self.page.new_shape()
+        self.text = self.fitz.TextWriter(self.page.rect)
+        self.text.append((MARGIN, MARGIN - 10), self.title, font=self.font, fontsize=9)
+        self.y = MARGIN + 6
+
+    def flush(self):
+        if self.page is None:
+            return
+        self.shape.commit(overlay=False)
+        self.text.write_text(self.page)
+        self.page = None
+
+    def ensure(self, lines: int):
+        if self.y + lines * LINE_H > PAGE_H - MARGIN:
+            self._new_page()
+
+    def line(self, text: str, x: float = MARGIN, fill=None, width: float = PAGE_W - 2 * MARGIN):
+        self.ensure(1)
+        if fill:
+            self.shape.draw_rect(self.fitz.Rect(x - 2, self.y - FONT_SIZE, x + width, self.y + 2.5))
+            self.shape.finish(color=None, fill=fill, width=0)
+        if text:
+            self.text.append((x, self.y), text, font=self.font, fontsize=FONT_SIZE)
+        self.y += LINE_H
+
+
+def _location(change: Dict[str, Any]) -> str:
+    loc = change.get("location") or {}
+    parts = [f"doc {loc.get('document')}", f"page {loc.get('page')}"]
+    if loc.get("lineNumber"):
+        parts.append(f"line {loc['lineNumber']}")
+    return ", ".join(parts)
+
+
+def render_diff_pdf(title: str, changes: List[Dict[str, Any]]) -> bytes:
+    import fitz
+
+    doc = fitz.open()
+    writer = _Writer(doc, title)
+    text_w = PAGE_W - 2 * MARGIN
+
+    if not changes:
+        writer.line("No differences found.")
+
+    for change in changes:
+        kind = change.get("type", "change")
+        fill = COLORS.get(kind, DEFAULT_COLOR)
+        content = change.get("content")
+
+        if isinstance(content, dict):
+            body = [("- ", content.get("before", "")), ("+ ", content.get("after", ""))]
+        else:
+            body = [("", str(content or ""))]
+
+        lines = [f"{kind.upper()}  ({_location(change)})  [{change.get('category', '')}]"]
+        for prefix, text in body:
+            lines.extend(prefix + wrapped for wrapped in _wrap(text, text_w))
+
+        writer.ensure(min(len(lines), 4))
+        for line in lines:
+            writer.line(line, fill=fill)
+        writer.y += LINE_H / 2
+
+    writer.flush()
+    data = doc.tobytes(garbage=3, deflate=True)
+    doc.close()
+    return data
+
+
+def _changed_lines(changes: List[Dict[str, Any]]) -> Dict[Tuple[int, int], Dict[int, str]]:
+    """{(document, page): {lineNumber | 0 for whole page: change type}}."""
+    marks: Dict[Tuple[int, int], Dict[int, str]] = {}
+    for change in changes:
+        kind = change.get("type")
+        loc = change.get("location") or {}
+        targets = [loc]
+        content = change.get("content")
+        if isinstance(content, dict) and content.get("beforeLocation"):
+            targets.append(content["beforeLocation"])
+        for target in targets:
+            if target.get("page") is None:
+                continue
+            key = (target.get("document"), target.get("page"))
+            marks.setdefault(key, {})[target.get("lineNumber") or 0] = kind
+    return marks
+
+
+def render_side_by_side_pdf(
+    names: Tuple[str, str], pages1: List[str], pages2: List[str], changes: List[Dict[str, Any]]
+) -> bytes:
+    import fitz
+
+    marks = _changed_lines(changes)
+    col_w = (PAGE_W - 2 * MARGIN - 12) / 2
+    x1, x2 = MARGIN, MARGIN + col_w + 12
+
+    doc = fitz.open()
+    for index in range(max(len(pages1), len(pages2))):
+        page_no = index + 1
+        columns = []
+        for document, pages in ((1, pages1), (2, pages2)):
+            text = pages[index] if index < len(pages) else ""
+            page_marks = marks.get((document, page_no), {})
+            whole = page_marks.get(0)
+            rows = []
+            for n, line in enumerate([t for t in text.splitlines() if t.strip()], start=1):
+                kind = page_marks.get(n) or whole
+                fill = COLORS.get(kind, DEFAULT_COLOR) if kind else None
+                rows.extend((w, fill) for w in _wrap(line, col_w))
+            columns.append(rows)
+
+        writer = _Writer(doc, f"Page {page_no}:  {names[0]}  |  {names[1]}")
+        left, right = columns
+        for k in range(max(len(left), len(right))):
+            writer.ensure(1)
+            y = writer.y
+            if k < len(left):
+                writer.line(left[k][0], x=x1, fill=left[k][1], width=col_w)
+                writer.y = y
+            if k < len(right):
+                writer.line(right[k][0], x=x2, fill=right[k][1], width=col_w)
+                writer.y = y
+            writer.y = y + LINE_H
+        writer.flush()
+
+    data = doc.tobytes(garbage=3, deflate=True)
+    doc.close()
+    return data
+
+
+def render_comparison_artifacts(
+    names: Tuple[str, str], pages1: List[str], pages2: List[str], changes: List[Dict[str, Any]]
+) -> Tuple[bytes, bytes]:
+    """Both artifacts in one worker call."""
+    title = f"Comparison: {names[0]} vs {names[1]}"
+    return (
+        render_diff_pdf(title, changes),
+        render_side_by_side_pdf(names, pages1, pages2, changes),
+    )
@@ -0,0 +1,57 @@
+# app/processing/render_pages.py
+"""
+PDF page → image rendering with PyMuPDF.
+
+Plain functions so they can run in a worker thread; the source is a local
+file path (preferred: PyMuPDF reads it without an in-memory copy) or PDF
+bytes. fitz (and Pillow, only needed for WebP) are imported inside the
+functions.
+"""
+
+from typing import List, Union
+
+FORMATS = {"png": "image/png", "webp": "image/webp"}
+WEBP_QUALITY = 80
+
+
+def _encode(pix, fmt: str) -> bytes:
+    if fmt == "png":
+        return pix.tobytes("png")
+    if fmt == "webp":
+        try:
+            from PIL import Image
+        except ImportError as e:
+            raise ValueError("WebP output requires Pillow") from e
+        import io
+
+        mode = "RGBA" if pix.alpha else "RGB"
+        image = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+        out = io.BytesIO()
+        image.save(out, format="WEBP", quality=WEBP_QUALITY, method=4)
+        return out.getvalue()
+    raise ValueError(f"Unsupported image format: {fmt}")
+
+
+def _open(source: Union[str, bytes]):
+    import fitz
+
+    if isinstance(source, str):
+        return fitz.open(source, filetype="pdf")
+    return fitz.open(stream=source, filetype="pdf")
+
+
+def render_page(source: Union[str, bytes], page: int, dpi: int, fmt: str = "png") -> bytes:
+    """Render one 1-based page. IndexError if the page does not exist."""
+    with _open(source) as pdf:
+        if page < 1 or page > len(pdf):
+            raise IndexError(f"Page {page} out of range. PDF has {len(pdf)} pages.")
+        return _encode(pdf[page - 1].get_pixmap(dpi=dpi), fmt)
+
+
+def render_pages(
+    source: Union[str, bytes], dpi: int, fmt: str = "png", max_pages: int = None
+) -> List[bytes]:
+    """Render the first `max_pages` pages (all by default), opening the PDF once."""
+    with _open(source) as pdf:
+        count = len(pdf) if max_pages is None else min(len(pdf), max_pages)
+        return [_encode(pdf[i].get_pixmap(dpi=dpi), fmt) for i in range(count)]
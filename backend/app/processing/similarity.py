@@ -0,0 +1,175 @@
+# app/processing/similarity.py
+"""
+Document similarity from word shingles.
+
+- `minhash_signature()` turns a document into NUM_PERM integers once, at
+  ingestion; comparing two stored signatures is O(NUM_PERM) regardless of
+  document size. `MinHashBuilder` computes the same signature while pages
+  stream past (streaming ingestion). A document without words has no
+  shingles and an empty signature: it is similar to nothing.
+- `jaccard()` / `containment()` work on full shingle sets and are the exact
+  (slower) verification mode.
+"""
+
+import hashlib
+import re
+from typing import Iterable, List, Optional, Set
+
+import numpy as np
+
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+SIGNATURE_VERSION = f"minhash-w{SHINGLE_SIZE}-p{NUM_PERM}"
+
+# LSH banding: 32 bands x 4 rows → candidates from Jaccard ≈ (1/32)^(1/4) ≈ 0.42 up
+LSH_BANDS = 32
+LSH_ROWS = NUM_PERM // LSH_BANDS
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_BLOCK = 8192  # shingles hashed per numpy block (bounds memory)
+
+# Fixed seed: signatures are persisted, so permutations must never change
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, (1 << 61) - 1, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, (1 << 61) - 1, size=NUM_PERM, dtype=np.uint64)
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def words(text: str) -> List[str]:
+    return _WORD.findall((text or "").lower())
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[int]:
+    """32-bit hashes of the document's word k-grams."""
+    tokens = words(text)
+    if 0 < len(tokens) < size:
+        # Short texts still get one shingle
+        tokens += [""] * (size - len(tokens))
+    out = set()
+    for i in range(len(tokens) - size + 1):
+        gram = " ".join(tokens[i : i + size]).encode("utf-8")
+        out.add(int.from_bytes(hashlib.blake2b(gram, digest_size=4).digest(), "little"))
+    return out
+
+
+def _fold(signature: np.ndarray, values: np.ndarray):
+    """Lower `signature` in place to the permuted minima of `values`."""
+    for start in range(0, len(values), _BLOCK):
+        block = values[start : start + _BLOCK, None]
+        hashed = ((block * _PERM_A + _PERM_B) % _MERSENNE_PRIME) & _MAX_HASH
+        np.minimum(signature, hashed.min(axis=0), out=signature)
+
+
+def minhash_signature(text_or_shingles) -> List[int]:
+    """
+    MinHash signature (NUM_PERM ints) of a text or a precomputed shingle
+    set; [] when there are no shingles.
+    """
+    shingle_set = (
+        shingles(text_or_shingles) if isinstance(text_or_shingles, str) else text_or_shingles
+    )
+    if not shingle_set:
+        return []
+    signature = np.full(NUM_PERM, _MAX_HASH, dtype=np.uint64)
+    _fold(signature, np.fromiter(shingle_set, dtype=np.uint64, count=len(shingle_set)))
+    return signature.tolist()
+
+
+class MinHashBuilder:
+    """
+    `minhash_signature(pages_text(pages))` computed one page at a time:
+    the signature is an elementwise minimum, so pages are folded in as they
+    stream past and only the last SHINGLE_SIZE - 1 words are kept to form
+    the shingles that span a page break.
+    """
+
+    def __init__(self, size: int = SHINGLE_SIZE):
+        self.size = size
+        self.words = 0
+        self._tail: List[str] = []
+        self._signature = np.full(NUM_PERM, _MAX_HASH, dtype=np.uint64)
+
+    def _add(self, tokens: List[str]):
+        grams = {
+            " ".join(tokens[i : i + self.size]) for i in range(len(tokens) - self.size + 1)
+        }
+        if grams:
+            values = [
+                int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=4).digest(), "little")
+                for g in grams
+            ]
+            _fold(self._signature, np.array(values, dtype=np.uint64))
+
+    def update(self, text: str):
+        new = words(text)
+        if not new:
+            return
+        self.words += len(new)
+        tokens = self._tail + new
+        self._add(tokens)
+        self._tail = tokens[-(self.size - 1) :] if self.size > 1 else []
+
+    def signature(self) -> List[int]:
+        if not self.words:
+            return []
+        if self.words < self.size:
+            # Short texts still get one shingle (as in `shingles()`)
+            self._add(self._tail + [""] * (self.size - self.words))
+        return self._signature.tolist()
+
+
+def pages_text(pages: Iterable[str]) -> str:
+    return "\n".join(p for p in pages if p)
+
+
+def estimate_jaccard(sig1: Optional[List[int]], sig2: Optional[List[int]]) -> float:
+    """Fraction of agreeing permutations ≈ Jaccard similarity of the shingle sets."""
+    if not sig1 or not sig2 or len(sig1) != len(sig2):
+        raise ValueError("Signatures must be non-empty and of equal length")
+    a = np.asarray(sig1, dtype=np.uint64)
+    b = np.asarray(sig2, dtype=np.uint64)
+    return float(np.mean(a == b))
+
+
+def lsh_buckets(signature: List[int], bands: int = LSH_BANDS) -> List[tuple]:
+    """
+    (band, bucket) keys for a signature. Two documents sharing any key are
+    near-duplicate candidates; the bucket is a signed 64-bit hash so it fits
+    a BIGINT column. An empty signature has no keys.
+    """
+    if not signature:
+        return []
+    rows = len(signature) // bands
+    keys = []
+    for band in range(bands):
+        chunk = signature[band * rows : (band + 1) * rows]
+        digest = hashlib.blake2b(
+            b",".join(str(v).encode() for v in chunk), digest_size=8
+        ).digest()
+        keys.append((band, int.from_bytes(digest, "little", signed=True)))
+    return keys
+
+
+def jaccard(s1: Set[int], s2: Set[int]) -> float:
+    if not s1 and not s2:
+        return 1.0
+    return len(s1 & s2) / len(s1 | s2)
+
+
+def containment(s1: Set[int], s2: Set[int]) -> float:
+    """How much of s1 is contained in s2 (asymmetric)."""
+    if not s1:
+        return 1.0
+    return len(s1 & s2) / len(s1)
+
+
+def exact_similarity(pages1: List[str], pages2: List[str]) -> dict:
+    s1 = shingles(pages_text(pages1))
+    s2 = shingles(pages_text(pages2))
+    return {
+        "jaccard": jaccard(s1, s2),
+        "containment1in2": containment(s1, s2),
+        "containment2in1": containment(s2, s1),
+    }
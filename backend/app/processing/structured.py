@@ -0,0 +1,185 @@
+# app/processing/structured.py
+"""
+Streaming record readers for structured exports (JSON, CSV).
+
+Both read a text stream incrementally and yield one record at a time as
+(prefix, number, text): `prefix` is what a chunk needs for context (the
+CSV header row, or the JSON path of the records), `number` locates the
+record for citations (CSV data row, 1-based; JSON array index, 0-based;
+ordinal for object members), and `text` is a single line. Memory is
+bounded by the largest single record, not the file.
+"""
+
+import csv
+import io
+import json
+import re
+from typing import Iterator, Tuple
+
+Record = Tuple[str, int, str]
+
+READ_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r"[ \t\r\n]*")
+
+# A decoded value this close to the end of the buffer, or followed by a
+# character that can only continue a number, may have been cut by a read
+# ("1." + "5" decodes as 1, "2e" + "-3" as 2): read more and decode again
+_NUMBER_CHARS = frozenset("0123456789.eE+-")
+_VALUE_TAIL = 4
+
+# Objects deeper than this are records themselves rather than walked into
+JSON_MAX_DEPTH = 3
+
+
+class JsonScanner:
+    """
+    Pull parser over a text stream: containers are walked character by
+    character, values are decoded one at a time with raw_decode on a
+    sliding buffer.
+    """
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        # Read at least as much as is buffered so one huge value is not
+        # re-parsed once per READ_SIZE
+        chunk = self.fp.read(max(READ_SIZE, len(self.buf) - self.pos))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character ("" at the end of the stream)."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def take(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"Invalid JSON: expected {char!r} near offset {self.pos}")
+        self.pos += 1
+
+    def value(self):
+        """(decoded value, its source text)."""
+        if not self.peek():
+            raise ValueError("Invalid JSON: unexpected end of data")
+        refilled = False
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                if self._fill():
+                    continue
+                raise ValueError(f"Invalid JSON: {e}") from e
+            following = self.buf[end : end + _VALUE_TAIL]
+            # (number characters only count once: if more data does not
+            # change the value, the document is invalid and take() says so)
+            cut = len(following) < _VALUE_TAIL or (
+                following[0] in _NUMBER_CHARS and not refilled
+            )
+            if cut and not self.eof and self._fill():
+                refilled = True
+                continue
+            raw = self.buf[self.pos : end]
+            self.pos = end
+            return value, raw
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _walk(scanner: JsonScanner, path: str, depth: int) -> Iterator[tuple]:
+    """(path, key, index, value, source text) of every record under `path`."""
+    char = scanner.peek()
+    if char == "[":
+        scanner.take("[")
+        if scanner.peek() == "]":
+            scanner.take("]")
+            return
+        index = 0
+        while True:
+            yield (path, None, index, *scanner.value())
+            index += 1
+            if scanner.peek() != ",":
+                scanner.take("]")
+                return
+            scanner.take(",")
+    elif char == "{" and depth < JSON_MAX_DEPTH:
+        scanner.take("{")
+        if scanner.peek() == "}":
+            scanner.take("}")
+            return
+        while True:
+            key, _ = scanner.value()
+            scanner.take(":")
+            if scanner.peek() in "[{":
+                yield from _walk(scanner, f"{path}.{key}", depth + 1)
+            else:
+                yield (path, key, None, *scanner.value())
+            if scanner.peek() != ",":
+                scanner.take("}")
+                return
+            scanner.take(",")
+    else:
+        yield (path, None, None, *scanner.value())
+
+
+def iter_json_records(fp) -> Iterator[Record]:
+    """
+    Records of a JSON document: elements of arrays (top-level or reached
+    through objects, e.g. {"data": {"items": [...]}} → "$.data.items"),
+    and scalar object members as `key: value` under their object's path.
+    """
+    scanner = JsonScanner(fp)
+    ordinals = {}
+    for path, key, index, value, raw in _walk(scanner, "$", 0):
+        if index is None:
+            index = ordinals.get(path, 0)
+            ordinals[path] = index + 1
+        # Source text as-is when already on one line (no re-serializing)
+        text = raw if "\n" not in raw and "\r" not in raw else _dumps(value)
+        if key is not None:
+            text = f"{_dumps(key)}: {text}"
+        yield path, index, text
+    if scanner.peek():
+        raise ValueError("Invalid JSON: trailing data after the document")
+
+
+def iter_csv_records(fp) -> Iterator[Record]:
+    """Data rows of a CSV stream (opened with newline=""), header as prefix."""
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="")
+
+    def line(row) -> str:
+        # One line per record: embedded newlines would break row citations
+        out.seek(0)
+        out.truncate()
+        writer.writerow(
+            [" ".join(f.splitlines()) if "\n" in f or "\r" in f else f for f in row]
+        )
+        return out.getvalue()
+
+    reader = csv.reader(fp)
+    header = next(reader, None)
+    if header is None:
+        return
+    prefix = line(header)
+    number = 0
+    # Blank rows are kept (as empty text) so row numbers stay exact
+    for number, row in enumerate(reader, start=1):
+        yield prefix, number, line(row)
+    if not number:
+        yield prefix, 0, ""  # header-only file: keep the header as content
@@ -0,0 +1,126 @@
+# app/services/artifact_renderer.py
+
+import asyncio
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db.crud import compare_crud
+from app.db.models import Comparison, Document
+from app.db.session import AsyncSessionLocal
+from app.processing.render_artifacts import render_comparison_artifacts
+from app.services.compare_service import document_pages
+from app.utils.async_minio import async_minio
+from app.utils.process_pool import run_in_process
+
+PDF_CONTENT_TYPE = "application/pdf"
+
+
+def artifact_keys(comparison_id) -> tuple:
+    return f"{comparison_id}/diff.pdf", f"{comparison_id}/side_by_side.pdf"
+
+
+async def artifact_urls(comparison: Comparison) -> dict:
+    """Fresh presigned URLs for a comparison's artifacts (None until ready)."""
+    if comparison.artifacts_status != "ready":
+        return {"diffUrl": None, "sideBySideUrl": None}
+
+    async def presign(uri):
+        bucket, object_name = uri.split("/", 1)
+        return await async_minio.generate_presigned_url(bucket, object_name)
+
+    diff_url, side_by_side_url = await asyncio.gather(
+        presign(comparison.diff_url), presign(comparison.side_by_side_url)
+    )
+    return {"diffUrl": diff_url, "sideBySideUrl": side_by_side_url}
+
+
+async def delete_artifacts(comparison: Comparison):
+    for uri in (comparison.diff_url, comparison.side_by_side_url):
+        if uri:
+            bucket, object_name = uri.split("/", 1)
+            await async_minio.delete_object(bucket, object_name)
+
+
+class ArtifactRenderer:
+    """
+    Renders diff / side-by-side PDFs after a comparison is stored.
+
+    Never on the request path: callers `submit()` a comparison id and return;
+    PyMuPDF runs in the shared process pool, bounded by `concurrency`, and
+    the results go to MINIO_COMPARISON_BUCKET. Comparisons still "pending"
+    at startup (e.g. after a restart) are re-submitted.
+    """
+
+    def __init__(self, concurrency: int):
+        self.concurrency = max(concurrency, 1)
+        self._semaphore: asyncio.Semaphore | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def start(self):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with AsyncSessionLocal() as db:
+            pending = await compare_crud.get_pending_artifact_ids(db)
+        for comparison_id in pending:
+            self.submit(comparison_id)
+        print(f"🖨️ Artifact renderer started, {len(pending)} comparison(s) pending")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def submit(self, comparison_id):
+        if self._semaphore is None:
+            raise RuntimeError("Artifact renderer is not started")
+        task = asyncio.create_task(self._render(comparison_id), name=f"render-{comparison_id}")
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _render(self, comparison_id):
+        async with self._semaphore:
+            async with AsyncSessionLocal() as db:
+                comparison = await db.get(Comparison, comparison_id)
+                if not comparison or comparison.artifacts_status != "pending":
+                    return
+
+                try:
+                    res = await db.execute(
+                        select(Document).where(
+                            Document.id.in_([comparison.document_id1, comparison.document_id2])
+                        )
+                    )
+                    documents = {doc.id: doc for doc in res.scalars().all()}
+                    doc1 = documents.get(comparison.document_id1)
+                    doc2 = documents.get(comparison.document_id2)
+                    if not doc1 or not doc2:
+                        raise ValueError("One or both documents not found")
+
+                    changes = [c async for c in compare_crud.stream_changes(db, comparison.id)]
+                    diff_pdf, side_by_side_pdf = await run_in_process(
+                        render_comparison_artifacts,
+                        (doc1.filename, doc2.filename),
+                        await document_pages(doc1, db),
+                        await document_pages(doc2, db),
+                        changes,
+                    )
+
+                    bucket = settings.MINIO_COMPARISON_BUCKET
+                    diff_key, side_by_side_key = artifact_keys(comparison.id)
+                    diff_uri, side_by_side_uri = await asyncio.gather(
+                        async_minio.upload_bytes(bucket, diff_key, diff_pdf, PDF_CONTENT_TYPE),
+                        async_minio.upload_bytes(
+                            bucket, side_by_side_key, side_by_side_pdf, PDF_CONTENT_TYPE
+                        ),
+                    )
+                    await compare_crud.set_artifacts(
+                        db, comparison.id, "ready", diff_uri, side_by_side_uri
+                    )
+                except Exception as e:
+                    await db.rollback()
+                    print(f"❌ Rendering artifacts for comparison {comparison_id} failed: {e}")
+                    await compare_crud.set_artifacts(db, comparison_id, "failed")
+
+
+artifact_renderer = ArtifactRenderer(concurrency=settings.ARTIFACT_RENDER_CONCURRENCY)
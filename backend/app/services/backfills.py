@@ -0,0 +1,108 @@
+# app/services/backfills.py
+
+import asyncio
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db.crud import doc_crud
+from app.db.models import Document
+from app.db.session import AsyncSessionLocal
+from app.processing.similarity import minhash_signature, pages_text
+from app.services.compare_service import document_pages
+
+
+async def backfill_pages(batch_size: int) -> int:
+    """
+    Move page text of documents stored before document_pages existed out of
+    meta_data["structure"] into document_pages, dropping the key so
+    document rows stay light.
+    """
+    done = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            res = await db.execute(
+                select(Document)
+                .where(Document.meta_data.has_key("structure"))
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            docs = res.scalars().all()
+            if not docs:
+                return done
+            for doc in docs:
+                meta = dict(doc.meta_data)
+                structure = meta.pop("structure") or {}
+                pages = [
+                    {"page": p.get("page") or number, "content": p.get("content") or ""}
+                    for number, p in enumerate(structure.get("pages") or [], start=1)
+                ]
+                if not await doc_crud.get_page_hashes(db, doc.id):
+                    await doc_crud.store_pages(db, doc.id, pages)
+                meta.setdefault("extension", structure.get("extension"))
+                doc.meta_data = meta
+                if doc.page_count is None:
+                    doc.page_count = len(pages)
+            await db.commit()
+        done += len(docs)
+
+
+async def backfill_signatures(batch_size: int) -> int:
+    """
+    MinHash signatures and LSH rows for documents stored before they were
+    computed at ingestion (minhash is SQL NULL; documents without words get
+    []). Rows are claimed with SKIP LOCKED so several app processes can
+    run this at once.
+    """
+    done = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            res = await db.execute(
+                select(Document)
+                .where(Document.minhash.is_(None))
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            docs = res.scalars().all()
+            if not docs:
+                return done
+            for doc in docs:
+                pages = await document_pages(doc, db)
+                doc.minhash = await asyncio.to_thread(minhash_signature, pages_text(pages))
+                await doc_crud.replace_lsh_rows(db, doc)
+            await db.commit()
+        done += len(docs)
+
+
+class BackfillRunner:
+    """
+    Brings rows stored by earlier versions up to date, in the background
+    after startup, so the API is available while they run.
+    """
+
+    def __init__(self, batch_size: int):
+        self.batch_size = max(batch_size, 1)
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run(), name="backfills")
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run(self):
+        # Pages first: signatures are computed from them
+        steps = (("page text", backfill_pages), ("similarity signatures", backfill_signatures))
+        for name, step in steps:
+            try:
+                done = await step(self.batch_size)
+            except Exception as e:
+                print(f"⚠️ Backfill of {name} failed: {e}")
+                continue
+            if done:
+                print(f"🔧 Backfilled {name} of {done} document(s)")
+
+
+backfill_runner = BackfillRunner(settings.BACKFILL_BATCH_SIZE)
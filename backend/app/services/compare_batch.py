@@ -0,0 +1,123 @@
+# app/services/compare_batch.py
+
+import asyncio
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db.crud import compare_crud
+from app.db.models import BatchJob, Document
+from app.db.session import AsyncSessionLocal
+from app.services.artifact_renderer import artifact_renderer
+from app.services.compare_service import (
+    documents_pages,
+    run_document_comparison,
+    store_result_changes,
+)
+
+BATCH_KIND = "compare"
+
+
+class CompareBatchRunner:
+    """
+    Executes batch comparisons in the background.
+
+    Every distinct (document1, document2, type) in a batch has one Comparison
+    row. Pairs run concurrently up to `concurrency`; the page diffs inside
+    each comparison go to the shared process pool, so the event loop only
+    coordinates. Each document (row and page text) is loaded once per batch,
+    however many pairs it appears in, and comparisons between the same two
+    contents are served by the comparison cache.
+    """
+
+    def __init__(self, concurrency: int):
+        self.concurrency = max(concurrency, 1)
+        self._semaphore: asyncio.Semaphore | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def start(self):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        # Pick up batches interrupted by a restart
+        async with AsyncSessionLocal() as db:
+            pending = await compare_crud.get_pending_batch_ids(db)
+        for batch_id in pending:
+            self.submit(batch_id)
+        print(
+            f"🧵 Compare batch runner started ({self.concurrency}), "
+            f"{len(pending)} batch(es) resumed"
+        )
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def submit(self, batch_id):
+        if self._semaphore is None:
+            raise RuntimeError("Compare batch runner is not started")
+        task = asyncio.create_task(self._run_batch(batch_id), name=f"compare-batch-{batch_id}")
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    # ---------------------------------------------------------
+    # Batch execution
+    # ---------------------------------------------------------
+    async def _run_batch(self, batch_id):
+        async with AsyncSessionLocal() as db:
+            job = await db.get(BatchJob, batch_id)
+            comparisons = await compare_crud.get_batch_comparisons(db, batch_id, pending_only=True)
+            if not job or not comparisons:
+                return
+
+            # Each document is loaded once, however many pairs it appears in
+            doc_ids = {c.document_id1 for c in comparisons} | {c.document_id2 for c in comparisons}
+            res = await db.execute(select(Document).where(Document.id.in_(doc_ids)))
+            documents = {doc.id: doc for doc in res.scalars().all()}
+            pages = await documents_pages(list(documents.values()), db)
+
+        options = (job.options or {}).get("comparison", {})
+        await asyncio.gather(
+            *[self._run_one(batch_id, cmp, documents, pages, options) for cmp in comparisons]
+        )
+
+        async with AsyncSessionLocal() as db:
+            counts = await compare_crud.refresh_batch_status(db, batch_id)
+        print(f"✅ Compare batch {batch_id} finished: {counts}")
+
+    async def _run_one(self, batch_id, comparison, documents, pages, options):
+        async with self._semaphore:
+            async with AsyncSessionLocal() as db:
+                await compare_crud.set_comparisons_status(db, [comparison.id], "processing")
+                await compare_crud.refresh_batch_status(db, batch_id)
+
+                doc1 = documents.get(comparison.document_id1)
+                doc2 = documents.get(comparison.document_id2)
+                try:
+                    if not doc1 or not doc2:
+                        raise ValueError("One or both documents not found")
+
+                    result = await run_document_comparison(
+                        doc1,
+                        doc2,
+                        comparison.comparison_type,
+                        options,
+                        db=db,
+                        prefer_processes=True,
+                        pages1=pages[doc1.id],
+                        pages2=pages[doc2.id],
+                    )
+                    await compare_crud.complete_comparison(
+                        db, comparison.id, result, result["cacheKey"]
+                    )
+                    await store_result_changes(db, comparison.id, result)
+                    await db.commit()
+                    artifact_renderer.submit(comparison.id)
+                except Exception as e:
+                    await db.rollback()
+                    print(f"❌ Batch comparison {comparison.id} failed: {e}")
+                    await compare_crud.fail_comparison(db, comparison.id, str(e))
+
+
+compare_batch_runner = CompareBatchRunner(concurrency=settings.COMPARE_BATCH_CONCURRENCY)
@@ -1,79 +1,173 @@
-import difflib
-import random
-from datetime import datetime
+import asyncio
+import re
+from datetime import datetime, timedelta
 from uuid import uuid4
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+from app.core.config import settings
+from app.db.crud import compare_crud, doc_crud
+from app.db.models import ComparisonCache
+from app.db.session import AsyncSessionLocal
+from app.processing.diff_engine import (
+    align_pages,
+    diff_page_pairs,
+    whole_page_changes,
+)
+from app.processing.similarity import (
+    SIGNATURE_VERSION,
+    estimate_jaccard,
+    exact_similarity,
+    minhash_signature,
+    pages_text,
+)
+from app.services.comparison_cache import (
+    ENGINE_VERSION,
+    cache_key,
+    document_content_hash,
+    eviction_due,
+    flip_change,
+    flip_summary,
+    options_hash,
+    result_size,
+)
+from app.services.semantic_compare import compare_semantic
+from app.utils.process_pool import run_in_process
 
 # ----------------------------------------------
-# Helper: Mock semantic categories
+# Helper: rule-based change categories
 # ----------------------------------------------
 CATEGORIES = ["financial", "timeline", "content", "structure"]
 
+_FINANCIAL = re.compile(
+    r"[$€£¥₹]|\d+(?:[.,]\d+)?\s?%|\b(usd|eur|gbp|price|fee|fees|amount|payment|cost|"
+    r"total|salary|invoice|tax|penalty|interest)\b",
+    re.IGNORECASE,
+)
+_TIMELINE = re.compile(
+    r"\b(19|20)\d{2}\b|\b\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}\b|"
+    r"\b(jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\b|"
+    r"\b(deadline|due|days?|weeks?|months?|years?|term|expir\w*|effective|renewal)\b",
+    re.IGNORECASE,
+)
+_HEADING = re.compile(
+    r"^\s*(\d+(\.\d+)*\.?|[ivxlc]+\.|chapter|section|article|appendix|schedule)\b",
+    re.IGNORECASE,
+)
+MAJOR_WORD_COUNT = 25
+
+# comparisonType values served by the semantic (vector) engine
+SEMANTIC_TYPES = {"content", "semantic"}
+
+# Below this many changed pages the diff runs in a thread; process
+# start-up and pickling would cost more than the diff itself.
+INLINE_PAGE_LIMIT = 4
+
 # ----------------------------------------------
-# Core comparison engine (mock or diff-based)
+# Core comparison engine (page-anchored diff)
 # ----------------------------------------------
 
 
+async def diff_pages(
+    pages1: List[str],
+    pages2: List[str],
+    options: Dict[str, Any],
+    inline_limit: int = INLINE_PAGE_LIMIT,
+) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Page-anchored diff, off the event loop.
+
+    Page alignment (hashing) is cheap and runs in a thread; changed page
+    pairs are split into tasks of COMPARE_PAGES_PER_TASK pages and diffed in
+    parallel on the process pool. Returns (changes, unchanged_page_count).
+    """
+    modified, added_pages, deleted_pages, unchanged = await asyncio.to_thread(
+        align_pages, pages1, pages2, options
+    )
+
+    if len(modified) <= inline_limit:
+        line_changes = await asyncio.to_thread(diff_page_pairs, modified, options)
+    else:
+        step = max(settings.COMPARE_PAGES_PER_TASK, 1)
+        tasks = [
+            run_in_process(diff_page_pairs, modified[i : i + step], options)
+            for i in range(0, len(modified), step)
+        ]
+        line_changes = [c for part in await asyncio.gather(*tasks) for c in part]
+
+    changes = whole_page_changes(added_pages, deleted_pages) + line_changes
+    changes.sort(
+        key=lambda c: (
+            c["location"].get("page") or 0,
+            c["location"].get("lineNumber") or 0,
+            c["location"]["document"],
+        )
+    )
+    return changes, unchanged
+
+
 async def compare_documents(
-    doc1_content: str,
-    doc2_content: str,
+    doc1_content: Union[str, List[str]],
+    doc2_content: Union[str, List[str]],
     comparison_type: str = "full",
     options: Dict[str, Any] = None,
+    signatures: Tuple[Optional[List[int]], Optional[List[int]]] = None,
+    documents: Tuple[Any, Any] = None,
+    prefer_processes: bool = False,
 ) -> Tuple[Dict[str, Any], Dict[str, int], list]:
     """
-    Compare two document contents and return structured differences.
+    Compare two documents (page lists, or plain text treated as one page)
+    and return structured differences.
+
+    `signatures` are the documents' stored MinHash signatures, if any.
+    `documents` (the Document rows) enable the semantic engine for
+    comparison types in SEMANTIC_TYPES. `prefer_processes` sends every
+    changed page to the process pool (batch mode, where many comparisons run
+    at once and threads would contend for the GIL).
     """
 
     options = options or {}
+    pages1 = [doc1_content] if isinstance(doc1_content, str) else list(doc1_content)
+    pages2 = [doc2_content] if isinstance(doc2_content, str) else list(doc2_content)
 
-    # 1️⃣ Simple diff using difflib for text comparison
-    diff = difflib.unified_diff(doc1_content.splitlines(), doc2_content.splitlines(), lineterm="")
+    # 1️⃣ Semantic chunk alignment, or page-anchored line/word diff
+    semantic_stats = {}
+    if comparison_type in SEMANTIC_TYPES and documents:
+        changes, semantic_stats = await compare_semantic(*documents)
+    else:
+        changes, _ = await diff_pages(
+            pages1, pages2, options, inline_limit=0 if prefer_processes else INLINE_PAGE_LIMIT
+        )
 
-    changes = []
-    additions = deletions = modifications = 0
+    additions = deletions = modifications = moved = 0
+    for change in changes:
+        change.setdefault("id", f"chg_{uuid4().hex[:6]}")
+        change["severity"], change["category"] = classify_change(change)
 
-    for i, line in enumerate(diff):
-        if line.startswith("+ ") and not line.startswith("+++"):
+        if change["type"] == "addition":
             additions += 1
-            changes.append(
-                {
-                    "id": f"chg_{uuid4().hex[:6]}",
-                    "type": "addition",
-                    "location": {"document": 2, "lineNumber": i},
-                    "content": line[2:],
-                    "severity": random.choice(["minor", "major"]),
-                    "category": random.choice(CATEGORIES),
-                }
-            )
-        elif line.startswith("- ") and not line.startswith("---"):
+        elif change["type"] == "deletion":
             deletions += 1
-            changes.append(
-                {
-                    "id": f"chg_{uuid4().hex[:6]}",
-                    "type": "deletion",
-                    "location": {"document": 1, "lineNumber": i},
-                    "content": line[2:],
-                    "severity": random.choice(["minor", "major"]),
-                    "category": random.choice(CATEGORIES),
-                }
-            )
-        elif line.startswith("! "):
+        elif change["type"] == "moved":
+            moved += 1
+        else:
             modifications += 1
 
-    total_changes = additions + deletions + modifications
+    total_changes = additions + deletions + modifications + moved
 
-    # 2️⃣ Mock similarity
-    similarity_score = round(random.uniform(0.75, 0.98), 2)
-    changes_percentage = round(100 - similarity_score * 100, 2)
+    # 2️⃣ Shingle similarity (stored MinHash signatures, or exact on request)
+    similarity = await score_similarity(pages1, pages2, options, signatures)
+    changes_percentage = round(100 - similarity["similarityScore"] * 100, 2)
 
     summary = {
         "totalChanges": total_changes,
         "additions": additions,
         "deletions": deletions,
         "modifications": modifications,
-        "similarityScore": similarity_score,
         "changesPercentage": changes_percentage,
+        **similarity,
     }
+    if semantic_stats:
+        summary.update(moved=moved, **semantic_stats)
 
     # 3️⃣ Count per category
     category_breakdown = {}
@@ -84,32 +178,190 @@ async def compare_documents(
     return summary, category_breakdown, changes
 
 
+async def score_similarity(
+    pages1: List[str],
+    pages2: List[str],
+    options: Dict[str, Any],
+    signatures: Tuple[Optional[List[int]], Optional[List[int]]] = None,
+) -> Dict[str, Any]:
+    """
+    Default: MinHash estimate from stored signatures — O(signature length).
+    `similarityMode="exact"`: exact Jaccard + containment over full shingle sets.
+    """
+    if options.get("similarityMode") == "exact":
+        exact = await asyncio.to_thread(exact_similarity, pages1, pages2)
+        return {
+            "similarityScore": round(exact["jaccard"], 4),
+            "similarityMethod": "exact-jaccard",
+            "containment": {
+                "document1InDocument2": round(exact["containment1in2"], 4),
+                "document2InDocument1": round(exact["containment2in1"], 4),
+            },
+        }
+
+    sig1, sig2 = signatures or (None, None)
+    if sig1 is None:
+        sig1 = await asyncio.to_thread(minhash_signature, pages_text(pages1))
+    if sig2 is None:
+        sig2 = await asyncio.to_thread(minhash_signature, pages_text(pages2))
+    if not sig1 or not sig2:
+        # A document without words has no signature; the exact score is trivial
+        return {
+            "similarityScore": 1.0 if sig1 == sig2 else 0.0,
+            "similarityMethod": "exact-jaccard",
+        }
+
+    return {
+        "similarityScore": round(estimate_jaccard(sig1, sig2), 4),
+        "similarityMethod": SIGNATURE_VERSION,
+    }
+
+
+def classify_change(change: Dict[str, Any]) -> Tuple[str, str]:
+    """Deterministic (severity, category) for a change, from its text."""
+    content = change.get("content")
+    if isinstance(content, dict):
+        # Modifications: judge by the words that actually changed
+        words = content.get("words") or []
+        text = " ".join(w["text"] for w in words if w["op"] != "equal") or content.get("after", "")
+        changed = sum(len(w["text"].split()) for w in words if w["op"] != "equal")
+        total = sum(len(w["text"].split()) for w in words) or 1
+        line = content.get("after", "")
+    else:
+        text = line = str(content or "")
+        changed = total = len(text.split())
+
+    if change["location"].get("section") == "page":
+        return "major", "structure"
+    if change["type"] == "moved":
+        return "minor", "structure"
+
+    if _FINANCIAL.search(text):
+        category = "financial"
+    elif _TIMELINE.search(text):
+        category = "timeline"
+    elif len(line) < 80 and (_HEADING.match(line) or (line.isupper() and len(line) > 3)):
+        category = "structure"
+    else:
+        category = "content"
+
+    major = (
+        category != "content"
+        or changed >= MAJOR_WORD_COUNT
+        or (isinstance(content, dict) and changed / total >= 0.5)
+    )
+    return ("major" if major else "minor"), category
+
+
+async def document_pages(document, db=None) -> List[str]:
+    """
+    Page texts of a Document, from document_pages. Rows stored before pages
+    were split out fall back to meta_data["structure"] (or a flat `text`).
+    """
+    if db is None:
+        async with AsyncSessionLocal() as session:
+            return await document_pages(document, session)
+
+    rows = await doc_crud.get_pages(db, document.id)
+    if rows:
+        return [content for _, content in rows]
+    return _legacy_pages(document)
+
+
+async def documents_pages(documents, db) -> Dict[Any, List[str]]:
+    """document_pages() of several documents, keyed by id, in one query."""
+    stored = await doc_crud.get_pages_of(db, [d.id for d in documents])
+    return {d.id: stored.get(d.id) or _legacy_pages(d) for d in documents}
+
+
+def _legacy_pages(document) -> List[str]:
+    meta = document.meta_data or {}
+    pages = (meta.get("structure") or {}).get("pages") or []
+    if pages:
+        return [
+            doc_crud.page_text(p.get("content"))
+            for p in sorted(pages, key=lambda p: p.get("page", 0))
+        ]
+
+    text = meta.get("text")
+    return [text] if text else []
+
+
 # ----------------------------------------------
 # Orchestrator function (to be used in router)
 # ----------------------------------------------
-async def run_document_comparison(document1, document2, comparison_type="full", options=None):
+async def run_document_comparison(
+    document1,
+    document2,
+    comparison_type="full",
+    options=None,
+    db=None,
+    prefer_processes=False,
+    pages1=None,
+    pages2=None,
+):
     """
-    Run comparison between two document objects.
-    document1, document2 should each have a `.meta_data['text']` or `.content` field.
+    Run comparison between two Document rows. Pages are loaded from
+    document_pages unless passed as `pages1` / `pages2` (batches load each
+    document once for all its pairs).
+
+    With `db`, results are looked up in / written to the content-addressed
+    comparison cache; `result["cacheKey"]` and `result["cached"]` report it.
+    A hit carries no change list: store_result_changes() copies the cached
+    comparison's rows to the comparison that records this result.
     """
 
-    content1 = (
-        document1.meta_data.get("text")
-        if hasattr(document1, "meta_data")
-        else document1.get("text")
-    )
-    content2 = (
-        document2.meta_data.get("text")
-        if hasattr(document2, "meta_data")
-        else document2.get("text")
-    )
+    options = options or {}
+    content1 = pages1 if pages1 is not None else await document_pages(document1, db)
+    content2 = pages2 if pages2 is not None else await document_pages(document2, db)
 
     if not content1 or not content2:
         raise ValueError("Documents must contain text for comparison.")
 
-    summary, category_breakdown, changes = await compare_documents(
-        content1, content2, comparison_type, options
-    )
+    key, flipped, computed, source = None, False, None, None
+    if db is not None:
+        hash1, hash2 = await asyncio.gather(
+            document_content_hash(document1, content1),
+            document_content_hash(document2, content2),
+        )
+        key, flipped = cache_key(hash1, hash2, comparison_type, options)
+        entry = await compare_crud.get_cache_entry(db, key)
+        if entry and entry.comparison_id:
+            source = {"copyFrom": entry.comparison_id, "flip": entry.source_flipped != flipped}
+            computed = flip_summary(entry.result) if flipped else dict(entry.result)
+            await compare_crud.record_cache_hit(db, key)
+
+    cached = computed is not None
+    if not cached:
+        summary, category_breakdown, changes = await compare_documents(
+            content1,
+            content2,
+            comparison_type,
+            options,
+            signatures=(getattr(document1, "minhash", None), getattr(document2, "minhash", None)),
+            documents=(document1, document2),
+            prefer_processes=prefer_processes,
+        )
+        computed = {"summary": summary, "categoryBreakdown": category_breakdown}
+
+        if db is not None:
+            source = {"flipped": flipped}
+            canonical = flip_summary(computed) if flipped else computed
+            await compare_crud.store_cache_entry(
+                db,
+                ComparisonCache(
+                    key=key,
+                    content_hash1=min(hash1, hash2),
+                    content_hash2=max(hash1, hash2),
+                    comparison_type=comparison_type,
+                    options_hash=options_hash(options),
+                    engine_version=ENGINE_VERSION,
+                    result=canonical,
+                    size_bytes=result_size(changes),
+                    hits=0,
+                    last_used_at=datetime.utcnow(),
+                ),
+            )
 
     result = {
         "id": str(uuid4()),
@@ -119,11 +371,51 @@ async def run_document_comparison(document1, document2, comparison_type="full",
         "status": "completed",
         "createdAt": datetime.utcnow().isoformat(),
         "completedAt": datetime.utcnow().isoformat(),
-        "summary": summary,
-        "changes": changes,
-        "categoryBreakdown": category_breakdown,
-        "diffUrl": f"https://storage.example.com/comparisons/{uuid4().hex}_diff.pdf",
-        "sideBySideUrl": f"https://storage.example.com/comparisons/{uuid4().hex}_sidebyside.pdf",
+        "summary": computed["summary"],
+        "categoryBreakdown": computed["categoryBreakdown"],
+        # Rendered in the background once the comparison is persisted
+        "diffUrl": None,
+        "sideBySideUrl": None,
+        "artifactsStatus": "pending",
+        "cacheKey": key,
+        "cached": cached,
     }
+    if not cached:
+        result["changes"] = changes
+    if source:
+        result["cacheSource"] = source
 
     return result
+
+
+async def store_result_changes(db, comparison_id, result):
+    """
+    Write the changes of a run_document_comparison() result as
+    `comparison_id`'s rows (caller commits). A cache hit copies the cached
+    comparison's rows in the database (flipped in batches when it was the
+    other way round); a miss inserts the computed changes and makes them the
+    cache entry's.
+    """
+    source = result.get("cacheSource") or {}
+    if source.get("copyFrom"):
+        if source["flip"]:
+            await compare_crud.copy_changes_flipped(
+                db, source["copyFrom"], comparison_id, flip_change
+            )
+        else:
+            await compare_crud.copy_changes(db, source["copyFrom"], comparison_id)
+        return
+
+    await compare_crud.store_changes(db, comparison_id, result.get("changes", []))
+    if result.get("cacheKey"):
+        await compare_crud.point_cache_entry(
+            db, result["cacheKey"], comparison_id, source.get("flipped", False)
+        )
+        if eviction_due():
+            evicted = await compare_crud.evict_cache_entries(
+                db,
+                settings.COMPARE_CACHE_MAX_ENTRIES,
+                timedelta(days=settings.COMPARE_CACHE_MAX_AGE_DAYS),
+            )
+            if evicted:
+                print(f"🧹 Evicted {evicted} comparison cache entries")
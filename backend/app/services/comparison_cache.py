@@ -0,0 +1,166 @@
+# app/services/comparison_cache.py
+"""
+Content-addressed cache for comparison results.
+
+A result depends only on the two documents' content, the comparison type,
+the options that change the output and the engine version — not on which
+Document rows (or which user) asked. The pair is keyed in canonical order
+so A↔B and B↔A share one entry; the reverse request gets a flipped copy.
+
+An entry holds the summary and points at the comparison whose
+comparison_changes rows hold the changes; a hit copies those rows in the
+database instead of carrying the change list through the application.
+"""
+
+import asyncio
+import copy
+import hashlib
+import json
+import time
+from typing import Any, Dict, List, Tuple
+
+from app.core.config import settings
+from app.processing.diff_engine import ENGINE_VERSION as DIFF_ENGINE_VERSION
+from app.processing.similarity import SIGNATURE_VERSION
+
+ENGINE_VERSION = f"{DIFF_ENGINE_VERSION}+{SIGNATURE_VERSION}+semantic-1"
+
+# Options that change the result (highlightChanges is presentation only)
+RESULT_OPTIONS = {
+    "ignoreFormatting": True,
+    "caseSensitive": False,
+    "similarityMode": "minhash",
+}
+
+
+def normalize_options(options: Dict[str, Any]) -> Dict[str, Any]:
+    options = options or {}
+    return {k: options.get(k, default) for k, default in sorted(RESULT_OPTIONS.items())}
+
+
+def _pages_hash(pages: List[str]) -> str:
+    h = hashlib.sha256()
+    for page in pages:
+        h.update(page.encode("utf-8"))
+        h.update(b"\f")
+    return "pages:" + h.hexdigest()
+
+
+async def document_content_hash(document, pages: List[str]) -> str:
+    """sha256 of the uploaded bytes, or of the extracted pages for older rows."""
+    stored = getattr(document, "content_hash", None)
+    if stored:
+        return stored
+    return await asyncio.to_thread(_pages_hash, pages)
+
+
+def cache_key(
+    hash1: str, hash2: str, comparison_type: str, options: Dict[str, Any]
+) -> Tuple[str, bool]:
+    """
+    Returns (key, flipped). `flipped` is True when the request order is the
+    reverse of the canonical (sorted) order the entry is stored in.
+    """
+    flipped = hash1 > hash2
+    lo, hi = (hash2, hash1) if flipped else (hash1, hash2)
+
+    engine = ENGINE_VERSION
+    if comparison_type in ("content", "semantic"):
+        # Semantic results depend on the stored vectors' model too
+        engine += f"+{settings.HUGGINGFACE_EMBEDDING_MODEL}"
+
+    material = json.dumps(
+        [lo, hi, comparison_type, normalize_options(options), engine], sort_keys=True
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest(), flipped
+
+
+def options_hash(options: Dict[str, Any]) -> str:
+    return hashlib.sha256(
+        json.dumps(normalize_options(options), sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+# ----------------------------------------------
+# Orientation
+# ----------------------------------------------
+_SWAP_TYPE = {"addition": "deletion", "deletion": "addition"}
+_SWAP_OP = {"insert": "delete", "delete": "insert"}
+
+
+def _flip_location(location: Dict[str, Any]) -> Dict[str, Any]:
+    location = dict(location)
+    location["document"] = 3 - location.get("document", 1)
+    return location
+
+
+def flip_summary(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Summary and category breakdown seen from the other side (doc2 → doc1)."""
+    result = copy.deepcopy(result)
+
+    summary = result.get("summary", {})
+    summary["additions"], summary["deletions"] = (
+        summary.get("deletions", 0),
+        summary.get("additions", 0),
+    )
+    containment = summary.get("containment")
+    if containment:
+        summary["containment"] = {
+            "document1InDocument2": containment.get("document2InDocument1"),
+            "document2InDocument1": containment.get("document1InDocument2"),
+        }
+    return result
+
+
+def flip_change(change: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    One change seen from the other side, in place. Flipped changes are
+    re-sorted by change_order() of their new location.
+    """
+    change["type"] = _SWAP_TYPE.get(change["type"], change["type"])
+    content = change.get("content")
+    if isinstance(content, dict) and "beforeLocation" in content:
+        new_location = _flip_location(content["beforeLocation"])
+        content["beforeLocation"] = _flip_location(change["location"])
+        change["location"] = new_location
+        content["before"], content["after"] = content.get("after"), content.get("before")
+        if "words" in content:
+            content["words"] = _flip_words(content["words"])
+    else:
+        change["location"] = _flip_location(change["location"])
+    return change
+
+
+def change_order(change: Dict[str, Any]) -> tuple:
+    """Result order of changes: (page, line, document)."""
+    location = change["location"]
+    return (location.get("page") or 0, location.get("lineNumber") or 0, location["document"])
+
+
+def _flip_words(words: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Swap insert/delete, keeping the delete-before-insert order of a replace."""
+    flipped = [{**w, "op": _SWAP_OP.get(w["op"], w["op"])} for w in words]
+    for k in range(len(flipped) - 1):
+        if flipped[k]["op"] == "insert" and flipped[k + 1]["op"] == "delete":
+            flipped[k], flipped[k + 1] = flipped[k + 1], flipped[k]
+    return flipped
+
+
+def result_size(result: Dict[str, Any]) -> int:
+    return len(json.dumps(result, default=str).encode("utf-8"))
+
+
+# ----------------------------------------------
+# Eviction
+# ----------------------------------------------
+EVICTION_INTERVAL = 60.0  # seconds between eviction passes (per process)
+_last_eviction = 0.0
+
+
+def eviction_due() -> bool:
+    global _last_eviction
+    now = time.monotonic()
+    if now - _last_eviction < EVICTION_INTERVAL:
+        return False
+    _last_eviction = now
+    return True
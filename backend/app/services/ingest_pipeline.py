@@ -0,0 +1,406 @@
+# app/services/ingest_pipeline.py
+"""
+Streaming ingestion pipeline.
+
+Extracted files flow through four stages that run concurrently and hand
+work over bounded asyncio queues:
+
+    extract ──pages──▶ chunk ──chunks──▶ embed ──vectors──▶ write
+    (thread)          (thread + DB)     (thread, batched)   (Qdrant, batched)
+
+- extract: pulls pages from `iter_pages` a few at a time in a worker thread.
+- chunk: stores pages in document_pages, folds them into the MinHash
+  signature and packs them into chunks (`ChunkStream`).
+- embed: micro-batches queued chunks (across documents) into one
+  `embed_documents` call of up to EMBED_BATCH_SIZE texts.
+- write: upserts vectors to Qdrant in batches of QDRANT_WRITE_BATCH.
+
+A full queue blocks its producer, so memory is bounded by the queue sizes
+rather than by document size, and the embedding model stays busy while
+the next pages are read and earlier vectors are written. Every stage
+records its work, idle and blocked time in `pipeline_metrics`
+(GET /admin/ingestion).
+
+A file that fails in any stage fails alone: its Document row (with its
+pages) and any vectors already written are removed before the commit.
+"""
+
+import asyncio
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.crud.doc_crud import lsh_rows, page_text, store_pages
+from app.db.models import Document, DocumentRevision
+from app.processing.chunking import ChunkStream, chunk_hash
+from app.processing.extract_content import file_extension, iter_pages
+from app.processing.similarity import MinHashBuilder
+from app.services.llm_clients import get_embedding_model, get_token_counter
+from app.utils.qdrant import delete_document_vectors, upsert_vectors
+
+STAGES = ("extract", "chunk", "embed", "write")
+
+# Pages pulled from the extractor per worker-thread hop
+PAGE_PULL = 8
+
+EMPTY_CONTENT_ERROR = "❌ Cannot process: structured content is empty or invalid."
+
+_DONE = object()  # end of stream, passed down every queue
+
+
+def chunk_payload(doc: Document, chunk: dict) -> dict:
+    """Qdrant payload of a chunk (`chunk["index"]` is its position in the document)."""
+    return {
+        "document_id": str(doc.id),
+        "owner_id": str(doc.owner_id),
+        "chunk_index": chunk["index"],
+        "chunk_hash": chunk_hash(chunk["content"]),
+        "page": chunk["page"],
+        "page_end": chunk["page_end"],
+        "lines": chunk["lines"],
+        "records": chunk["records"],
+        "filename": doc.filename,
+        "text": chunk["content"],
+    }
+
+
+# ==============================================================
+# Metrics
+# ==============================================================
+class StageMetrics:
+    """Work done by one stage, summed over every pipeline run."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0  # seconds working
+        self.starved = 0.0  # seconds waiting for input
+        self.blocked = 0.0  # seconds waiting on a full output queue (backpressure)
+        self.queue_peak = 0  # high-water mark of the output queue
+
+    def snapshot(self) -> dict:
+        total = self.busy + self.starved + self.blocked
+        return {
+            "items": self.items,
+            "busySeconds": round(self.busy, 3),
+            "starvedSeconds": round(self.starved, 3),
+            "blockedSeconds": round(self.blocked, 3),
+            "itemsPerBusySecond": round(self.items / self.busy, 1) if self.busy else None,
+            "utilization": round(self.busy / total, 3) if total else None,
+            "queuePeak": self.queue_peak,
+        }
+
+
+class PipelineMetrics:
+    def __init__(self):
+        self.stages = {name: StageMetrics(name) for name in STAGES}
+        self.runs = 0
+        self.active = 0
+        self.documents = 0
+        self.failed = 0
+
+    def snapshot(self) -> dict:
+        return {
+            "runs": self.runs,
+            "activeRuns": self.active,
+            "documents": self.documents,
+            "failedDocuments": self.failed,
+            "queueCapacity": {
+                "pages": settings.INGEST_PAGE_QUEUE,
+                "chunks": settings.INGEST_CHUNK_QUEUE,
+                "vectors": settings.INGEST_VECTOR_QUEUE,
+            },
+            "stages": {name: stage.snapshot() for name, stage in self.stages.items()},
+        }
+
+
+pipeline_metrics = PipelineMetrics()
+
+
+# ==============================================================
+# Pipeline
+# ==============================================================
+def first_revision(doc: Document) -> DocumentRevision:
+    """Revision record of a document as it was first ingested."""
+    return DocumentRevision(
+        document_id=doc.id,
+        revision=doc.revision or 1,
+        filename=doc.filename,
+        content_type=doc.content_type,
+        size=doc.size,
+        content_hash=doc.content_hash,
+        minio_uri=(doc.meta_data or {}).get("minio_uri"),
+        page_count=doc.page_count,
+        created_at=doc.uploaded_at,
+    )
+
+
+class _DocumentRun:
+    """Streaming state of one document while it moves through the stages."""
+
+    def __init__(self, doc: Document, entry: dict, chunks: ChunkStream):
+        self.doc = doc
+        self.entry = entry
+        self.chunks = chunks
+        self.minhash = MinHashBuilder()
+        self.pages = 0
+        self.chunk_index = 0
+        self.error = None
+
+    def fail(self, error: Exception):
+        if self.error is None:
+            print(f"❌ Ingesting {self.doc.filename} failed: {error}")
+            self.error = str(error)
+
+
+def _take(pages, count: int) -> list:
+    batch = []
+    for page in pages:
+        batch.append(page)
+        if len(batch) == count:
+            break
+    return batch
+
+
+class IngestPipeline:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.stages = pipeline_metrics.stages
+        self.pages = asyncio.Queue(settings.INGEST_PAGE_QUEUE)
+        self.chunks = asyncio.Queue(settings.INGEST_CHUNK_QUEUE)
+        self.vectors = asyncio.Queue(settings.INGEST_VECTOR_QUEUE)
+        self.runs: list[_DocumentRun] = []
+
+    async def run(self, entries: list) -> list:
+        """One (Document, None) or (None, error) per entry, in order."""
+        count_tokens, max_tokens = get_token_counter()
+        self.embedding_model = get_embedding_model()
+
+        # 1️⃣ Document rows first; page count and signature are set once the
+        # last page has streamed past (`document_id` is set when the id was
+        # reserved before the upload)
+        docs = [
+            Document(
+                id=entry.get("document_id") or uuid.uuid4(),
+                owner_id=uuid.UUID(str(entry["owner_id"])),
+                filename=entry["filename"],
+                content_type=entry["content_type"],
+                uploaded_at=datetime.utcnow(),
+                size=entry["size"],
+                meta_data={
+                    "extension": file_extension(entry["filename"]),
+                    **(entry.get("metadata") or {}),
+                },
+                page_count=0,
+                content_hash=entry.get("content_hash"),
+                revision=1,
+            )
+            for entry in entries
+        ]
+        self.db.add_all(docs)
+        await self.db.flush()
+        self.runs = [
+            _DocumentRun(doc, entry, ChunkStream(count_tokens, max_tokens))
+            for doc, entry in zip(docs, entries)
+        ]
+
+        # 2️⃣ All stages at once
+        pipeline_metrics.runs += 1
+        pipeline_metrics.active += 1
+        tasks = [
+            asyncio.create_task(self._extract()),
+            asyncio.create_task(self._chunk()),
+            asyncio.create_task(self._embed()),
+            asyncio.create_task(self._write()),
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self.db.rollback()
+            await self._drop_vectors([doc.id for doc in docs])
+            raise
+        finally:
+            pipeline_metrics.active -= 1
+
+        # 3️⃣ Failed files are removed (pages and LSH rows cascade) before the commit
+        failed = [r.doc.id for r in self.runs if r.error]
+        if failed:
+            await self.db.execute(delete(Document).where(Document.id.in_(failed)))
+        await self.db.commit()
+        await self._drop_vectors(failed)
+
+        pipeline_metrics.documents += len(self.runs)
+        pipeline_metrics.failed += len(failed)
+        return [(None, r.error) if r.error else (r.doc, None) for r in self.runs]
+
+    async def _drop_vectors(self, document_ids: list):
+        try:
+            await delete_document_vectors([str(d) for d in document_ids])
+        except Exception as e:
+            print(f"⚠️ Could not remove vectors of failed documents: {e}")
+
+    # ---------------------------------------------------------
+    # Queue helpers (timed for the stage metrics)
+    # ---------------------------------------------------------
+    async def _get(self, queue: asyncio.Queue, stage: StageMetrics):
+        started = time.monotonic()
+        item = await queue.get()
+        stage.starved += time.monotonic() - started
+        return item
+
+    async def _put(self, queue: asyncio.Queue, item, stage: StageMetrics):
+        started = time.monotonic()
+        await queue.put(item)
+        stage.blocked += time.monotonic() - started
+        stage.queue_peak = max(stage.queue_peak, queue.qsize())
+
+    async def _batch(self, queue: asyncio.Queue, stage: StageMetrics, size: int):
+        """
+        Micro-batch: waits for one item, then takes whatever else is already
+        queued up to `size`. (items, True once the end of stream was reached).
+        """
+        first = await self._get(queue, stage)
+        if first is _DONE:
+            return [], True
+        items = [first]
+        while len(items) < size:
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            if item is _DONE:
+                return items, True
+            items.append(item)
+        return items, False
+
+    # ---------------------------------------------------------
+    # Stages
+    # ---------------------------------------------------------
+    async def _extract(self):
+        """Pages of each file in turn → (run, pages); (run, None) ends a file."""
+        stage = self.stages["extract"]
+        for run in self.runs:
+            pages = iter_pages(run.entry["path"], run.entry["filename"])
+            while run.error is None:
+                started = time.monotonic()
+                try:
+                    batch = await asyncio.to_thread(_take, pages, PAGE_PULL)
+                except Exception as e:
+                    run.fail(e)
+                    break
+                finally:
+                    stage.busy += time.monotonic() - started
+                if not batch:
+                    break
+                stage.items += len(batch)
+                await self._put(self.pages, (run, batch), stage)
+            pages.close()
+            await self._put(self.pages, (run, None), stage)
+        await self._put(self.pages, _DONE, stage)
+
+    def _fold_pages(self, run: _DocumentRun, pages: list) -> list:
+        for page in pages:
+            run.minhash.update(page_text(page["content"]))
+        return run.chunks.feed(pages)
+
+    def _finish_document(self, run: _DocumentRun) -> list:
+        chunks = run.chunks.finish()
+        run.doc.minhash = run.minhash.signature()
+        return chunks
+
+    async def _chunk(self):
+        """Store and chunk pages → (run, chunk); seals each document at its end."""
+        stage = self.stages["chunk"]
+        while (item := await self._get(self.pages, stage)) is not _DONE:
+            run, pages = item
+            if run.error is not None:
+                continue
+
+            started = time.monotonic()
+            try:
+                if pages is None:
+                    if not run.pages:
+                        raise ValueError(EMPTY_CONTENT_ERROR)
+                    chunks = await asyncio.to_thread(self._finish_document, run)
+                    run.doc.page_count = run.pages
+                    self.db.add_all(lsh_rows(run.doc.id, run.doc.owner_id, run.doc.minhash))
+                    self.db.add(first_revision(run.doc))
+                else:
+                    chunks = await asyncio.to_thread(self._fold_pages, run, pages)
+            except Exception as e:
+                run.fail(e)
+                continue
+            finally:
+                stage.busy += time.monotonic() - started
+
+            if pages is not None:
+                # Database errors are not per-file: they end the whole run
+                started = time.monotonic()
+                await store_pages(self.db, run.doc.id, pages)
+                run.pages += len(pages)
+                stage.busy += time.monotonic() - started
+
+            stage.items += len(chunks)
+            for chunk in chunks:
+                chunk["index"] = run.chunk_index
+                run.chunk_index += 1
+                await self._put(self.chunks, (run, chunk), stage)
+        await self._put(self.chunks, _DONE, stage)
+
+    async def _embed(self):
+        """Micro-batches of chunks → (run, chunk, vector)."""
+        stage = self.stages["embed"]
+        done = False
+        while not done:
+            batch, done = await self._batch(self.chunks, stage, settings.EMBED_BATCH_SIZE)
+            batch = [(run, chunk) for run, chunk in batch if run.error is None]
+            if not batch:
+                continue
+
+            started = time.monotonic()
+            try:
+                vectors = await asyncio.to_thread(
+                    self.embedding_model.embed_documents, [chunk["content"] for _, chunk in batch]
+                )
+            except Exception as e:
+                for run, _ in batch:
+                    run.fail(e)
+                continue
+            finally:
+                stage.busy += time.monotonic() - started
+
+            stage.items += len(batch)
+            for (run, chunk), vector in zip(batch, vectors):
+                await self._put(self.vectors, (run, chunk, vector), stage)
+        await self._put(self.vectors, _DONE, stage)
+
+    async def _write(self):
+        """Batched upserts of embedded chunks, with page-aware payloads."""
+        stage = self.stages["write"]
+        done = False
+        while not done:
+            points, done = await self._batch(self.vectors, stage, settings.QDRANT_WRITE_BATCH)
+            points = [point for point in points if point[0].error is None]
+            if not points:
+                continue
+
+            started = time.monotonic()
+            try:
+                await upsert_vectors(
+                    vectors=[vector for _, _, vector in points],
+                    payloads=[chunk_payload(run.doc, chunk) for run, chunk, _ in points],
+                )
+            except Exception as e:
+                for run, _, _ in points:
+                    run.fail(e)
+                continue
+            finally:
+                stage.busy += time.monotonic() - started
+            stage.items += len(points)
@@ -0,0 +1,324 @@
+# app/services/ingestion.py
+
+import asyncio
+import hashlib
+import mimetypes
+import os
+import uuid
+import zipfile
+from contextlib import AsyncExitStack
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db.crud import batch_crud
+from app.db.models import BatchItem, BatchJob
+from app.db.session import AsyncSessionLocal
+from app.services.document_service import store_documents
+from app.services.page_images import page_image_service
+from app.utils.async_minio import STREAM_CHUNK, async_minio
+
+BATCH_KIND = "ingest"
+AWAITING_UPLOAD = "awaiting_upload"
+
+
+def staged_object_name(user_id, document_id, filename: str) -> str:
+    """Object key of an upload that lands in MinIO before it is ingested."""
+    return f"{user_id}/{document_id}/{filename}"
+
+
+def upload_expired(item: BatchItem) -> bool:
+    deadline = datetime.utcnow() - timedelta(seconds=settings.DIRECT_UPLOAD_EXPIRES_SECONDS)
+    return item.status == AWAITING_UPLOAD and item.updated_at < deadline
+
+
+def _hash_upload(path: str):
+    """(sha256, size) of a local copy of an upload."""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(STREAM_CHUNK):
+            hasher.update(chunk)
+    return hasher.hexdigest(), os.path.getsize(path)
+
+
+# ==============================================================
+# Staging (bulk uploads through the API)
+# ==============================================================
+# Files and ZIP entries are streamed one chunk at a time into MinIO (and
+# the blob cache the workers read from); archives are never unpacked to
+# memory or disk as a whole.
+
+
+def _is_archive(filename: str) -> bool:
+    return (filename or "").lower().endswith(".zip")
+
+
+def _archive_members(archive: zipfile.ZipFile):
+    return [
+        info
+        for info in archive.infolist()
+        if not info.is_dir()
+        and "__MACOSX/" not in info.filename
+        and not os.path.basename(info.filename).startswith(".")
+    ]
+
+
+async def _upload_chunks(upload):
+    while chunk := await upload.read(STREAM_CHUNK):
+        yield chunk
+
+
+async def _archive_chunks(archive: zipfile.ZipFile, info: zipfile.ZipInfo):
+    entry = await asyncio.to_thread(archive.open, info)
+    try:
+        while chunk := await asyncio.to_thread(entry.read, STREAM_CHUNK):
+            yield chunk
+    finally:
+        entry.close()
+
+
+async def plan_uploads(uploads) -> list:
+    """
+    One (filename, content type, size, chunk stream factory) per file to
+    stage: plain uploads as-is, ZIP archives expanded to their entries
+    (only the central directory is read here). ValueError for a bad archive.
+    """
+    plan = []
+    for upload in uploads:
+        if not _is_archive(upload.filename):
+            plan.append(
+                (
+                    upload.filename,
+                    upload.content_type,
+                    upload.size,
+                    lambda u=upload: _upload_chunks(u),
+                )
+            )
+            continue
+        try:
+            archive = await asyncio.to_thread(zipfile.ZipFile, upload.file)
+        except zipfile.BadZipFile as e:
+            raise ValueError(f"{upload.filename} is not a valid ZIP archive") from e
+        for info in _archive_members(archive):
+            filename = os.path.basename(info.filename)
+            plan.append(
+                (
+                    filename,
+                    mimetypes.guess_type(filename)[0] or "application/octet-stream",
+                    info.file_size,
+                    lambda a=archive, i=info: _archive_chunks(a, i),
+                )
+            )
+    return plan
+
+
+async def stage_files(user_id, plan: list) -> list:
+    """
+    Stream planned files to MINIO_DOCUMENT_BUCKET, a few at a time.
+    Returns one (source, error) per file; `source` is an item's meta_data
+    plus the reserved "documentId".
+    """
+    semaphore = asyncio.Semaphore(settings.UPLOAD_STAGE_CONCURRENCY)
+    max_bytes = settings.UPLOAD_MAX_MB * 1024 * 1024
+
+    async def stage(filename, content_type, size, chunks):
+        if size is not None and size > max_bytes:
+            return None, f"File exceeds {settings.UPLOAD_MAX_MB} MB"
+        document_id = uuid.uuid4()
+        source = {
+            "documentId": document_id,
+            "objectName": staged_object_name(user_id, document_id, filename),
+            "filename": filename,
+            "contentType": content_type,
+        }
+        async with semaphore:
+            try:
+                await async_minio.upload_stream(
+                    settings.MINIO_DOCUMENT_BUCKET,
+                    source["objectName"],
+                    chunks(),
+                    content_type,
+                    keep_local=True,
+                )
+            except Exception as e:
+                return None, str(e)
+        return source, None
+
+    return await asyncio.gather(*[stage(*entry) for entry in plan])
+
+
+class IngestionRunner:
+    """
+    Turns uploads staged in MINIO_DOCUMENT_BUCKET into documents.
+
+    Work items are BatchItems of kind "ingest": `result_id` is the document
+    id reserved at upload time and `meta_data` the staged object
+    ({"objectName", "filename", "contentType"}). Items wait in
+    "awaiting_upload" until the client confirms a direct upload; queued
+    items are processed by `workers` tasks, and unfinished ones are resumed
+    at startup.
+
+    Each worker takes up to `group_size` queued items at a time: files are
+    fetched concurrently, then streamed through one ingestion pipeline run
+    (`store_documents`) so embedding batches span the group.
+    """
+
+    def __init__(self, workers: int, group_size: int):
+        self.workers = max(workers, 1)
+        self.group_size = max(group_size, 1)
+        self.queue: asyncio.Queue | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self):
+        if self._tasks:
+            return
+        self.queue = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"ingest-{i}")
+            for i in range(self.workers)
+        ]
+
+        async with AsyncSessionLocal() as db:
+            deadline = datetime.utcnow() - timedelta(seconds=settings.DIRECT_UPLOAD_EXPIRES_SECONDS)
+            expired = await batch_crud.expire_items(
+                db, BATCH_KIND, AWAITING_UPLOAD, deadline, "Upload expired"
+            )
+            for batch_id in expired:
+                await batch_crud.refresh_batch_status(db, batch_id)
+            pending = await batch_crud.get_pending_item_ids(db, BATCH_KIND)
+        await self.enqueue(pending)
+        print(f"📥 Ingestion workers started ({self.workers}), {len(pending)} item(s) resumed")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def enqueue(self, item_ids):
+        if self.queue is None:
+            raise RuntimeError("Ingestion runner is not started")
+        for item_id in item_ids:
+            await self.queue.put(item_id)
+
+    # ---------------------------------------------------------
+    # Worker loop
+    # ---------------------------------------------------------
+    async def _worker(self, index: int):
+        while True:
+            group = [await self.queue.get()]
+            while len(group) < self.group_size:
+                try:
+                    group.append(self.queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+
+            try:
+                await self._ingest_group(group)
+            except Exception as e:
+                print(f"❌ Ingestion worker {index} failed on a group: {e}")
+                try:
+                    # Items already finished (or still awaiting their upload) keep their state
+                    async with AsyncSessionLocal() as db:
+                        batch_ids = await batch_crud.fail_unfinished_items(
+                            db, group, str(e), skip_statuses=(AWAITING_UPLOAD,)
+                        )
+                        for batch_id in batch_ids:
+                            await batch_crud.refresh_batch_status(db, batch_id)
+                except Exception as e:
+                    print(f"⚠️ Could not record the failed group of worker {index}: {e}")
+            finally:
+                for _ in group:
+                    self.queue.task_done()
+
+    async def _ingest_group(self, item_ids):
+        # Local copies stay pinned in the blob cache until the group is done
+        async with AsyncSessionLocal() as db, AsyncExitStack() as local_copies:
+            rows = (
+                await db.execute(
+                    select(BatchItem, BatchJob)
+                    .join(BatchJob, BatchJob.id == BatchItem.batch_id)
+                    .where(
+                        BatchItem.id.in_(item_ids),
+                        BatchItem.status != AWAITING_UPLOAD,
+                        BatchItem.status.notin_(batch_crud.TERMINAL_STATUSES),
+                    )
+                )
+            ).all()
+            if not rows:
+                return
+
+            await batch_crud.update_items(
+                db, [item.id for item, _ in rows], status="extracting", progress=10
+            )
+
+            # 1️⃣ Fetch + hash every file concurrently
+            fetched = await asyncio.gather(
+                *[self._fetch(item.meta_data or {}, local_copies) for item, _ in rows],
+                return_exceptions=True,
+            )
+
+            ready = []
+            for (item, job), result in zip(rows, fetched):
+                if isinstance(result, Exception):
+                    print(f"❌ Ingesting {(item.meta_data or {}).get('filename')} failed: {result}")
+                    await batch_crud.update_items(
+                        db, [item.id], status="failed", progress=100, error=str(result)
+                    )
+                else:
+                    ready.append((item, job, *result))
+
+            if ready:
+                await batch_crud.update_items(
+                    db, [item.id for item, *_ in ready], status="embedding", progress=40
+                )
+
+                # 2️⃣ One pipeline run (extract → chunk → embed → write) for the group
+                bucket = settings.MINIO_DOCUMENT_BUCKET
+                results = await store_documents(
+                    db,
+                    [
+                        {
+                            "owner_id": job.user_id,
+                            "filename": item.meta_data["filename"],
+                            "content_type": item.meta_data.get("contentType"),
+                            "path": path,
+                            "size": size,
+                            "metadata": {"minio_uri": f"{bucket}/{item.meta_data['objectName']}"},
+                            "content_hash": content_hash,
+                            "document_id": item.result_id,
+                        }
+                        for item, job, path, content_hash, size in ready
+                    ],
+                )
+
+                for (item, *_), (doc, error) in zip(ready, results):
+                    if error:
+                        await batch_crud.update_items(
+                            db, [item.id], status="failed", progress=100, error=error
+                        )
+                        continue
+                    if doc.meta_data.get("extension") == "pdf":
+                        page_image_service.prerender_thumbnails(doc)
+                    await batch_crud.update_items(
+                        db, [item.id], status="completed", progress=100, document_id=doc.id
+                    )
+
+            for batch_id in {item.batch_id for item, _ in rows}:
+                await batch_crud.refresh_batch_status(db, batch_id)
+
+    async def _fetch(self, source: dict, local_copies: AsyncExitStack):
+        """(local path, sha256, size) of a staged upload, kept until `local_copies` closes."""
+        path = await local_copies.enter_async_context(
+            async_minio.local_copy(settings.MINIO_DOCUMENT_BUCKET, source["objectName"])
+        )
+        if not path:
+            raise LookupError("Uploaded file not found in storage")
+        return (path, *await asyncio.to_thread(_hash_upload, path))
+
+
+ingestion_runner = IngestionRunner(
+    workers=settings.INGEST_WORKERS,
+    group_size=settings.INGEST_GROUP_SIZE,
+)
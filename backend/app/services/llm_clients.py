@@ -0,0 +1,129 @@
+# app/services/llm_clients.py
+"""
+Lazily constructed model clients.
+
+Importing LangChain / sentence-transformers (torch) / the Gemini SDK costs
+seconds, so nothing heavy is imported at module import time. Callers ask for
+a client with `get_llm()` / `get_embedding_model()` (and the embedding
+tokenizer with `get_token_counter()`); the first call builds it
+and later calls reuse it. `warm_up()` runs at startup in the background so
+the first real request does not pay the cost either.
+"""
+
+import asyncio
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from app.core.config import settings
+
+GEMINI_MODEL = "gemini-2.5-flash"
+
+_lock = threading.Lock()
+_llms = {}
+_embedding_model = None
+
+# Readiness flags reported by GET /ready
+readiness = {
+    "database": False,
+    "embedding_model": False,
+    "llm": False,
+    "warmup_error": None,
+    "warmup_seconds": None,
+}
+
+
+def get_llm(temperature: float = 0.2):
+    """Shared Gemini chat client (one per temperature)."""
+    llm = _llms.get(temperature)
+    if llm is not None:
+        return llm
+
+    with _lock:
+        if temperature not in _llms:
+            from langchain_google_genai import ChatGoogleGenerativeAI
+
+            load_dotenv()
+            api_key = os.getenv("GEMINI_API_KEY")
+            if not api_key:
+                raise RuntimeError("❌ GEMINI_API_KEY not found in environment variables.")
+
+            _llms[temperature] = ChatGoogleGenerativeAI(
+                model=GEMINI_MODEL,
+                google_api_key=api_key,
+                temperature=temperature,
+            )
+        return _llms[temperature]
+
+
+def get_embedding_model():
+    """Shared HuggingFace embedding model (loads torch on first call)."""
+    global _embedding_model
+    if _embedding_model is not None:
+        return _embedding_model
+
+    with _lock:
+        if _embedding_model is None:
+            from langchain_community.embeddings import HuggingFaceEmbeddings
+
+            _embedding_model = HuggingFaceEmbeddings(
+                model_name=settings.HUGGINGFACE_EMBEDDING_MODEL
+            )
+        return _embedding_model
+
+
+def get_token_counter():
+    """
+    (count_tokens(texts) -> token counts, max_tokens) for the embedding
+    model's own tokenizer; `max_tokens` is its window minus the special
+    tokens it adds. Falls back to a ~4 chars/token estimate when the model
+    exposes no tokenizer.
+    """
+    client = getattr(get_embedding_model(), "client", None)
+    tokenizer = getattr(client, "tokenizer", None)
+    window = getattr(client, "max_seq_length", None) or settings.EMBEDDING_MAX_TOKENS
+
+    if tokenizer is None:
+        return (lambda texts: [len(t) // 4 + 1 for t in texts]), window
+
+    def count_tokens(texts):
+        if not texts:
+            return []
+        encoded = tokenizer(list(texts), add_special_tokens=False, verbose=False)
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    special = (
+        tokenizer.num_special_tokens_to_add()
+        if hasattr(tokenizer, "num_special_tokens_to_add")
+        else 2
+    )
+    return count_tokens, window - special
+
+
+async def warm_up():
+    """
+    Build the heavy clients off the event loop so /health answers
+    immediately while /ready flips once everything is loaded.
+    """
+    start = time.time()
+    try:
+        model = await asyncio.to_thread(get_embedding_model)
+        await asyncio.to_thread(model.embed_query, "warm-up")
+        readiness["embedding_model"] = True
+
+        await asyncio.to_thread(get_llm)
+        readiness["llm"] = True
+    except Exception as e:
+        readiness["warmup_error"] = str(e)
+        print(f"⚠️ Warm-up failed: {e}")
+    finally:
+        readiness["warmup_seconds"] = round(time.time() - start, 2)
+
+    if readiness["warmup_error"] is None:
+        print(f"🔥 Models warmed up in {readiness['warmup_seconds']}s")
+
+
+def is_ready() -> bool:
+    return readiness["database"] and readiness["embedding_model"] and readiness["llm"]
@@ -0,0 +1,181 @@
+# app/services/page_images.py
+
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from app.core.config import settings
+from app.processing.render_pages import FORMATS, render_page, render_pages
+from app.utils.async_minio import async_minio
+from app.utils.disk_cache import DiskLRUCache
+
+# Bump when rendering output changes so cached images and ETags roll over
+RENDER_VERSION = "1"
+
+
+def image_key(document_id, page: int, dpi: int, fmt: str, revision: int = None) -> str:
+    # Revisions after the first get their own prefix (first-upload keys are unchanged)
+    folder = f"{document_id}/r{revision}" if revision and revision > 1 else f"{document_id}"
+    return f"{folder}/{page}-{dpi}-v{RENDER_VERSION}.{fmt}"
+
+
+def image_etag(document_id, page: int, dpi: int, fmt: str, revision: int = None) -> str:
+    """A revision's file never changes, so the key alone identifies the image."""
+    return f'"{image_key(document_id, page, dpi, fmt, revision).replace("/", "-")}"'
+
+
+class _MemoryLRU:
+    """Bytes LRU bounded by total size."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+
+    def get(self, key):
+        data = self._items.get(key)
+        if data is not None:
+            self._items.move_to_end(key)
+        return data
+
+    def put(self, key, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        old = self._items.pop(key, None)
+        if old is not None:
+            self._size -= len(old)
+        self._items[key] = data
+        self._size += len(data)
+        while self._size > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self._size -= len(evicted)
+
+
+class PageImageService:
+    """
+    Rendered PDF pages, cached by (document, page, dpi, format) in tiers:
+    memory LRU → local disk LRU → MinIO (MINIO_PAGE_IMAGE_BUCKET).
+
+    Misses render in a bounded thread pool (PyMuPDF releases the GIL while
+    rasterizing); concurrent requests for the same image share one render.
+    """
+
+    def __init__(self):
+        self.memory = _MemoryLRU(settings.PAGE_IMAGE_MEMORY_CACHE_MB * 1024 * 1024)
+        self.disk = DiskLRUCache(
+            settings.PAGE_IMAGE_CACHE_DIR, settings.PAGE_IMAGE_DISK_CACHE_MB * 1024 * 1024
+        )
+        self._executor: ThreadPoolExecutor | None = None
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=settings.PAGE_RENDER_WORKERS, thread_name_prefix="page-render"
+            )
+        return self._executor
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    def shutdown(self):
+        for task in self._tasks:
+            task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    # ---------------------------------------------------------
+    # Lookup
+    # ---------------------------------------------------------
+    async def get_image(self, document, page: int, dpi: int, fmt: str) -> bytes:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported image format: {fmt}")
+        key = image_key(document.id, page, dpi, fmt, document.revision)
+
+        data = self.memory.get(key)
+        if data is not None:
+            return data
+
+        # One lookup/render per key at a time; followers await the leader
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            data = await self._load_or_render(key, document, page, dpi, fmt)
+            future.set_result(data)
+            return data
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else is waiting
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _load_or_render(self, key, document, page, dpi, fmt) -> bytes:
+        data = await asyncio.to_thread(self.disk.get, key)
+        if data is None:
+            data = await async_minio.download_bytes(
+                settings.MINIO_PAGE_IMAGE_BUCKET, key, missing_ok=True
+            )
+            if data is not None:
+                await asyncio.to_thread(self.disk.put, key, data)
+
+        if data is None:
+            async with self._source_pdf((document.meta_data or {}).get("minio_uri")) as pdf_path:
+                data = await self._run(render_page, pdf_path, page, dpi, fmt)
+            await self._store(key, data, fmt)
+
+        self.memory.put(key, data)
+        return data
+
+    async def _store(self, key: str, data: bytes, fmt: str):
+        await asyncio.to_thread(self.disk.put, key, data)
+        await async_minio.upload_bytes(settings.MINIO_PAGE_IMAGE_BUCKET, key, data, FORMATS[fmt])
+
+    @asynccontextmanager
+    async def _source_pdf(self, minio_uri: str):
+        """Local path of the source PDF (disk blob cache in front of MinIO)."""
+        if not minio_uri:
+            raise LookupError("Document storage reference missing")
+        bucket, object_name = minio_uri.split("/", 1)
+        async with async_minio.local_copy(bucket, object_name) as pdf_path:
+            if not pdf_path:
+                raise LookupError("Failed retrieving document from storage")
+            yield pdf_path
+
+    # ---------------------------------------------------------
+    # Thumbnails at ingestion
+    # ---------------------------------------------------------
+    def prerender_thumbnails(self, document):
+        """
+        Render low-DPI thumbnails in the background (never on the request
+        path) from the local copy of the PDF, which uploads leave in the
+        blob cache.
+        """
+        minio_uri = (document.meta_data or {}).get("minio_uri")
+        task = asyncio.create_task(self._prerender(document.id, document.revision, minio_uri))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _prerender(self, document_id, revision, minio_uri: str):
+        dpi, fmt = settings.PAGE_THUMBNAIL_DPI, settings.PAGE_THUMBNAIL_FORMAT
+        try:
+            async with self._source_pdf(minio_uri) as pdf_path:
+                images = await self._run(
+                    render_pages, pdf_path, dpi, fmt, settings.PAGE_THUMBNAIL_MAX_PAGES
+                )
+            for page, data in enumerate(images, start=1):
+                await self._store(image_key(document_id, page, dpi, fmt, revision), data, fmt)
+            print(f"🖼️ Pre-rendered {len(images)} thumbnail(s) for document {document_id}")
+        except Exception as e:
+            print(f"⚠️ Thumbnail pre-rendering failed for document {document_id}: {e}")
+
+
+page_image_service = PageImageService()
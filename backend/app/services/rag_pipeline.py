@@ -1,6 +1,5 @@
 # app/services/rag_pipeline.py
 
-import os
 import logging
 import asyncio
 from typing import List, Tuple, Dict, Any
@@ -8,20 +7,12 @@ from typing import List, Tuple, Dict, Any
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
-
 from app.db.models import Document as DocumentModel
-from langchain_community.embeddings import HuggingFaceEmbeddings
+from app.services.llm_clients import get_embedding_model, get_llm
 from app.utils.qdrant import search_vectors
-from app.core.config import settings
+from app.utils.rate_limit import rate_limited
 
 from pydantic import BaseModel, Field
-from typing import List, Optional
 
 class Citation(BaseModel):
     context_id: int = Field(..., description="Context index referenced by the LLM")
@@ -50,7 +41,7 @@ async def run_rag_pipeline(
     # -----------------------------
     # 2️⃣ Embeddings
     # -----------------------------
-    embedding_model = HuggingFaceEmbeddings(model_name=settings.HUGGINGFACE_EMBEDDING_MODEL)
+    embedding_model = get_embedding_model()
     query_vector = await asyncio.to_thread(embedding_model.embed_query, user_message)
 
     # -----------------------------
@@ -93,15 +84,10 @@ async def run_rag_pipeline(
     # -----------------------------
     # 5️⃣ Configure LLM
     # -----------------------------
-    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-    if not GEMINI_API_KEY:
-        raise RuntimeError("❌ GEMINI_API_KEY missing.")
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.runnables import RunnablePassthrough
 
-    base_llm = llm or ChatGoogleGenerativeAI(
-        model="gemini-2.5-flash",
-        google_api_key=GEMINI_API_KEY,
-        temperature=0.1,
-    )
+    base_llm = llm or get_llm(temperature=0.1)
 
     structured_llm = base_llm.with_structured_output(RAGResponse)
 
@@ -141,7 +127,7 @@ Question: {question}
     # -----------------------------
     # 7️⃣ Execute LLM
     # -----------------------------
-    response: RAGResponse = await asyncio.to_thread(chain.invoke, user_message)
+    response: RAGResponse = await rate_limited(chain.ainvoke, user_message)
 
     # -----------------------------
     # 8️⃣ Map citations to Qdrant metadata
@@ -0,0 +1,197 @@
+# app/services/revisions.py
+"""
+Document revisions: re-indexing a document when its file is replaced.
+
+Only what changed is redone. Pages are diffed by hash against the stored
+pages and only changed ones are rewritten. The new revision is chunked in
+full (cheap next to embedding, and boundaries stay those a fresh upload
+would get), then chunks are matched by content hash against the
+document's vectors in Qdrant:
+
+- unchanged chunks keep their vector; payloads are updated when a chunk
+  moved (page, line range, position),
+- new chunks are embedded and upserted,
+- vectors of chunks that disappeared are deleted.
+
+All of it happens while the document row is locked, right before the
+commit, so concurrent revisions never interleave their index updates.
+
+Every revision is recorded in document_revisions with its diff.
+"""
+
+import asyncio
+import uuid
+from datetime import datetime
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.crud import doc_crud
+from app.db.models import Document, DocumentRevision
+from app.processing.chunking import chunk_hash, chunk_pages
+from app.processing.extract_content import extract_content
+from app.processing.similarity import minhash_signature, pages_text
+from app.services.ingest_pipeline import EMPTY_CONTENT_ERROR, chunk_payload, first_revision
+from app.services.llm_clients import get_embedding_model, get_token_counter
+from app.utils.qdrant import delete_points, scroll_document_points, set_payloads, upsert_vectors
+
+
+def revision_object_name(user_id, document_id, filename: str) -> str:
+    """Object key of a revision's file (earlier revisions' files are kept)."""
+    return f"{user_id}/{document_id}/revisions/{uuid.uuid4().hex}/{filename}"
+
+
+def _prepare(path: str, filename: str, count_tokens, max_tokens: int):
+    """(extension, pages, page hashes, chunks, MinHash) of a new revision (worker thread)."""
+    content = extract_content(path, filename=filename)
+    pages = content["pages"]
+    hashes = [doc_crud.page_hash(p["content"]) for p in pages]
+    chunks = chunk_pages(pages, count_tokens, max_tokens)
+    signature = minhash_signature(pages_text(doc_crud.page_text(p["content"]) for p in pages))
+    return content["extension"], pages, hashes, chunks, signature
+
+
+def _match_chunks(doc: Document, chunks: list, points: list):
+    """
+    Pair new chunks with existing points by content hash (in order, so
+    repeated chunks pair up one to one). Returns (payload updates for
+    reused points that moved, payloads of chunks to embed, ids of points
+    left over).
+    """
+    available = {}
+    for point_id, payload in points:
+        # Points written before payloads carried a hash are hashed from their text
+        key = payload.get("chunk_hash") or chunk_hash(payload.get("text") or "")
+        available.setdefault(key, []).append((point_id, payload))
+
+    moved, fresh = [], []
+    for index, chunk in enumerate(chunks):
+        chunk["index"] = index
+        payload = chunk_payload(doc, chunk)
+        matches = available.get(payload["chunk_hash"])
+        if not matches:
+            fresh.append(payload)
+            continue
+        point_id, old = matches.pop(0)
+        if any(old.get(key) != value for key, value in payload.items()):
+            moved.append((point_id, {k: v for k, v in payload.items() if k != "text"}))
+
+    removed = [point_id for matches in available.values() for point_id, _ in matches]
+    return moved, fresh, removed
+
+
+async def _embed_and_upsert(payloads: list, written: list):
+    """Embed and store new chunks, collecting point ids in `written` as they are sent."""
+    model = get_embedding_model()
+    vectors = []
+    for start in range(0, len(payloads), settings.EMBED_BATCH_SIZE):
+        batch = payloads[start : start + settings.EMBED_BATCH_SIZE]
+        vectors += await asyncio.to_thread(model.embed_documents, [p["text"] for p in batch])
+
+    for start in range(0, len(payloads), settings.QDRANT_WRITE_BATCH):
+        end = start + settings.QDRANT_WRITE_BATCH
+        ids = [str(uuid.uuid4()) for _ in payloads[start:end]]
+        written += ids
+        await upsert_vectors(vectors=vectors[start:end], payloads=payloads[start:end], ids=ids)
+
+
+async def apply_revision(db: AsyncSession, doc_id, upload: dict) -> dict:
+    """
+    Make `upload` ({"filename", "content_type", "path", "size",
+    "content_hash", "minio_uri"}; `path` is a local copy) the document's
+    next revision. LookupError if the document is gone, ValueError if the
+    file has no content.
+    """
+    count_tokens, max_tokens = get_token_counter()
+    extension, pages, hashes, chunks, signature = await asyncio.to_thread(
+        _prepare, upload["path"], upload["filename"], count_tokens, max_tokens
+    )
+    if not pages:
+        raise ValueError(EMPTY_CONTENT_ERROR)
+
+    # One revision at a time per document: the row stays locked until commit
+    doc = await doc_crud.lock_document(db, doc_id)
+    if doc is None:
+        raise LookupError("Document not found")
+    revision = (doc.revision or 1) + 1
+    if not await doc_crud.get_revisions(db, doc.id):
+        # Documents ingested before revisions were recorded
+        db.add(first_revision(doc))
+
+    written, restore = [], []
+    try:
+        # 1️⃣ Pages: rewrite only those whose text changed
+        stored = await doc_crud.get_page_hashes(db, doc.id)
+        changed = [p for p, h in zip(pages, hashes) if stored.get(p["page"]) != h]
+        removed_pages = sorted(n for n in stored if n > len(pages))
+        await doc_crud.replace_pages(db, doc.id, changed, len(pages))
+
+        # 2️⃣ Chunks: reuse vectors of unchanged text, embed the rest
+        doc.filename = upload["filename"]
+        points = await scroll_document_points(str(doc.id))
+        moved, fresh, removed = _match_chunks(doc, chunks, points)
+        await _embed_and_upsert(fresh, written)
+
+        doc.revision = revision
+        doc.content_type = upload["content_type"]
+        doc.size = upload["size"]
+        doc.content_hash = upload["content_hash"]
+        doc.page_count = len(pages)
+        doc.minhash = signature
+        doc.meta_data = {
+            **(doc.meta_data or {}),
+            "extension": extension,
+            "minio_uri": upload["minio_uri"],
+        }
+        await doc_crud.replace_lsh_rows(db, doc)
+
+        # 3️⃣ Index: move reused chunks and drop stale ones before the lock
+        # is released (stale points go last: they cannot be restored)
+        previous = dict(points)
+        for start in range(0, len(moved), settings.QDRANT_WRITE_BATCH):
+            batch = moved[start : start + settings.QDRANT_WRITE_BATCH]
+            restore += [
+                (point_id, {k: previous[point_id][k] for k in payload if k in previous[point_id]})
+                for point_id, payload in batch
+            ]
+            await set_payloads(batch)
+        await delete_points(removed)
+
+        changes = {
+            "pagesChanged": [p["page"] for p in changed],
+            "pagesRemoved": removed_pages,
+            "chunksEmbedded": len(fresh),
+            "chunksReused": len(chunks) - len(fresh),
+            "chunksMoved": len(moved),
+            "chunksRemoved": len(removed),
+        }
+        db.add(
+            DocumentRevision(
+                document_id=doc.id,
+                revision=revision,
+                filename=doc.filename,
+                content_type=doc.content_type,
+                size=doc.size,
+                content_hash=doc.content_hash,
+                minio_uri=upload["minio_uri"],
+                page_count=doc.page_count,
+                changes=changes,
+                created_at=datetime.utcnow(),
+            )
+        )
+        await db.commit()
+    except BaseException:
+        await db.rollback()
+        try:
+            await delete_points(written)
+            for start in range(0, len(restore), settings.QDRANT_WRITE_BATCH):
+                await set_payloads(restore[start : start + settings.QDRANT_WRITE_BATCH])
+        except Exception as e:
+            print(f"⚠️ Could not undo vector changes of failed revision {revision} of {doc_id}: {e}")
+        raise
+
+    print(
+        f"🔁 Document {doc_id} → revision {revision}: {len(changed)} page(s) rewritten, "
+        f"{len(fresh)}/{len(chunks)} chunk(s) embedded, {len(removed)} vector(s) removed"
+    )
+    return {"document": doc, "revision": revision, "changes": changes}
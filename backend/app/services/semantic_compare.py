@@ -0,0 +1,251 @@
+# app/services/semantic_compare.py
+"""
+Semantic comparison: aligns the two documents' chunks using the vectors
+already stored in Qdrant (nothing is re-embedded).
+
+Chunks are matched greedily on cosine similarity inside page windows
+(blocking), so the work is a set of small matrix products instead of one
+n1 x n2 matrix; leftovers get one global pass to catch passages that moved
+far away. Matched pairs out of order are "moved", matched pairs whose text
+differs are "reworded", and unmatched chunks are added / removed.
+"""
+
+import asyncio
+from bisect import bisect_left
+from typing import Any, Dict, List, Tuple
+from uuid import uuid4
+
+import numpy as np
+from qdrant_client.http import models as qmodels
+
+from app.core.config import settings
+from app.utils.qdrant import async_qdrant
+
+MATCH_THRESHOLD = 0.80  # below this two chunks are unrelated
+SAME_THRESHOLD = 0.985  # at/above this (and same text) a chunk is unchanged
+PAGE_WINDOW = 3  # pages on each side searched for a counterpart
+LEFTOVER_BLOCK = 2048  # rows per block in the global leftover pass
+
+
+# ----------------------------------------------
+# Load stored chunk vectors
+# ----------------------------------------------
+async def fetch_document_chunks(owner_id, document_id) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+    """All chunks of a document (payload + vector), ordered by chunk_index."""
+    filter_condition = qmodels.Filter(
+        must=[
+            qmodels.FieldCondition(key="owner_id", match=qmodels.MatchValue(value=str(owner_id))),
+            qmodels.FieldCondition(
+                key="document_id", match=qmodels.MatchValue(value=str(document_id))
+            ),
+        ]
+    )
+
+    points = []
+    next_page = None
+    while True:
+        batch, next_page = await async_qdrant.scroll(
+            collection_name=settings.QDRANT_COLLECTION_NAME,
+            scroll_filter=filter_condition,
+            limit=512,
+            with_payload=["chunk_index", "page", "text"],
+            with_vectors=True,
+            offset=next_page,
+        )
+        points.extend(p for p in batch if p.vector is not None and p.payload)
+        if next_page is None:
+            break
+
+    points.sort(key=lambda p: p.payload.get("chunk_index", 0))
+    meta = [
+        {
+            "chunk_index": p.payload.get("chunk_index"),
+            "page": p.payload.get("page"),
+            "text": p.payload.get("text", ""),
+        }
+        for p in points
+    ]
+    vectors = np.asarray([p.vector for p in points], dtype=np.float32)
+    return meta, vectors
+
+
+# ----------------------------------------------
+# Alignment (pure numpy, runs in a thread)
+# ----------------------------------------------
+def _unit(v: np.ndarray) -> np.ndarray:
+    if v.size == 0:
+        return v
+    norms = np.linalg.norm(v, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return v / norms
+
+
+def _greedy(sims: np.ndarray, rows: np.ndarray, cols: np.ndarray, used1, used2, pairs, threshold):
+    """Greedy one-to-one matching on a similarity block, best pairs first."""
+    if sims.size == 0:
+        return
+    r, c = np.nonzero(sims >= threshold)
+    if r.size == 0:
+        return
+    order = np.argsort(-sims[r, c], kind="stable")
+    for k in order:
+        i, j = int(rows[r[k]]), int(cols[c[k]])
+        if i in used1 or j in used2:
+            continue
+        used1.add(i)
+        used2.add(j)
+        pairs.append((i, j, float(sims[r[k], c[k]])))
+
+
+def align_chunks(
+    pages1: List[int],
+    V1: np.ndarray,
+    pages2: List[int],
+    V2: np.ndarray,
+    window: int = PAGE_WINDOW,
+    threshold: float = MATCH_THRESHOLD,
+) -> List[Tuple[int, int, float]]:
+    """
+    Returns matched (i, j, similarity) chunk pairs.
+
+    Pass 1 (blocked): chunks on page p of doc1 are compared with doc2 chunks
+    whose page, rescaled to doc1's length, is within ±window.
+    Pass 2 (leftovers): unmatched chunks on both sides, compared in blocks.
+    """
+    U1, U2 = _unit(V1), _unit(V2)
+    n1, n2 = len(U1), len(U2)
+    pairs: List[Tuple[int, int, float]] = []
+    used1, used2 = set(), set()
+    if n1 == 0 or n2 == 0:
+        return pairs
+
+    p1 = np.asarray([p or 0 for p in pages1], dtype=np.float64)
+    p2 = np.asarray([p or 0 for p in pages2], dtype=np.float64)
+    scale = (p1.max() or 1) / (p2.max() or 1)
+    p2_scaled = p2 * scale
+
+    order2 = np.argsort(p2_scaled, kind="stable")
+    sorted_p2 = p2_scaled[order2]
+
+    for page in np.unique(p1):
+        rows = np.nonzero(p1 == page)[0]
+        lo = bisect_left(sorted_p2, page - window)
+        hi = bisect_left(sorted_p2, page + window + 1e-9)
+        cols = order2[lo:hi]
+        if cols.size == 0:
+            continue
+        _greedy(U1[rows] @ U2[cols].T, rows, cols, used1, used2, pairs, threshold)
+
+    rest1 = np.asarray([i for i in range(n1) if i not in used1], dtype=np.int64)
+    rest2 = np.asarray([j for j in range(n2) if j not in used2], dtype=np.int64)
+    if rest1.size and rest2.size:
+        for start in range(0, rest1.size, LEFTOVER_BLOCK):
+            rows = rest1[start : start + LEFTOVER_BLOCK]
+            cols = np.asarray([j for j in rest2 if j not in used2], dtype=np.int64)
+            if cols.size == 0:
+                break
+            _greedy(U1[rows] @ U2[cols].T, rows, cols, used1, used2, pairs, threshold)
+
+    pairs.sort()
+    return pairs
+
+
+def _in_order(pairs: List[Tuple[int, int, float]]) -> set:
+    """Indices (into `pairs`, sorted by i) of the longest run kept in order in doc2."""
+    tails, tail_idx = [], []
+    prev = [-1] * len(pairs)
+    for k, (_, j, _) in enumerate(pairs):
+        pos = bisect_left(tails, j)
+        if pos == len(tails):
+            tails.append(j)
+            tail_idx.append(k)
+        else:
+            tails[pos] = j
+            tail_idx[pos] = k
+        prev[k] = tail_idx[pos - 1] if pos > 0 else -1
+
+    keep = set()
+    k = tail_idx[-1] if tail_idx else -1
+    while k != -1:
+        keep.add(k)
+        k = prev[k]
+    return keep
+
+
+def _norm(text: str) -> str:
+    return " ".join((text or "").split()).lower()
+
+
+def semantic_changes(meta1, V1, meta2, V2) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    pairs = align_chunks([m["page"] for m in meta1], V1, [m["page"] for m in meta2], V2)
+    in_order = _in_order(pairs)
+
+    changes = []
+    for k, (i, j, sim) in enumerate(pairs):
+        a, b = meta1[i], meta2[j]
+        moved = k not in in_order
+        same_text = sim >= SAME_THRESHOLD and _norm(a["text"]) == _norm(b["text"])
+        if same_text and not moved:
+            continue
+
+        changes.append(
+            {
+                "type": "moved" if moved else "reworded",
+                "location": {"document": 2, "page": b["page"]},
+                "content": {
+                    "before": a["text"],
+                    "after": b["text"],
+                    "similarity": round(sim, 4),
+                    "beforeLocation": {"document": 1, "page": a["page"]},
+                },
+            }
+        )
+
+    matched1 = {i for i, _, _ in pairs}
+    matched2 = {j for _, j, _ in pairs}
+    for i, m in enumerate(meta1):
+        if i not in matched1:
+            changes.append(
+                {
+                    "type": "deletion",
+                    "location": {"document": 1, "page": m["page"]},
+                    "content": m["text"],
+                }
+            )
+    for j, m in enumerate(meta2):
+        if j not in matched2:
+            changes.append(
+                {
+                    "type": "addition",
+                    "location": {"document": 2, "page": m["page"]},
+                    "content": m["text"],
+                }
+            )
+
+    changes.sort(key=lambda c: (c["location"].get("page") or 0, c["location"]["document"]))
+
+    total = len(meta1) + len(meta2)
+    stats = {
+        "matchedChunks": len(pairs),
+        "semanticSimilarity": round(
+            (2 * sum(s for _, _, s in pairs) / total) if total else 1.0, 4
+        ),
+    }
+    return changes, stats
+
+
+# ----------------------------------------------
+# Entry point
+# ----------------------------------------------
+async def compare_semantic(document1, document2) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    (meta1, V1), (meta2, V2) = await asyncio.gather(
+        fetch_document_chunks(document1.owner_id, document1.id),
+        fetch_document_chunks(document2.owner_id, document2.id),
+    )
+    if not meta1 or not meta2:
+        raise ValueError("Documents have no stored chunk vectors for semantic comparison.")
+
+    changes, stats = await asyncio.to_thread(semantic_changes, meta1, V1, meta2, V2)
+    for change in changes:
+        change["id"] = f"chg_{uuid4().hex[:6]}"
+    return changes, stats
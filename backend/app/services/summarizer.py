@@ -1,14 +1,10 @@
-from langgraph.graph import StateGraph, END
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_google_genai import ChatGoogleGenerativeAI
 import time
-import os
 import asyncio
-import json
-from dotenv import load_dotenv
 
 from qdrant_client.http import models as qmodels
-from app.utils.qdrant import async_qdrant, search_vectors
+from app.utils.qdrant import async_qdrant, search_vectors, search_vectors_batch
+from app.utils.rate_limit import rate_limited
+from app.services.llm_clients import GEMINI_MODEL, get_embedding_model, get_llm
 from app.core.config import settings
 
 from pydantic import BaseModel
@@ -32,22 +28,6 @@ class KeyPointsOutput(BaseModel):
     key_points: List[str]
 
 
-# ============================================================
-# ENV + LLM
-# ============================================================
-
-load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise RuntimeError("❌ GEMINI_API_KEY not found in environment variables.")
-
-llm = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash",
-    google_api_key=GEMINI_API_KEY,
-    temperature=0.2,
-)
-
-
 # ============================================================
 # LangGraph State
 # ============================================================
@@ -59,9 +39,27 @@ class SummaryState(dict):
     has_toc: bool
     toc_sections: list | None
     retrieved_chunks: list | None
+    prefetched_chunks: list | None
     unified_summary: str | None
 
 
+OVERVIEW_QUERY = "main ideas of entire document"
+
+_overview_vector = None
+
+
+async def get_overview_vector():
+    """
+    The overview query never changes, so it is embedded once per process
+    and shared by every summary (single or batch).
+    """
+    global _overview_vector
+    if _overview_vector is None:
+        model = get_embedding_model()
+        _overview_vector = await asyncio.to_thread(model.embed_query, OVERVIEW_QUERY)
+    return _overview_vector
+
+
 # ============================================================
 # ASYNC – Efficient Qdrant Scroll (fetch first N chunks)
 # ============================================================
@@ -117,7 +115,7 @@ async def fetch_first_chunks_from_qdrant(user_id, document_id, limit_chunks=5):
 # ============================================================
 
 async def orchestrator_agent(state: SummaryState):
-    structured_llm = llm.with_structured_output(OrchestratorOutput)
+    structured_llm = get_llm().with_structured_output(OrchestratorOutput)
 
     prompt = f"""
 You are an expert document analyzer.
@@ -130,7 +128,7 @@ Document sample:
 {state["raw_text"][:5000]}
 """
 
-    result: OrchestratorOutput = await structured_llm.ainvoke(prompt)
+    result: OrchestratorOutput = await rate_limited(structured_llm.ainvoke, prompt)
 
     state["has_toc"] = result.has_toc
     state["toc_sections"] = result.toc_sections
@@ -139,7 +137,7 @@ Document sample:
 
 
 async def toc_agent(state: SummaryState):
-    structured_llm = llm.with_structured_output(TocSelection)
+    structured_llm = get_llm().with_structured_output(TocSelection)
 
     prompt = f"""
 Select the most important TOC sections to summarize.
@@ -148,22 +146,121 @@ TOC:
 {state["toc_sections"]}
 """
 
-    result: TocSelection = await structured_llm.ainvoke(prompt)
-    state["retrieved_chunks"] = result.sections
+    result: TocSelection = await rate_limited(structured_llm.ainvoke, prompt)
+    sections = [s.strip() for s in result.sections if s and s.strip()]
+    sections = sections[: settings.SUMMARY_TOC_MAX_SECTIONS]
+
+    if not sections:
+        # Nothing usable selected — fall back to plain semantic retrieval
+        return await qdrant_retrieval_agent(state)
+
+    state["retrieved_chunks"] = await retrieve_toc_sections(
+        state["user_id"], state["document_id"], sections
+    )
     return state
 
 
+async def retrieve_toc_sections(user_id, document_id, sections):
+    """
+    Section content for the selected TOC entries, in three round trips total:
+
+    1. embed every section title in one `embed_documents` call
+    2. one batched Qdrant search (one sub-search per section, scoped to the doc)
+    3. one scroll fetching the chunks that follow each hit, so a heading
+       chunk brings its body with it
+
+    Returns one text block per section, headed by the section title.
+    """
+    model = get_embedding_model()
+    vectors = await asyncio.to_thread(model.embed_documents, sections)
+
+    doc_filter = {"owner_id": str(user_id), "document_id": str(document_id)}
+    hits_per_section = await search_vectors_batch(
+        query_vectors=vectors,
+        filters_list=[doc_filter] * len(sections),
+        limit=settings.SUMMARY_TOC_HITS_PER_SECTION,
+        mmr=False,
+    )
+
+    # chunk_index → text for everything we already have
+    known = {}
+    wanted_by_section = []
+    for hits in hits_per_section:
+        indices = []
+        for hit in hits:
+            payload = hit["payload"] or {}
+            idx = payload.get("chunk_index")
+            if idx is None:
+                continue
+            known[idx] = payload.get("text", "")
+            indices.append(idx)
+
+        # Best hit first, then the chunks right after it (the section body)
+        if indices:
+            top = indices[0]
+            follow = range(top + 1, top + 1 + settings.SUMMARY_TOC_FOLLOWING_CHUNKS)
+            indices = [top, *follow, *indices[1:]]
+        wanted_by_section.append(list(dict.fromkeys(indices)))
+
+    missing = {i for wanted in wanted_by_section for i in wanted} - known.keys()
+    if missing:
+        known.update(await fetch_chunks_by_index(user_id, document_id, sorted(missing)))
+
+    # Each chunk is used once, by the first section that claims it
+    used = set()
+    blocks = []
+    for title, wanted in zip(sections, wanted_by_section):
+        texts = []
+        for idx in sorted(i for i in wanted if i in known and i not in used):
+            used.add(idx)
+            texts.append(known[idx])
+        if texts:
+            blocks.append(f"## {title}\n" + "\n".join(texts))
+
+    return blocks
+
+
+async def fetch_chunks_by_index(user_id, document_id, indices):
+    """Fetch specific chunks of a document by chunk_index in one scroll."""
+    if not indices:
+        return {}
+
+    filter_condition = qmodels.Filter(
+        must=[
+            qmodels.FieldCondition(key="owner_id", match=qmodels.MatchValue(value=str(user_id))),
+            qmodels.FieldCondition(
+                key="document_id", match=qmodels.MatchValue(value=str(document_id))
+            ),
+            qmodels.FieldCondition(key="chunk_index", match=qmodels.MatchAny(any=list(indices))),
+        ]
+    )
+
+    points, _ = await async_qdrant.scroll(
+        collection_name=settings.QDRANT_COLLECTION_NAME,
+        scroll_filter=filter_condition,
+        limit=len(indices),
+        with_payload=True,
+        with_vectors=False,
+    )
+
+    return {
+        p.payload["chunk_index"]: p.payload.get("text", "")
+        for p in points
+        if p.payload and "chunk_index" in p.payload
+    }
+
+
 async def qdrant_retrieval_agent(state: SummaryState):
     """
     Semantic retrieval for non-TOC documents.
+    Batch jobs prefetch this in one grouped Qdrant call; reuse it if present.
     """
 
-    embedding_model = HuggingFaceEmbeddings(model_name=settings.HUGGINGFACE_EMBEDDING_MODEL)
+    if state.get("prefetched_chunks") is not None:
+        state["retrieved_chunks"] = state["prefetched_chunks"]
+        return state
 
-    query_vector = await asyncio.to_thread(
-        embedding_model.embed_query,
-        "main ideas of entire document",
-    )
+    query_vector = await get_overview_vector()
 
     results = await search_vectors(
         query_vector=query_vector,
@@ -179,8 +276,35 @@ async def qdrant_retrieval_agent(state: SummaryState):
     return state
 
 
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English prose; good enough for budgeting
+    return max(1, len(text) // 4)
+
+
+def bound_context(blocks, max_tokens: int):
+    """
+    Fit text blocks into a token budget. Blocks are kept in order; each gets
+    an equal share first, so one long section can't crowd out the rest.
+    """
+    blocks = [b for b in blocks if b]
+    if not blocks:
+        return []
+
+    if sum(estimate_tokens(b) for b in blocks) <= max_tokens:
+        return blocks
+
+    share = max_tokens // len(blocks)
+    bounded = []
+    for block in blocks:
+        if estimate_tokens(block) > share:
+            block = block[: share * 4].rsplit(" ", 1)[0] + " …"
+        bounded.append(block)
+    return bounded
+
+
 async def summarizer_agent(state: SummaryState):
-    context_text = "\n\n".join(state["retrieved_chunks"])
+    blocks = bound_context(state["retrieved_chunks"] or [], settings.SUMMARY_CONTEXT_TOKENS)
+    context_text = "\n\n".join(blocks)
 
     prompt = f"""
 Summarize the following content into a unified structured summary:
@@ -188,13 +312,13 @@ Summarize the following content into a unified structured summary:
 {context_text}
 """
 
-    result = await llm.ainvoke(prompt)
+    result = await rate_limited(get_llm().ainvoke, prompt)
     state["unified_summary"] = result.content
     return state
 
 
 async def extract_key_points(summary_text: str) -> list[str]:
-    structured_llm = llm.with_structured_output(KeyPointsOutput)
+    structured_llm = get_llm().with_structured_output(KeyPointsOutput)
 
     prompt = f"""
 Extract 3-6 key bullet points from this summary:
@@ -202,7 +326,7 @@ Extract 3-6 key bullet points from this summary:
 {summary_text}
 """
 
-    result: KeyPointsOutput = await structured_llm.ainvoke(prompt)
+    result: KeyPointsOutput = await rate_limited(structured_llm.ainvoke, prompt)
     return result.key_points
 
 
@@ -210,45 +334,101 @@ Extract 3-6 key bullet points from this summary:
 # LangGraph Workflow
 # ============================================================
 
-workflow = StateGraph(SummaryState)
+def select_path(state: SummaryState):
+    return "toc_agent" if state["has_toc"] else "qdrant_agent"
 
-workflow.add_node("orchestrator", orchestrator_agent)
-workflow.add_node("toc_agent", toc_agent)
-workflow.add_node("qdrant_agent", qdrant_retrieval_agent)
-workflow.add_node("summarizer", summarizer_agent)
 
-workflow.set_entry_point("orchestrator")
+_graph = None
 
 
-def select_path(state: SummaryState):
-    return "toc_agent" if state["has_toc"] else "qdrant_agent"
+def get_graph():
+    """Compile the workflow on first use (langgraph is imported lazily)."""
+    global _graph
+    if _graph is not None:
+        return _graph
 
+    from langgraph.graph import END, StateGraph
 
-workflow.add_conditional_edges(
-    "orchestrator",
-    select_path,
-    {
-        "toc_agent": "toc_agent",
-        "qdrant_agent": "qdrant_agent",
-    },
-)
+    workflow = StateGraph(SummaryState)
+
+    workflow.add_node("orchestrator", orchestrator_agent)
+    workflow.add_node("toc_agent", toc_agent)
+    workflow.add_node("qdrant_agent", qdrant_retrieval_agent)
+    workflow.add_node("summarizer", summarizer_agent)
+
+    workflow.set_entry_point("orchestrator")
+
+    workflow.add_conditional_edges(
+        "orchestrator",
+        select_path,
+        {
+            "toc_agent": "toc_agent",
+            "qdrant_agent": "qdrant_agent",
+        },
+    )
 
-workflow.add_edge("toc_agent", "summarizer")
-workflow.add_edge("qdrant_agent", "summarizer")
-workflow.add_edge("summarizer", END)
+    workflow.add_edge("toc_agent", "summarizer")
+    workflow.add_edge("qdrant_agent", "summarizer")
+    workflow.add_edge("summarizer", END)
 
-graph = workflow.compile()
+    _graph = workflow.compile()
+    return _graph
 
 
 # ============================================================
 # Final Summary Function
 # ============================================================
 
-async def generate_summary(req, user_id, doc, custom=False):
+async def prefetch_batch_context(pairs, limit_chunks=5):
+    """
+    Grouped retrieval for a batch of (owner_id, document_id) pairs.
+
+    - first chunks (TOC detection) are scrolled concurrently
+    - the overview query is embedded once for the whole group
+    - all semantic searches go to Qdrant in a single batched request
+
+    Returns {document_id: {"raw_text": ..., "retrieved_chunks": [...]}}.
+    """
+    if not pairs:
+        return {}
+
+    first_chunks = await asyncio.gather(
+        *[
+            fetch_first_chunks_from_qdrant(owner_id, document_id, limit_chunks=limit_chunks)
+            for owner_id, document_id in pairs
+        ]
+    )
+
+    query_vector = await get_overview_vector()
+    results = await search_vectors_batch(
+        query_vectors=[query_vector] * len(pairs),
+        filters_list=[
+            {"owner_id": str(owner_id), "document_id": str(document_id)}
+            for owner_id, document_id in pairs
+        ],
+        limit=5,
+        mmr=True,
+    )
+
+    return {
+        str(document_id): {
+            "raw_text": raw_text,
+            "retrieved_chunks": [r["payload"].get("text", "") for r in hits],
+        }
+        for (_, document_id), raw_text, hits in zip(pairs, first_chunks, results)
+    }
+
+
+async def generate_summary(req, user_id, doc, custom=False, prefetched=None):
     start = time.time()
 
-    # Fetch early content for TOC detection
-    raw_text = await fetch_first_chunks_from_qdrant(user_id, doc.id, limit_chunks=5)
+    if prefetched is not None:
+        raw_text = prefetched["raw_text"]
+        prefetched_chunks = prefetched["retrieved_chunks"]
+    else:
+        # Fetch early content for TOC detection
+        raw_text = await fetch_first_chunks_from_qdrant(user_id, doc.id, limit_chunks=5)
+        prefetched_chunks = None
 
     initial_state = SummaryState(
         user_id=user_id,
@@ -257,10 +437,11 @@ async def generate_summary(req, user_id, doc, custom=False):
         has_toc=False,
         toc_sections=[],
         retrieved_chunks=[],
+        prefetched_chunks=prefetched_chunks,
         unified_summary=None,
     )
 
-    result = await graph.ainvoke(initial_state)
+    result = await get_graph().ainvoke(initial_state)
 
     summary_text = result.get("unified_summary", "")
     chunks = result.get("retrieved_chunks", [])
@@ -275,7 +456,7 @@ async def generate_summary(req, user_id, doc, custom=False):
         "wordCount": len(summary_text.split()),
         "confidence": round(min(0.99, 0.75 + len(chunks) * 0.03), 2),
         "meta_data": {
-            "model": "gemini-2.5-flash",
+            "model": GEMINI_MODEL,
             "processingTime": processing_time,
         },
     }
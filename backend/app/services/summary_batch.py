@@ -0,0 +1,176 @@
+# app/services/summary_batch.py
+
+import asyncio
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db.crud import batch_crud
+from app.db.models import BatchItem, BatchJob, Document, Summary
+from app.db.session import AsyncSessionLocal
+from app.services.summarizer import generate_summary, prefetch_batch_context
+
+BATCH_KIND = "summary"
+
+
+class SummaryBatchRunner:
+    """
+    Bounded worker pool for batch summarization.
+
+    Items are queued by id. Each worker pulls up to `group_size` items at a
+    time so retrieval (first-chunk scrolls, the overview embedding and the
+    Qdrant searches) is done once per group. LLM calls then run per document
+    under the global LLM rate limit, which is what governs throughput.
+    """
+
+    def __init__(self, workers: int, group_size: int):
+        self.workers = max(workers, 1)
+        self.group_size = max(group_size, 1)
+        self.queue: asyncio.Queue | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self):
+        if self._tasks:
+            return
+        self.queue = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"summary-batch-{i}")
+            for i in range(self.workers)
+        ]
+
+        # Pick up work interrupted by a restart
+        async with AsyncSessionLocal() as db:
+            pending = await batch_crud.get_pending_item_ids(db, BATCH_KIND)
+        await self.enqueue(pending)
+        print(f"🧵 Summary batch workers started ({self.workers}), {len(pending)} item(s) resumed")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def enqueue(self, item_ids):
+        if self.queue is None:
+            raise RuntimeError("Summary batch runner is not started")
+        for item_id in item_ids:
+            await self.queue.put(item_id)
+
+    # ---------------------------------------------------------
+    # Worker loop
+    # ---------------------------------------------------------
+    async def _worker(self, index: int):
+        while True:
+            group = [await self.queue.get()]
+            while len(group) < self.group_size:
+                try:
+                    group.append(self.queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+
+            try:
+                await self._process_group(group)
+            except Exception as e:
+                print(f"❌ Summary batch worker {index} failed on a group: {e}")
+                try:
+                    # Items already finished keep their result
+                    async with AsyncSessionLocal() as db:
+                        batch_ids = await batch_crud.fail_unfinished_items(db, group, str(e))
+                        for batch_id in batch_ids:
+                            await batch_crud.refresh_batch_status(db, batch_id)
+                except Exception as e:
+                    print(f"⚠️ Could not record the failed group of worker {index}: {e}")
+            finally:
+                for _ in group:
+                    self.queue.task_done()
+
+    async def _process_group(self, item_ids):
+        async with AsyncSessionLocal() as db:
+            rows = (
+                await db.execute(
+                    select(BatchItem, BatchJob, Document)
+                    .join(BatchJob, BatchJob.id == BatchItem.batch_id)
+                    .join(Document, Document.id == BatchItem.document_id)
+                    .where(
+                        BatchItem.id.in_(item_ids),
+                        BatchItem.status.notin_(batch_crud.TERMINAL_STATUSES),
+                    )
+                )
+            ).all()
+
+            if not rows:
+                return
+
+            await batch_crud.update_items(
+                db, [item.id for item, _, _ in rows], status="retrieving", progress=10
+            )
+
+            # 1️⃣ Shared retrieval for the whole group
+            prefetched = await prefetch_batch_context(
+                [(job.user_id, doc.id) for _, job, doc in rows]
+            )
+
+            await batch_crud.update_items(
+                db, [item.id for item, _, _ in rows], status="summarizing", progress=40
+            )
+
+        # 2️⃣ Per-document LLM work, concurrently (the rate limiter paces it)
+        await asyncio.gather(
+            *[
+                self._summarize_item(item, job, doc, prefetched.get(str(doc.id)))
+                for item, job, doc in rows
+            ]
+        )
+
+        async with AsyncSessionLocal() as db:
+            for batch_id in {item.batch_id for item, _, _ in rows}:
+                await batch_crud.refresh_batch_status(db, batch_id)
+
+    async def _summarize_item(self, item, job, doc, prefetched):
+        options = job.options or {}
+        req = SimpleNamespace(
+            documentId=str(doc.id),
+            options=SimpleNamespace(
+                length=options.get("length", "medium"),
+                style=options.get("style", "executive"),
+                focusAreas=options.get("focusAreas", []),
+                language=options.get("language", "en"),
+            ),
+        )
+
+        async with AsyncSessionLocal() as db:
+            try:
+                summary_data = await generate_summary(req, job.user_id, doc, prefetched=prefetched)
+
+                summary = Summary(
+                    id=uuid.uuid4(),
+                    document_id=doc.id,
+                    style=req.options.style,
+                    length=req.options.length,
+                    content=summary_data["content"],
+                    key_points=summary_data["keyPoints"],
+                    word_count=summary_data["wordCount"],
+                    confidence=summary_data["confidence"],
+                    created_at=datetime.utcnow(),
+                    meta_data={**summary_data["meta_data"], "batchId": str(job.id)},
+                )
+                db.add(summary)
+                await db.commit()
+
+                await batch_crud.update_items(
+                    db, [item.id], status="completed", progress=100, result_id=summary.id
+                )
+            except Exception as e:
+                await db.rollback()
+                await batch_crud.update_items(
+                    db, [item.id], status="failed", progress=100, error=str(e)
+                )
+
+
+summary_batch_runner = SummaryBatchRunner(
+    workers=settings.SUMMARY_BATCH_WORKERS,
+    group_size=settings.SUMMARY_BATCH_GROUP_SIZE,
+)
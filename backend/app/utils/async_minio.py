@@ -1,20 +1,77 @@
 # app/utils/async_minio.py
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import AsyncExitStack, asynccontextmanager, nullcontext
+from typing import AsyncIterator
+
 import aioboto3
 from app.core.config import settings
+from app.utils.disk_cache import DiskLRUCache
 from botocore.config import Config
 
+STREAM_CHUNK = 1024 * 1024
+RATE_WINDOW_SECONDS = 60
+
+
+class _CallMeter:
+    """Per-operation call counts and calls/second over a sliding window."""
+
+    def __init__(self, window: float = RATE_WINDOW_SECONDS):
+        self.window = window
+        self.totals: dict[str, int] = {}
+        self._recent: deque = deque()  # (timestamp, operation)
+
+    def record(self, operation: str):
+        now = time.monotonic()
+        self.totals[operation] = self.totals.get(operation, 0) + 1
+        self._recent.append((now, operation))
+        self._trim(now)
+
+    def _trim(self, now: float):
+        while self._recent and self._recent[0][0] < now - self.window:
+            self._recent.popleft()
+
+    def snapshot(self) -> dict:
+        self._trim(time.monotonic())
+        per_op: dict[str, int] = {}
+        for _, operation in self._recent:
+            per_op[operation] = per_op.get(operation, 0) + 1
+        return {
+            "windowSeconds": self.window,
+            "callsPerSecond": round(len(self._recent) / self.window, 3),
+            "callsPerSecondByOperation": {
+                op: round(n / self.window, 3) for op, n in sorted(per_op.items())
+            },
+            "totals": dict(sorted(self.totals.items())),
+        }
+
 
 class AsyncMinioClient:
+    """
+    Async S3/MinIO wrapper with two long-lived clients, opened by `start()`
+    (app startup) and closed by `close()` (shutdown): the internal one talks
+    to MinIO over a keep-alive connection pool; the public one only signs
+    URLs for the browser-facing endpoint, which needs no network I/O.
+    """
+
     def __init__(self):
         self.session = aioboto3.Session()
 
+        config = Config(
+            signature_version="s3v4",
+            max_pool_connections=settings.MINIO_MAX_POOL_CONNECTIONS,
+            tcp_keepalive=settings.MINIO_TCP_KEEPALIVE,
+        )
+
         # Internal client (backend inside Docker talks to MinIO)
         self.internal_client_params = dict(
             service_name="s3",
             endpoint_url=f"http://{settings.MINIO_INTERNAL_ENDPOINT}",   # minio:9000
             aws_access_key_id=settings.MINIO_ACCESS_KEY,
             aws_secret_access_key=settings.MINIO_SECRET_KEY,
-            config=Config(signature_version="s3v4"),
+            config=config,
         )
 
         # Public client (browser must reach this URL)
@@ -23,60 +80,304 @@ class AsyncMinioClient:
             endpoint_url=f"http://{settings.MINIO_PUBLIC_ENDPOINT}",
             aws_access_key_id=settings.MINIO_ACCESS_KEY,
             aws_secret_access_key=settings.MINIO_SECRET_KEY,
-            config=Config(signature_version="s3v4"),
+            config=config,
         )
 
+        self._stack: AsyncExitStack | None = None
+        self._internal = None
+        self._public = None
+        self._start_lock = asyncio.Lock()
+        self.meter = _CallMeter()
+
+        # Local disk cache of whole objects, keyed by object key + ETag
+        self.blob_cache = DiskLRUCache(
+            settings.MINIO_BLOB_CACHE_DIR, settings.MINIO_BLOB_CACHE_MB * 1024 * 1024
+        )
+        self._downloads: dict[str, asyncio.Future] = {}
+
+    # ---------------------------------------------------------
+    # Client lifecycle
+    # ---------------------------------------------------------
+    async def start(self):
+        async with self._start_lock:
+            if self._stack is not None:
+                return
+            stack = AsyncExitStack()
+            self._internal = await stack.enter_async_context(
+                self.session.client(**self.internal_client_params)
+            )
+            self._public = await stack.enter_async_context(
+                self.session.client(**self.public_client_params)
+            )
+            self._stack = stack
+
+    async def close(self):
+        if self._stack is not None:
+            stack, self._stack = self._stack, None
+            self._internal = self._public = None
+            await stack.aclose()
+
+    async def _client(self, operation: str, public: bool = False):
+        """The long-lived client (started lazily outside the app, e.g. scripts)."""
+        if self._stack is None:
+            await self.start()
+        self.meter.record(operation)
+        return self._public if public else self._internal
+
+    def metrics(self) -> dict:
+        return {"calls": self.meter.snapshot(), "blobCache": self.blob_cache.stats()}
+
     # Upload with internal client
     async def upload_bytes(self, bucket: str, object_name: str, data: bytes, content_type: str):
         if not data:
             raise ValueError("Cannot upload empty file")
 
-        async with self.session.client(**self.internal_client_params) as s3:
-            await s3.put_object(
-                Bucket=bucket,
-                Key=object_name,
-                Body=data,
-                ContentType=content_type,
-            )
+        s3 = await self._client("put_object")
+        await s3.put_object(
+            Bucket=bucket,
+            Key=object_name,
+            Body=data,
+            ContentType=content_type,
+        )
         return f"{bucket}/{object_name}"
 
+    # Streaming upload with internal client (S3 multipart)
+    async def upload_stream(
+        self,
+        bucket: str,
+        object_name: str,
+        chunks: AsyncIterator[bytes],
+        content_type: str,
+        keep_local: bool = False,
+    ) -> dict:
+        """
+        Upload an async stream of chunks without buffering the whole object.
+
+        Data is sent in MINIO_UPLOAD_PART_MB parts (a single PUT when it all
+        fits in one part), so memory stays around one part per upload. With
+        `keep_local` the stream is also written to the blob cache under the
+        new ETag, so `local_copy(bucket, object_name, etag)` finds it without
+        downloading it again.
+
+        Returns {"uri", "size", "etag"}. ValueError if the stream is empty.
+        """
+        part_size = settings.MINIO_UPLOAD_PART_MB * 1024 * 1024
+        tmp = await asyncio.to_thread(self.blob_cache.temp_path) if keep_local else None
+        buffer = bytearray()
+        size = 0
+        parts = []
+        upload_id = None
+
+        async def send_part(data: bytes):
+            s3 = await self._client("upload_part")
+            number = len(parts) + 1
+            res = await s3.upload_part(
+                Bucket=bucket, Key=object_name, UploadId=upload_id, PartNumber=number, Body=data
+            )
+            parts.append({"PartNumber": number, "ETag": res["ETag"]})
+
+        try:
+            with open(tmp, "wb") if tmp else nullcontext() as local:
+                async for chunk in chunks:
+                    if local:
+                        local.write(chunk)
+                    buffer += chunk
+                    size += len(chunk)
+                    while len(buffer) >= part_size:
+                        if upload_id is None:
+                            s3 = await self._client("create_multipart_upload")
+                            res = await s3.create_multipart_upload(
+                                Bucket=bucket, Key=object_name, ContentType=content_type
+                            )
+                            upload_id = res["UploadId"]
+                        await send_part(bytes(buffer[:part_size]))
+                        del buffer[:part_size]
+
+            if not size:
+                raise ValueError("Cannot upload empty file")
+
+            if upload_id is None:
+                s3 = await self._client("put_object")
+                res = await s3.put_object(
+                    Bucket=bucket, Key=object_name, Body=bytes(buffer), ContentType=content_type
+                )
+            else:
+                if buffer:
+                    await send_part(bytes(buffer))
+                s3 = await self._client("complete_multipart_upload")
+                res = await s3.complete_multipart_upload(
+                    Bucket=bucket,
+                    Key=object_name,
+                    UploadId=upload_id,
+                    MultipartUpload={"Parts": parts},
+                )
+        except BaseException:
+            if upload_id is not None:
+                try:
+                    s3 = await self._client("abort_multipart_upload")
+                    await s3.abort_multipart_upload(
+                        Bucket=bucket, Key=object_name, UploadId=upload_id
+                    )
+                except Exception as e:
+                    print(f"MinIO abort multipart upload error: {e}")
+            if tmp:
+                os.remove(tmp)
+            raise
+
+        if tmp:
+            key = self._blob_key(bucket, object_name, res["ETag"])
+            await asyncio.to_thread(self.blob_cache.commit_file, key, tmp)
+        return {"uri": f"{bucket}/{object_name}", "size": size, "etag": res["ETag"]}
+
     # Download with internal client
-    async def download_bytes(self, bucket: str, object_name: str) -> bytes | None:
-        async with self.session.client(**self.internal_client_params) as s3:
-            try:
-                response = await s3.get_object(Bucket=bucket, Key=object_name)
-                return await response["Body"].read()
-            except Exception as e:
+    async def download_bytes(
+        self, bucket: str, object_name: str, missing_ok: bool = False
+    ) -> bytes | None:
+        """Object bytes, or None on error (`missing_ok` silences expected misses)."""
+        s3 = await self._client("get_object")
+        try:
+            response = await s3.get_object(Bucket=bucket, Key=object_name)
+            async with response["Body"] as body:
+                return await body.read()
+        except Exception as e:
+            if not missing_ok:
                 print(f"MinIO download error: {e}")
-                return None
+            return None
 
-    async def delete_object(self, bucket: str, object_name: str) -> bool:
-        async with self.session.client(**self.internal_client_params) as s3:
+    @staticmethod
+    def _blob_key(bucket: str, object_name: str, etag: str) -> str:
+        return f"{bucket}/{object_name}@{etag.strip(chr(34))}"
+
+    # Local file via the disk blob cache
+    @asynccontextmanager
+    async def local_copy(self, bucket: str, object_name: str, etag: str = None):
+        """
+        `async with` a path of a local copy of the object (None on error).
+
+        Callers open the path directly (e.g. fitz.open(path)) instead of
+        holding the bytes in memory; the cache entry is pinned until the
+        block exits, so eviction cannot remove it in the meantime. Without
+        a known `etag` a HEAD request checks it, so overwritten objects are
+        never served stale; misses stream to disk (no whole-object buffer)
+        and concurrent requests for the same object share one download.
+        """
+        key, path = await self._pin_local(bucket, object_name, etag)
+        try:
+            yield path
+        finally:
+            if path:
+                await asyncio.to_thread(self.blob_cache.unpin, key)
+
+    async def _pin_local(self, bucket: str, object_name: str, etag: str | None):
+        """(cache key, pinned path), path None on error."""
+        if etag is None:
+            s3 = await self._client("head_object")
             try:
-                await s3.delete_object(Bucket=bucket, Key=object_name)
-                return True
+                etag = (await s3.head_object(Bucket=bucket, Key=object_name))["ETag"]
             except Exception as e:
-                print(f"MinIO delete error: {e}")
-                return False
+                print(f"MinIO head error: {e}")
+                return None, None
 
-    async def generate_presigned_url(self, bucket: str, object_name: str, expires=3600) -> str | None:
-        async with self.session.client(**self.public_client_params) as s3:
+        key = self._blob_key(bucket, object_name, etag)
+        # A shared download can be evicted before a follower pins it: retry
+        for _ in range(3):
+            path = await asyncio.to_thread(self.blob_cache.pin, key)
+            if path:
+                return key, path
+
+            pending = self._downloads.get(key)
+            if pending is not None:
+                if not await asyncio.shield(pending):
+                    return key, None
+                continue
+
+            future = asyncio.get_running_loop().create_future()
+            self._downloads[key] = future
+            path = None
             try:
-                return await s3.generate_presigned_url(
-                    ClientMethod="get_object",
-                    Params={"Bucket": bucket, "Key": object_name},
-                    ExpiresIn=expires,
-                )
+                path = await self._download_to_cache(bucket, object_name, key)
             except Exception as e:
-                print(f"Error generating presigned URL: {e}")
-                return None
+                print(f"MinIO download error: {e}")
+            finally:
+                self._downloads.pop(key, None)
+                future.set_result(path)
+            return key, path
+        return key, None
+
+    async def _download_to_cache(self, bucket: str, object_name: str, key: str) -> str:
+        """Stream the object into the blob cache; the entry comes back pinned."""
+        tmp = await asyncio.to_thread(self.blob_cache.temp_path)
+        try:
+            s3 = await self._client("get_object")
+            response = await s3.get_object(Bucket=bucket, Key=object_name)
+            async with response["Body"] as body:
+                with open(tmp, "wb") as f:
+                    while chunk := await body.read(STREAM_CHUNK):
+                        f.write(chunk)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        return await asyncio.to_thread(self.blob_cache.commit_file, key, tmp, True)
+
+    async def delete_object(self, bucket: str, object_name: str) -> bool:
+        s3 = await self._client("delete_object")
+        try:
+            await s3.delete_object(Bucket=bucket, Key=object_name)
+            return True
+        except Exception as e:
+            print(f"MinIO delete error: {e}")
+            return False
+
+    async def generate_presigned_url(self, bucket: str, object_name: str, expires=3600) -> str | None:
+        # Local signing with the public client — no request to MinIO
+        s3 = await self._client("presign", public=True)
+        try:
+            return await s3.generate_presigned_url(
+                ClientMethod="get_object",
+                Params={"Bucket": bucket, "Key": object_name},
+                ExpiresIn=expires,
+            )
+        except Exception as e:
+            print(f"Error generating presigned URL: {e}")
+            return None
+
+    async def generate_presigned_post(
+        self, bucket: str, object_name: str, content_type: str, max_bytes: int, expires=900
+    ) -> dict | None:
+        """
+        A browser form upload straight to MinIO: {"url", "fields"}. The
+        policy pins the key and content type and caps the size.
+        """
+        s3 = await self._client("presign", public=True)
+        try:
+            return await s3.generate_presigned_post(
+                Bucket=bucket,
+                Key=object_name,
+                Fields={"Content-Type": content_type},
+                Conditions=[
+                    {"Content-Type": content_type},
+                    ["content-length-range", 1, max_bytes],
+                ],
+                ExpiresIn=expires,
+            )
+        except Exception as e:
+            print(f"Error generating presigned POST: {e}")
+            return None
+
+    async def stat_object(self, bucket: str, object_name: str) -> dict | None:
+        """HEAD of an object (ContentLength, ETag, ...), or None if it does not exist."""
+        s3 = await self._client("head_object")
+        try:
+            return await s3.head_object(Bucket=bucket, Key=object_name)
+        except Exception:
+            return None
 
     async def ensure_bucket_exists(self, bucket: str):
-        async with self.session.client(**self.internal_client_params) as s3:
-            try:
-                await s3.head_bucket(Bucket=bucket)
-            except Exception:
-                await s3.create_bucket(Bucket=bucket)
+        s3 = await self._client("head_bucket")
+        try:
+            await s3.head_bucket(Bucket=bucket)
+        except Exception:
+            await s3.create_bucket(Bucket=bucket)
 
 
 async_minio = AsyncMinioClient()
@@ -0,0 +1,171 @@
+# app/utils/disk_cache.py
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+# ==============================================================
+# Size-bounded LRU cache of files on local disk
+# ==============================================================
+# Keys are hashed into file names, so any string works as a key. The index
+# (key file → size, in LRU order) lives in memory and is rebuilt from the
+# directory at startup, oldest access first. Files handed out to be opened
+# later are pinned (`pin`, `commit_file(..., pin=True)`) and never evicted
+# until `unpin`. Methods are blocking; call them through asyncio.to_thread
+# from async code.
+
+
+class DiskLRUCache:
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._size = 0
+        self._pins: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def _load(self):
+        if self._loaded:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".tmp"):
+                os.remove(path)  # interrupted write
+                continue
+            st = os.stat(path)
+            entries.append((st.st_atime, name, st.st_size))
+        for _, name, size in sorted(entries):
+            self._index[name] = size
+            self._size += size
+        self._loaded = True
+
+    @staticmethod
+    def _name(key: str) -> str:
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def path(self, key: str) -> Optional[str]:
+        """
+        Path of a cached entry (marked as recently used), or None. The file
+        may be evicted at any time; use `pin` when it is opened later.
+        """
+        return self._lookup(self._name(key), pin=False)
+
+    def pin(self, key: str) -> Optional[str]:
+        """Like `path`, but the entry is kept until a matching `unpin(key)`."""
+        return self._lookup(self._name(key), pin=True)
+
+    def unpin(self, key: str):
+        self._unpin(self._name(key))
+
+    def _lookup(self, name: str, pin: bool) -> Optional[str]:
+        with self._lock:
+            self._load()
+            if name not in self._index:
+                return None
+            self._index.move_to_end(name)
+            if pin:
+                self._pins[name] = self._pins.get(name, 0) + 1
+        path = os.path.join(self.directory, name)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._size -= self._index.pop(name, 0)
+            if pin:
+                self._unpin(name)
+            return None
+        return path
+
+    def _unpin(self, name: str):
+        with self._lock:
+            count = self._pins.pop(name, 0) - 1
+            if count > 0:
+                self._pins[name] = count
+                return
+            if name not in self._index:
+                # Discarded while pinned: the file goes with its last reader
+                self._remove(name)
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self.path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, data: bytes) -> str:
+        """Store bytes atomically (temp file + rename) and return the path."""
+        name = self._name(key)
+        with self._lock:
+            self._load()
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        return self._commit(name, tmp, len(data), pin=False)
+
+    def temp_path(self) -> str:
+        """A fresh temp file in the cache directory, for streaming writes."""
+        with self._lock:
+            self._load()
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        return tmp
+
+    def commit_file(self, key: str, tmp: str, pin: bool = False) -> str:
+        """Move a file written at `temp_path()` into the cache under `key`."""
+        return self._commit(self._name(key), tmp, os.path.getsize(tmp), pin)
+
+    def _commit(self, name: str, tmp: str, size: int, pin: bool) -> str:
+        path = os.path.join(self.directory, name)
+        os.replace(tmp, path)
+        with self._lock:
+            self._size -= self._index.pop(name, 0)
+            self._index[name] = size
+            self._size += size
+            if pin:
+                self._pins[name] = self._pins.get(name, 0) + 1
+            self._evict(keep=name)
+        return path
+
+    def _evict(self, keep: str):
+        # Oldest first, skipping the entry just written and pinned ones
+        for name in list(self._index):
+            if self._size <= self.max_bytes:
+                break
+            if name == keep or name in self._pins:
+                continue
+            self._size -= self._index.pop(name)
+            self._remove(name)
+
+    def _remove(self, name: str):
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass
+
+    def discard(self, key: str):
+        name = self._name(key)
+        with self._lock:
+            self._load()
+            self._size -= self._index.pop(name, 0)
+            if name not in self._pins:  # else removed by the last unpin
+                self._remove(name)
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._load()
+            return {
+                "entries": len(self._index),
+                "bytes": self._size,
+                "maxBytes": self.max_bytes,
+                "pinned": len(self._pins),
+            }
@@ -0,0 +1,29 @@
+# app/utils/pagination.py
+
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+from uuid import UUID
+
+# ==============================================================
+# Keyset cursors
+# ==============================================================
+# A cursor is the (created_at, id) of the last row on the previous page,
+# base64url-encoded so clients treat it as opaque.
+
+
+def encode_cursor(created_at: datetime, row_id) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, UUID]]:
+    """(created_at, id) of a cursor; ValueError if it is malformed."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), UUID(row_id)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
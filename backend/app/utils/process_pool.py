@@ -0,0 +1,39 @@
+# app/utils/process_pool.py
+
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from app.core.config import settings
+
+# ==============================================================
+# Shared CPU worker pool
+# ==============================================================
+# CPU-bound work (diffs, rendering) must never run on the event loop.
+# "spawn" avoids forking a process that already runs threads (asyncio,
+# DB drivers); worker functions should live in import-light modules.
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.PROCESS_POOL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+async def run_in_process(fn, *args):
+    """Run a picklable, module-level function in the shared process pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_pool(), fn, *args)
+
+
+def shutdown_process_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
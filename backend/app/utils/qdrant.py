@@ -70,19 +70,23 @@ async def upsert_vectors(
     vectors: List[List[float]],
     payloads: List[Dict[str, Any]],
     collection_name: Optional[str] = None,
+    ids: Optional[List[str]] = None,
 ) -> None:
     """
     Pushes vectors and their payloads to Qdrant.
-    Each payload must correspond to a vector.
+    Each payload must correspond to a vector. Point ids are random unless
+    `ids` are given.
     """
     collection_name = collection_name or settings.QDRANT_COLLECTION_NAME
 
     if len(vectors) != len(payloads):
         raise ValueError("Vectors and payload lists must have same length")
+    if ids is not None and len(ids) != len(vectors):
+        raise ValueError("Vectors and id lists must have same length")
 
     points = [
         qmodels.PointStruct(
-            id=str(uuid.uuid4()),
+            id=ids[i] if ids is not None else str(uuid.uuid4()),
             vector=vectors[i],
             payload=payloads[i],
         )
@@ -97,6 +101,89 @@ async def upsert_vectors(
     print(f"✨ Async upsert: {len(points)} vectors → '{collection_name}'")
 
 
+async def delete_document_vectors(
+    document_ids: List[str],
+    collection_name: Optional[str] = None,
+) -> None:
+    """Removes every point whose payload `document_id` is one of `document_ids`."""
+    collection_name = collection_name or settings.QDRANT_COLLECTION_NAME
+    if not document_ids:
+        return
+
+    await async_qdrant.delete(
+        collection_name=collection_name,
+        points_selector=qmodels.FilterSelector(
+            filter=qmodels.Filter(
+                must=[
+                    qmodels.FieldCondition(
+                        key="document_id",
+                        match=qmodels.MatchAny(any=[str(d) for d in document_ids]),
+                    )
+                ]
+            )
+        ),
+    )
+
+    print(f"🗑️ Async delete: vectors of {len(document_ids)} document(s) → '{collection_name}'")
+
+
+async def delete_points(ids: List[str], collection_name: Optional[str] = None) -> None:
+    collection_name = collection_name or settings.QDRANT_COLLECTION_NAME
+    if not ids:
+        return
+
+    await async_qdrant.delete(
+        collection_name=collection_name,
+        points_selector=qmodels.PointIdsList(points=ids),
+    )
+
+    print(f"🗑️ Async delete: {len(ids)} vectors → '{collection_name}'")
+
+
+async def set_payloads(
+    updates: List[tuple],
+    collection_name: Optional[str] = None,
+) -> None:
+    """Merges `payload` into each point of `updates` ([(point id, payload)]) in one request."""
+    collection_name = collection_name or settings.QDRANT_COLLECTION_NAME
+    if not updates:
+        return
+
+    await async_qdrant.batch_update_points(
+        collection_name=collection_name,
+        update_operations=[
+            qmodels.SetPayloadOperation(
+                set_payload=qmodels.SetPayload(payload=payload, points=[point_id])
+            )
+            for point_id, payload in updates
+        ],
+    )
+
+
+async def scroll_document_points(
+    document_id: str,
+    collection_name: Optional[str] = None,
+    page_size: int = 1024,
+) -> List[tuple]:
+    """(point id, payload) of every vector of a document (vectors are not fetched)."""
+    collection_name = collection_name or settings.QDRANT_COLLECTION_NAME
+    condition = _build_filter({"document_id": str(document_id)})
+
+    points, offset = [], None
+    while True:
+        batch, offset = await async_qdrant.scroll(
+            collection_name=collection_name,
+            scroll_filter=condition,
+            limit=page_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=False,
+        )
+        points.extend((str(p.id), p.payload or {}) for p in batch)
+        if offset is None:
+            return points
+
+
 # ==============================================================
 # ASYNC Search / Query
 # ==============================================================
@@ -118,17 +205,7 @@ async def search_vectors(
 
     collection_name = collection_name or settings.QDRANT_COLLECTION_NAME
 
-    filter_condition = None
-    if filters:
-        filter_condition = qmodels.Filter(
-            must=[
-                qmodels.FieldCondition(
-                    key=k,
-                    match=qmodels.MatchValue(value=v),
-                )
-                for k, v in filters.items()
-            ]
-        )
+    filter_condition = _build_filter(filters)
 
     # Expand limit for MMR
     effective_limit = prefetch_k or (limit * 4 if mmr else limit)
@@ -142,6 +219,75 @@ async def search_vectors(
         search_params=qmodels.SearchParams(hnsw_ef=128, exact=False),
     )
 
+    return _finalize_results(query_vector, results, limit, mmr, mmr_lambda)
+
+
+async def search_vectors_batch(
+    query_vectors: List[List[float]],
+    filters_list: List[Optional[Dict[str, Any]]],
+    collection_name: Optional[str] = None,
+    limit: int = 5,
+    mmr: bool = True,
+    mmr_lambda: float = 0.5,
+    prefetch_k: Optional[int] = None,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Runs several filtered searches in ONE Qdrant round trip.
+
+    `query_vectors[i]` is searched with `filters_list[i]`; the same vector may
+    be repeated (e.g. one overview query across many documents).
+    Returns one result list per request, in order.
+    """
+
+    collection_name = collection_name or settings.QDRANT_COLLECTION_NAME
+
+    if len(query_vectors) != len(filters_list):
+        raise ValueError("query_vectors and filters_list must have same length")
+
+    if not query_vectors:
+        return []
+
+    effective_limit = prefetch_k or (limit * 4 if mmr else limit)
+
+    requests = [
+        qmodels.SearchRequest(
+            vector=vector,
+            filter=_build_filter(filters),
+            limit=effective_limit,
+            with_payload=True,
+            with_vector=mmr,
+            params=qmodels.SearchParams(hnsw_ef=128, exact=False),
+        )
+        for vector, filters in zip(query_vectors, filters_list)
+    ]
+
+    batch_results = await async_qdrant.search_batch(
+        collection_name=collection_name,
+        requests=requests,
+    )
+
+    return [
+        _finalize_results(vector, results, limit, mmr, mmr_lambda)
+        for vector, results in zip(query_vectors, batch_results)
+    ]
+
+
+def _build_filter(filters: Optional[Dict[str, Any]]) -> Optional[qmodels.Filter]:
+    if not filters:
+        return None
+
+    return qmodels.Filter(
+        must=[
+            qmodels.FieldCondition(
+                key=k,
+                match=qmodels.MatchValue(value=v),
+            )
+            for k, v in filters.items()
+        ]
+    )
+
+
+def _finalize_results(query_vector, results, limit: int, mmr: bool, mmr_lambda: float):
     # MMR (optional)
     if mmr:
         # Keep only results that have vectors available
@@ -0,0 +1,62 @@
+# app/utils/rate_limit.py
+
+import asyncio
+import time
+
+from app.core.config import settings
+
+
+class AsyncRateLimiter:
+    """
+    Token bucket + concurrency cap for outbound API calls.
+
+    Every LLM call in the process goes through the same limiter, so batch
+    jobs and interactive requests share one global budget instead of each
+    caller guessing at timeouts.
+    """
+
+    def __init__(self, requests_per_minute: int, max_concurrency: int):
+        self.rate = max(requests_per_minute, 1) / 60.0  # tokens per second
+        self.capacity = max(requests_per_minute, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(max(max_concurrency, 1))
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        try:
+            await self.acquire()
+        except BaseException:
+            self._semaphore.release()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._semaphore.release()
+        return False
+
+
+llm_rate_limiter = AsyncRateLimiter(
+    requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+)
+
+
+async def rate_limited(coro_fn, *args, **kwargs):
+    """Run an async LLM call under the global rate limit."""
+    async with llm_rate_limiter:
+        return await coro_fn(*args, **kwargs)
@@ -0,0 +1,107 @@
+# benchmarks/import_time.py
+"""
+Cold-start benchmark for the API.
+
+Runs `python -X importtime -c "import app.main"` in a fresh interpreter,
+reports the total import time and the slowest modules, and fails when the
+total exceeds the budget or when a module that must stay lazy got imported.
+
+Usage (from backend/):
+    python benchmarks/import_time.py                # default budget
+    python benchmarks/import_time.py --budget-ms 1500 --top 25
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+# qdrant_client's generated models alone take ~2 s to import and are used
+# throughout the app, so they are part of the baseline budget.
+DEFAULT_BUDGET_MS = int(os.getenv("IMPORT_TIME_BUDGET_MS", 5000))
+
+# Heavy modules that must only load on first use / during warm-up
+LAZY_MODULES = [
+    "torch",
+    "sentence_transformers",
+    "langchain_community",
+    "langchain_google_genai",
+    "langgraph",
+    "langchain_text_splitters",
+    "fitz",
+    "openai",
+]
+
+
+def run_importtime(target: str):
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=backend_dir,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        # Last lines of stderr carry the traceback, not importtime rows
+        tail = [line for line in proc.stderr.splitlines() if not line.startswith("import time:")]
+        raise SystemExit(f"❌ `import {target}` failed:\n" + "\n".join(tail[-20:]))
+    return proc.stderr
+
+
+def parse_importtime(output: str):
+    """
+    Each row looks like:
+        import time:  self [us] | cumulative | imported package
+        import time:       152 |        152 |   _io
+    Returns [(module, self_us, cumulative_us, depth)].
+    """
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        rows.append((name.strip(), int(parts[0]), int(parts[1]), depth))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API cold-start import benchmark")
+    parser.add_argument("--target", default="app.main")
+    parser.add_argument("--budget-ms", type=int, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    rows = parse_importtime(run_importtime(args.target))
+
+    # Top-level rows (depth 0) add up to the whole interpreter import cost
+    total_ms = sum(cum for _, _, cum, depth in rows if depth == 0) / 1000
+    imported = {name for name, _, _, _ in rows}
+
+    print(f"⏱️  import {args.target}: {total_ms:.0f} ms (budget {args.budget_ms} ms)")
+    print("\nSlowest modules (cumulative):")
+    for name, _, cum, _ in sorted(rows, key=lambda r: r[2], reverse=True)[: args.top]:
+        print(f"  {cum / 1000:9.1f} ms  {name}")
+
+    leaked = [m for m in LAZY_MODULES if m in imported]
+    failed = False
+
+    if leaked:
+        print(f"\n❌ Heavy modules imported eagerly: {', '.join(leaked)}")
+        failed = True
+
+    if total_ms > args.budget_ms:
+        print(f"\n❌ Cold start over budget by {total_ms - args.budget_ms:.0f} ms")
+        failed = True
+
+    if not failed:
+        print("\n✅ Cold start within budget")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# tests/test_async_minio.py
+import asyncio
+
+from app.utils import async_minio as async_minio_module
+from app.utils.async_minio import AsyncMinioClient, _CallMeter
+
+
+def test_call_meter_snapshot(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(async_minio_module.time, "monotonic", lambda: now[0])
+    meter = _CallMeter(window=10)
+
+    for operation in ["get_object", "head_object", "get_object"]:
+        meter.record(operation)
+    now[0] += 5
+    meter.record("put_object")
+
+    snapshot = meter.snapshot()
+    assert snapshot["windowSeconds"] == 10
+    assert snapshot["callsPerSecond"] == 0.4
+    assert snapshot["callsPerSecondByOperation"] == {
+        "get_object": 0.2,
+        "head_object": 0.1,
+        "put_object": 0.1,
+    }
+
+    # Calls older than the window leave the rate, not the totals
+    now[0] += 6
+    snapshot = meter.snapshot()
+    assert snapshot["callsPerSecondByOperation"] == {"put_object": 0.1}
+    assert snapshot["totals"] == {"get_object": 2, "head_object": 1, "put_object": 1}
+
+
+class _StubClientContext:
+    def __init__(self, log, endpoint):
+        self.log, self.endpoint = log, endpoint
+
+    async def __aenter__(self):
+        self.log.append(("open", self.endpoint))
+        return self.endpoint
+
+    async def __aexit__(self, *exc):
+        self.log.append(("close", self.endpoint))
+        return False
+
+
+def test_clients_are_opened_once_and_reused():
+    client = AsyncMinioClient()
+    log = []
+
+    class Session:
+        def client(self, **params):
+            return _StubClientContext(log, params["endpoint_url"])
+
+    client.session = Session()
+    internal = client.internal_client_params["endpoint_url"]
+    public = client.public_client_params["endpoint_url"]
+
+    async def run():
+        # Concurrent first calls start the clients only once
+        first = await asyncio.gather(*[client._client("get_object") for _ in range(5)])
+        signer = await client._client("presign", public=True)
+        await client.close()
+        await client.close()
+        return first, signer
+
+    first, signer = asyncio.run(run())
+    assert set(first) == {internal} and signer == public
+    assert log == [("open", internal), ("open", public), ("close", public), ("close", internal)]
+    assert client.meter.totals == {"get_object": 5, "presign": 1}
@@ -0,0 +1,161 @@
+# tests/test_chunking.py
+import random
+
+import pytest
+
+from app.processing.chunking import ChunkStream, chunk_pages
+
+MAX_TOKENS = 64
+
+
+def count_tokens(texts):
+    return [max(1, len(t) // 4) for t in texts]
+
+
+def words(rng, n):
+    return " ".join(rng.choice(["alpha", "beta", "gamma", "delta", "omega"]) for _ in range(n))
+
+
+def paragraph_pages(rng, count):
+    return [
+        {
+            "page": number,
+            "content": "\n\n".join(
+                words(rng, rng.randint(1, 40)) for _ in range(rng.randint(0, 6))
+            ),
+        }
+        for number in range(1, count + 1)
+    ]
+
+
+def block_pages(rng, count):
+    sections = iter(range(1, 1000))
+
+    def block():
+        if rng.random() < 0.3:
+            return {"text": f"Section {next(sections)}", "heading": True}
+        return {"text": words(rng, rng.randint(1, 30))}
+
+    return [
+        {"page": number, "content": "", "blocks": [block() for _ in range(rng.randint(0, 8))]}
+        for number in range(1, count + 1)
+    ]
+
+
+def line_pages(rng, count, per_page=10):
+    return [
+        {
+            "page": number,
+            "lines": [(number - 1) * per_page + 1, number * per_page],
+            "content": "\n".join(
+                f"line {(number - 1) * per_page + k + 1} {words(rng, rng.randint(0, 8))}"
+                for k in range(per_page)
+            ),
+        }
+        for number in range(1, count + 1)
+    ]
+
+
+def record_pages(rng, count, per_page=5):
+    prefix = "id,name,notes"
+    return [
+        {
+            "page": number,
+            "records": [(number - 1) * per_page + 1, number * per_page],
+            "prefix": prefix,
+            "content": prefix
+            + "\n"
+            + "\n".join(f"{k},{words(rng, 2)},{words(rng, 6)}" for k in range(per_page)),
+        }
+        for number in range(1, count + 1)
+    ]
+
+
+KINDS = [paragraph_pages, block_pages, line_pages, record_pages]
+
+
+@pytest.mark.parametrize("kind", KINDS)
+@pytest.mark.parametrize("seed", range(10))
+def test_stream_matches_chunk_pages(kind, seed):
+    rng = random.Random(seed)
+    pages = kind(rng, rng.randint(1, 25))
+    stream, streamed, i = ChunkStream(count_tokens, MAX_TOKENS), [], 0
+    while i < len(pages):
+        size = rng.randint(1, 4)
+        streamed += stream.feed(pages[i : i + size])
+        i += size
+    streamed += stream.finish()
+    assert streamed == chunk_pages(pages, count_tokens, MAX_TOKENS)
+
+
+@pytest.mark.parametrize("kind", KINDS)
+@pytest.mark.parametrize("seed", range(10))
+def test_chunks_fit_and_follow_pages(kind, seed):
+    pages = kind(random.Random(seed), 12)
+    chunks = chunk_pages(pages, count_tokens, MAX_TOKENS)
+    assert all(c["tokens"] <= MAX_TOKENS for c in chunks)
+    assert all(c["page"] <= c["page_end"] for c in chunks)
+    assert all(a["page_end"] <= b["page"] for a, b in zip(chunks, chunks[1:]))
+
+
+def test_long_unit_is_split():
+    text = "word " * 200
+    chunks = chunk_pages([{"page": 1, "content": text}], count_tokens, MAX_TOKENS)
+    assert len(chunks) > 1
+    assert all(c["tokens"] <= MAX_TOKENS for c in chunks)
+    assert " ".join(c["content"] for c in chunks).split() == text.split()
+
+
+def test_line_ranges():
+    pages = line_pages(random.Random(0), 6)
+    lines = {
+        number: text
+        for page in pages
+        for number, text in enumerate(page["content"].split("\n"), start=page["lines"][0])
+    }
+    chunks = chunk_pages(pages, count_tokens, MAX_TOKENS)
+    first, last = chunks[0]["lines"][0], chunks[-1]["lines"][1]
+    assert (first, last) == (1, 60)
+    for a, b in zip(chunks, chunks[1:]):
+        assert b["lines"][0] == a["lines"][1] + 1
+    for c in chunks:
+        start, end = c["lines"]
+        assert c["content"] == "\n".join(lines[n].strip() for n in range(start, end + 1))
+
+
+def test_record_chunks_repeat_prefix():
+    pages = record_pages(random.Random(0), 6)
+    chunks = chunk_pages(pages, count_tokens, MAX_TOKENS)
+    assert len(chunks) > 1
+    assert all(c["content"].startswith("id,name,notes\n") for c in chunks)
+    assert chunks[0]["records"][0] == 1 and chunks[-1]["records"][1] == 30
+    assert all(c["lines"] is None for c in chunks)
+
+
+def test_joined_records_over_budget_keep_prefix():
+    # Separators cost extra once units are joined, so packed chunks overflow
+    def joined_count(texts):
+        return [max(1, len(t) // 4) + 6 * t.count("\n") for t in texts]
+
+    pages = record_pages(random.Random(0), 6)
+    chunks = chunk_pages(pages, joined_count, MAX_TOKENS)
+    assert all(c["tokens"] <= MAX_TOKENS for c in chunks)
+    assert all(c["content"].startswith("id,name,notes\n") for c in chunks)
+    rows = [row for c in chunks for row in c["content"].split("\n")[1:]]
+    assert rows == [row for p in pages for row in p["content"].split("\n")[1:]]
+    for a, b in zip(chunks, chunks[1:]):
+        assert b["records"][0] == a["records"][1] + 1
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_heading_stays_with_its_body(seed):
+    pages = block_pages(random.Random(seed), 10)
+    for c in chunk_pages(pages, count_tokens, MAX_TOKENS)[:-1]:
+        assert not c["content"].split("\n\n")[-1].startswith("Section ")
+
+
+def test_empty_input():
+    assert chunk_pages([], count_tokens, MAX_TOKENS) == []
+    assert chunk_pages([{"page": 1, "content": "  \n\n "}], count_tokens, MAX_TOKENS) == []
+    stream = ChunkStream(count_tokens, MAX_TOKENS)
+    assert stream.feed([]) == [] and stream.finish() == []
@@ -0,0 +1,78 @@
+# tests/test_comparison_cache.py
+import copy
+
+from app.services.comparison_cache import (
+    cache_key,
+    change_order,
+    flip_change,
+    flip_summary,
+    normalize_options,
+)
+
+CHANGES = [
+    {"type": "addition", "location": {"document": 2, "page": 1, "lineNumber": 1}},
+    {
+        "type": "modification",
+        "location": {"document": 2, "page": 1, "lineNumber": 4},
+        "content": {
+            "before": "total 10",
+            "after": "total 12",
+            "beforeLocation": {"document": 1, "page": 2, "lineNumber": 1},
+            "words": [
+                {"op": "equal", "text": "total "},
+                {"op": "delete", "text": "10"},
+                {"op": "insert", "text": "12"},
+            ],
+        },
+    },
+    {"type": "deletion", "location": {"document": 1, "page": 1, "lineNumber": 3}},
+]
+
+
+def test_cache_key_is_symmetric():
+    key, flipped = cache_key("a", "b", "full", {})
+    reverse_key, reverse_flipped = cache_key("b", "a", "full", {})
+    assert key == reverse_key
+    assert (flipped, reverse_flipped) == (False, True)
+    assert cache_key("a", "b", "full", {"caseSensitive": True})[0] != key
+
+
+def test_presentation_options_do_not_change_the_key():
+    assert normalize_options({"highlightChanges": False}) == normalize_options({})
+
+
+def test_flip_summary():
+    result = {
+        "summary": {
+            "additions": 1,
+            "deletions": 2,
+            "containment": {"document1InDocument2": 0.5, "document2InDocument1": 0.25},
+        },
+        "categoryBreakdown": {"content": 3},
+    }
+    flipped = flip_summary(result)
+    assert flipped["summary"]["additions"] == 2
+    assert flipped["summary"]["deletions"] == 1
+    assert flipped["summary"]["containment"] == {
+        "document1InDocument2": 0.25,
+        "document2InDocument1": 0.5,
+    }
+    assert result["summary"]["additions"] == 1  # not modified in place
+
+
+def test_flip_change_and_order():
+    flipped = sorted((flip_change(copy.deepcopy(c)) for c in CHANGES), key=change_order)
+    assert [(c["type"], c["location"]) for c in flipped] == [
+        ("deletion", {"document": 1, "page": 1, "lineNumber": 1}),
+        ("addition", {"document": 2, "page": 1, "lineNumber": 3}),
+        ("modification", {"document": 2, "page": 2, "lineNumber": 1}),
+    ]
+    content = flipped[2]["content"]
+    assert content["before"] == "total 12" and content["after"] == "total 10"
+    assert content["beforeLocation"] == {"document": 1, "page": 1, "lineNumber": 4}
+    assert [w["op"] for w in content["words"]] == ["equal", "delete", "insert"]
+
+
+def test_flip_change_twice_is_identity():
+    for change in CHANGES:
+        assert flip_change(flip_change(copy.deepcopy(change))) == change
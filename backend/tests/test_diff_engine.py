@@ -0,0 +1,165 @@
+# tests/test_diff_engine.py
+import difflib
+import random
+
+import pytest
+
+from app.processing import diff_engine
+from app.processing.diff_engine import (
+    align_pages,
+    diff_page_pair,
+    diff_page_pairs,
+    opcodes,
+    patience_matches,
+    split_lines,
+    whole_page_changes,
+)
+
+OPTIONS = {"ignoreFormatting": True, "caseSensitive": False}
+
+
+def apply(ops, a, b):
+    """Rebuild `b` from `a` with the opcodes, checking equal blocks really are equal."""
+    out, i, j = [], 0, 0
+    for tag, i1, i2, j1, j2 in ops:
+        assert (i1, j1) == (i, j)
+        if tag == "equal":
+            assert a[i1:i2] == b[j1:j2]
+            out += a[i1:i2]
+        else:
+            out += b[j1:j2]
+        i, j = i2, j2
+    assert (i, j) == (len(a), len(b))
+    return out
+
+
+def edited(lines, rng):
+    """`lines` with random deletions, insertions and replacements (no moves)."""
+    out, fresh = [], 0
+    for line in lines:
+        roll = rng.random()
+        if roll < 0.1:
+            continue
+        if roll < 0.2:
+            out.append(f"new {fresh}")
+            fresh += 1
+        out.append(line)
+    return out
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_opcodes_rebuild_the_target(seed):
+    rng = random.Random(seed)
+    # Few distinct values: lots of repeated lines, no unique anchors in places
+    a = [rng.choice("abcde") for _ in range(rng.randint(0, 60))]
+    b = [rng.choice("abcdef") for _ in range(rng.randint(0, 60))]
+    assert apply(opcodes(a, b), a, b) == b
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_matches_difflib_on_edits(seed):
+    rng = random.Random(seed)
+    a = [f"line {i}" for i in range(rng.randint(0, 200))]
+    b = edited(a, rng)
+    expected = [
+        (block.a + k, block.b + k)
+        for block in difflib.SequenceMatcher(None, a, b, autojunk=False).get_matching_blocks()
+        for k in range(block.size)
+    ]
+    assert patience_matches(a, b) == expected
+
+
+def test_empty_inputs():
+    assert opcodes([], []) == []
+    assert opcodes(["a"], []) == [("delete", 0, 1, 0, 0)]
+    assert opcodes([], ["a"]) == [("insert", 0, 0, 0, 1)]
+    assert diff_page_pair(1, "", 1, "", OPTIONS) == []
+    assert diff_page_pairs([], OPTIONS) == []
+    assert align_pages([], [], OPTIONS) == ([], [], [], 0)
+
+
+def test_fallback_without_anchors(monkeypatch):
+    # Repeated lines only, no common prefix or suffix
+    a, b = ["x", "y"] * 3, ["y", "x"] * 2
+    assert apply(opcodes(a, b), a, b) == b
+    assert any(tag == "equal" for tag, *_ in opcodes(a, b))
+
+    # Too large for the fallback: one replace block instead of matching
+    monkeypatch.setattr(diff_engine, "FALLBACK_CELLS", 4)
+    assert opcodes(a, b) == [("replace", 0, 6, 0, 4)]
+
+
+def test_page_pair_changes():
+    before = "Total: 10 EUR\nkept line\nremoved line\n\n   Same   TEXT  "
+    after = "Total: 12 EUR\nkept line\nsame text\nbrand new paragraph here"
+    changes = diff_page_pair(3, before, 4, after, OPTIONS)
+    assert [c["type"] for c in changes] == ["modification", "deletion", "addition"]
+
+    modification = changes[0]
+    assert modification["location"] == {"document": 2, "page": 4, "lineNumber": 1}
+    assert modification["content"]["beforeLocation"] == {
+        "document": 1,
+        "page": 3,
+        "lineNumber": 1,
+    }
+    assert modification["content"]["words"] == [
+        {"op": "equal", "text": "Total:"},
+        {"op": "delete", "text": "10"},
+        {"op": "insert", "text": "12"},
+        {"op": "equal", "text": "EUR"},
+    ]
+    assert changes[1]["location"] == {"document": 1, "page": 3, "lineNumber": 3}
+    assert changes[2]["location"] == {"document": 2, "page": 4, "lineNumber": 4}
+
+
+def test_options():
+    assert split_lines("a\n\n  \nb", {"ignoreFormatting": False}) == ["a", "", "  ", "b"]
+    assert diff_page_pair(1, "Hello  World", 1, "hello world", OPTIONS) == []
+    strict = {"ignoreFormatting": False, "caseSensitive": True}
+    assert [c["type"] for c in diff_page_pair(1, "Hello", 1, "hello", strict)] == ["modification"]
+
+
+def test_pairs_are_diffed_independently():
+    pairs = [(1, "a\nb", 1, "a\nc"), (2, "x", 3, "y z w")]
+    expected = diff_page_pair(*pairs[0], OPTIONS) + diff_page_pair(*pairs[1], OPTIONS)
+    assert diff_page_pairs(pairs, OPTIONS) == expected
+
+
+def test_page_boundaries():
+    pages1 = ["page one", "page two", "page three", "page four"]
+    pages2 = ["page one", "inserted page", "page two", "page three changed", "page four"]
+    modified, added, deleted, unchanged = align_pages(pages1, pages2, OPTIONS)
+    assert unchanged == 3
+    # Pages are matched by content, so the insert does not shift the diff
+    assert added == [(2, "inserted page")]
+    assert deleted == []
+    assert modified == [(3, "page three", 4, "page three changed")]
+
+    modified, added, deleted, unchanged = align_pages(pages1, pages1[1:], OPTIONS)
+    assert (modified, added, deleted, unchanged) == ([], [], [(1, "page one")], 3)
+
+    modified, added, deleted, unchanged = align_pages(
+        ["intro", "body text"], ["intro", "body text, edited"], OPTIONS
+    )
+    assert (modified, added, deleted, unchanged) == (
+        [(2, "body text", 2, "body text, edited")],
+        [],
+        [],
+        1,
+    )
+
+
+def test_whole_page_changes():
+    changes = whole_page_changes([(2, "new")], [(5, "old")])
+    assert changes == [
+        {
+            "type": "deletion",
+            "location": {"document": 1, "page": 5, "section": "page"},
+            "content": "old",
+        },
+        {
+            "type": "addition",
+            "location": {"document": 2, "page": 2, "section": "page"},
+            "content": "new",
+        },
+    ]
@@ -0,0 +1,214 @@
+# tests/test_disk_cache.py
+import asyncio
+import os
+
+import pytest
+
+from app.utils.async_minio import AsyncMinioClient
+from app.utils.disk_cache import DiskLRUCache
+
+
+def files(directory):
+    return sorted(os.listdir(directory))
+
+
+def test_evicts_least_recently_used_by_bytes(tmp_path):
+    cache = DiskLRUCache(str(tmp_path), max_bytes=10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    assert cache.get("a") == b"1234"  # "b" is now the oldest
+    cache.put("c", b"1234")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1234" and cache.get("c") == b"1234"
+    assert cache.stats()["bytes"] == 8
+    assert len(files(tmp_path)) == 2
+
+
+def test_keeps_the_entry_just_written(tmp_path):
+    cache = DiskLRUCache(str(tmp_path), max_bytes=10)
+    cache.put("small", b"12")
+    path = cache.put("large", b"x" * 16)  # over budget on its own
+
+    assert open(path, "rb").read() == b"x" * 16
+    assert cache.get("small") is None
+    assert cache.stats() == {"entries": 1, "bytes": 16, "maxBytes": 10, "pinned": 0}
+
+
+def test_replacing_an_entry_updates_its_size(tmp_path):
+    cache = DiskLRUCache(str(tmp_path), max_bytes=10)
+    cache.put("a", b"123456")
+    cache.put("a", b"12")
+    cache.put("b", b"12345678")
+    assert cache.get("a") == b"12" and cache.stats()["bytes"] == 10
+
+
+def test_load_rebuilds_the_index_and_drops_temp_files(tmp_path):
+    cache = DiskLRUCache(str(tmp_path), max_bytes=100)
+    cache.put("old", b"1111")
+    cache.put("new", b"2222")
+    names = {key: os.path.basename(cache.path(key)) for key in ("old", "new")}
+    os.utime(tmp_path / names["old"], (1_000, 1_000))
+    os.utime(tmp_path / names["new"], (2_000, 2_000))
+    (tmp_path / "interrupted.tmp").write_bytes(b"partial")
+
+    reopened = DiskLRUCache(str(tmp_path), max_bytes=6)
+    assert reopened.stats()["bytes"] == 8
+    assert "interrupted.tmp" not in files(tmp_path)
+
+    reopened.put("third", b"33")  # the oldest access goes first
+    assert reopened.get("old") is None
+    assert reopened.get("new") == b"2222" and reopened.get("third") == b"33"
+
+
+def test_discard(tmp_path):
+    cache = DiskLRUCache(str(tmp_path), max_bytes=100)
+    cache.put("a", b"1234")
+    cache.discard("a")
+    cache.discard("missing")
+    assert cache.get("a") is None
+    assert files(tmp_path) == [] and cache.stats()["bytes"] == 0
+
+
+def test_streamed_commit(tmp_path):
+    cache = DiskLRUCache(str(tmp_path), max_bytes=100)
+    tmp = cache.temp_path()
+    with open(tmp, "wb") as f:
+        f.write(b"streamed")
+    path = cache.commit_file("key", tmp)
+    assert cache.path("key") == path and cache.get("key") == b"streamed"
+    assert not os.path.exists(tmp)
+
+
+def test_pinned_entries_are_not_evicted(tmp_path):
+    cache = DiskLRUCache(str(tmp_path), max_bytes=8)
+    pinned = cache.put("a", b"1234")
+    assert cache.pin("a") == pinned
+    assert cache.pin("missing") is None
+
+    cache.put("b", b"1234")
+    cache.put("c", b"1234")  # "a" is oldest but pinned: "b" goes
+    assert os.path.exists(pinned) and cache.get("b") is None
+    assert cache.stats()["pinned"] == 1
+
+    cache.unpin("a")
+    cache.put("d", b"1234")
+    assert cache.get("a") is None and not os.path.exists(pinned)
+
+
+def test_pins_are_counted_and_survive_discard(tmp_path):
+    cache = DiskLRUCache(str(tmp_path), max_bytes=100)
+    tmp = cache.temp_path()
+    with open(tmp, "wb") as f:
+        f.write(b"data")
+    path = cache.commit_file("a", tmp, pin=True)
+    assert cache.pin("a") == path
+
+    cache.discard("a")
+    assert cache.get("a") is None and os.path.exists(path)
+    cache.unpin("a")
+    assert os.path.exists(path)
+    cache.unpin("a")  # last reader: the discarded file goes
+    assert not os.path.exists(path)
+    assert cache.stats()["pinned"] == 0
+
+
+# ----------------------------------------------
+# async_minio.local_copy against a stub S3 client
+# ----------------------------------------------
+class _Body:
+    def __init__(self, data: bytes):
+        self.data = data
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def read(self, size: int = -1):
+        await asyncio.sleep(0.01)
+        chunk, self.data = (self.data, b"") if size < 0 else (self.data[:size], self.data[size:])
+        return chunk
+
+
+class _StubS3:
+    def __init__(self, objects: dict):
+        self.objects = objects  # key → (etag, bytes)
+        self.calls = []
+
+    async def head_object(self, Bucket, Key):
+        self.calls.append("head_object")
+        if Key not in self.objects:
+            raise KeyError(Key)
+        return {"ETag": f'"{self.objects[Key][0]}"'}
+
+    async def get_object(self, Bucket, Key):
+        self.calls.append("get_object")
+        return {"Body": _Body(self.objects[Key][1])}
+
+
+@pytest.fixture
+def minio(tmp_path):
+    client = AsyncMinioClient()
+    client.blob_cache = DiskLRUCache(str(tmp_path), max_bytes=1024)
+    client.s3 = _StubS3({"doc.pdf": ("v1", b"%PDF v1")})
+
+    async def stub_client(operation, public=False):
+        client.meter.record(operation)
+        return client.s3
+
+    client._client = stub_client
+    return client
+
+
+def test_concurrent_copies_share_one_download(minio):
+    async def read(delay):
+        await asyncio.sleep(delay)
+        async with minio.local_copy("documents", "doc.pdf") as path:
+            data = open(path, "rb").read()
+            await asyncio.sleep(0.02)
+            return path, data, sum(minio.blob_cache._pins.values())
+
+    async def run():
+        return await asyncio.gather(*[read(i * 0.001) for i in range(4)])
+
+    results = asyncio.run(run())
+    assert {data for _, data, _ in results} == {b"%PDF v1"}
+    assert len({path for path, _, _ in results}) == 1
+    assert max(pins for *_, pins in results) > 1  # readers overlap, each holds a pin
+    assert minio.s3.calls.count("get_object") == 1
+    assert minio.blob_cache.stats()["pinned"] == 0
+    assert minio._downloads == {}
+
+
+def test_local_copy_follows_the_etag(minio):
+    async def read():
+        async with minio.local_copy("documents", "doc.pdf") as path:
+            return open(path, "rb").read()
+
+    assert asyncio.run(read()) == b"%PDF v1"
+    assert asyncio.run(read()) == b"%PDF v1"
+    assert minio.s3.calls.count("get_object") == 1
+
+    minio.s3.objects["doc.pdf"] = ("v2", b"%PDF v2")  # overwritten object
+    assert asyncio.run(read()) == b"%PDF v2"
+    assert minio.s3.calls.count("get_object") == 2
+
+
+def test_local_copy_with_known_etag_skips_head(minio):
+    async def read():
+        async with minio.local_copy("documents", "doc.pdf", '"v1"') as path:
+            return open(path, "rb").read()
+
+    assert asyncio.run(read()) == b"%PDF v1"
+    assert "head_object" not in minio.s3.calls
+
+
+def test_missing_object_gives_no_path(minio):
+    async def read():
+        async with minio.local_copy("documents", "missing.pdf") as path:
+            return path
+
+    assert asyncio.run(read()) is None
+    assert minio.blob_cache.stats()["entries"] == 0
@@ -0,0 +1,72 @@
+# tests/test_extract_content.py
+from app.processing.extract_content import (
+    TEXT_PAGE_BYTES,
+    _pack_rows,
+    _text_rows,
+    extract_content,
+    iter_pages,
+)
+
+LINES = [f"line {n}: " + "lorem ipsum " * (n % 7) for n in range(1, 2001)]
+
+
+def check_line_pages(pages, lines):
+    """Pages hold every line once, in order, and carry their own range."""
+    expected_first = 1
+    for number, page in enumerate(pages, start=1):
+        first, last = page["lines"]
+        assert page["page"] == number and first == expected_first
+        assert page["content"].split("\n") == lines[first - 1 : last]
+        assert len(page["content"].encode("utf-8")) < TEXT_PAGE_BYTES + 200
+        expected_first = last + 1
+    assert expected_first == len(lines) + 1
+
+
+def test_text_files_are_packed_into_line_pages(tmp_path):
+    data = "\n".join(LINES).encode("utf-8")
+    pages = list(iter_pages(data, "notes.txt"))
+    assert len(pages) > 5
+    check_line_pages(pages, LINES)
+
+    # A path (here with CRLF line ends) gives the same pages
+    path = tmp_path / "server.log"
+    path.write_bytes(data.replace(b"\n", b"\r\n"))
+    assert list(iter_pages(str(path))) == pages
+    assert extract_content(str(path), "renamed.log") == {"extension": "log", "pages": pages}
+
+
+def test_inserted_line_only_moves_nearby_pages():
+    before = list(_pack_rows(_text_rows(LINES), "lines", page_bytes=1024))
+    edited = LINES[:1000] + ["inserted"] + LINES[1000:]
+    after = list(_pack_rows(_text_rows(edited), "lines", page_bytes=1024))
+
+    contents = {page["content"] for page in before}
+    unchanged = [page for page in after if page["content"] in contents]
+    assert len(after) - len(unchanged) <= 3
+    # Pages before the edit keep their numbers and line ranges
+    assert after[:5] == before[:5]
+
+
+def test_short_and_empty_text():
+    assert list(iter_pages(b"one\ntwo\n", "a.txt")) == [
+        {"page": 1, "content": "one\ntwo", "lines": [1, 2]}
+    ]
+    assert list(iter_pages(b"", "a.txt")) == []
+
+
+def test_csv_pages_repeat_the_header():
+    rows = "\n".join(f"{n},{'x' * 40}" for n in range(1, 501))
+    pages = list(iter_pages(f"id,value\n{rows}\n".encode("utf-8"), "table.csv"))
+    assert len(pages) > 1
+
+    expected_first = 1
+    for page in pages:
+        first, last = page["records"]
+        assert page["prefix"] == "id,value" and first == expected_first
+        lines = page["content"].split("\n")
+        assert lines[0] == "id,value"
+        assert [line.split(",")[0] for line in lines[1:]] == [
+            str(n) for n in range(first, last + 1)
+        ]
+        expected_first = last + 1
+    assert expected_first == 501
@@ -0,0 +1,113 @@
+# tests/test_ingestion.py
+import asyncio
+import hashlib
+import io
+import uuid
+import zipfile
+
+import pytest
+
+from app.services import ingestion
+from app.services.ingestion import _hash_upload, plan_uploads, stage_files, staged_object_name
+
+
+class Upload:
+    """Just enough of starlette's UploadFile."""
+
+    def __init__(self, filename: str, data: bytes, content_type: str = None):
+        self.filename = filename
+        self.content_type = content_type
+        self.size = len(data)
+        self.file = io.BytesIO(data)
+
+    async def read(self, size: int = -1) -> bytes:
+        return self.file.read(size)
+
+
+def zip_bytes(entries: dict) -> bytes:
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w") as archive:
+        for name, data in entries.items():
+            archive.writestr(name, data)
+    return out.getvalue()
+
+
+async def drain(chunks) -> bytes:
+    return b"".join([chunk async for chunk in chunks])
+
+
+def test_plan_expands_archives(monkeypatch):
+    monkeypatch.setattr(ingestion, "STREAM_CHUNK", 4)  # several chunks per file
+    archive = zip_bytes(
+        {
+            "reports/q1.pdf": b"%PDF quarter one",
+            "reports/notes.txt": b"plain notes",
+            "reports/empty/": b"",
+            "__MACOSX/reports/._q1.pdf": b"resource fork",
+            "reports/.DS_Store": b"finder",
+        }
+    )
+    uploads = [
+        Upload("single.csv", b"a,b\n1,2\n", "text/csv"),
+        Upload("bundle.ZIP", archive, "application/zip"),
+    ]
+
+    async def run():
+        plan = await plan_uploads(uploads)
+        return [(name, ctype, size, await drain(chunks())) for name, ctype, size, chunks in plan]
+
+    assert asyncio.run(run()) == [
+        ("single.csv", "text/csv", 8, b"a,b\n1,2\n"),
+        ("q1.pdf", "application/pdf", 16, b"%PDF quarter one"),
+        ("notes.txt", "text/plain", 11, b"plain notes"),
+    ]
+
+
+def test_plan_rejects_a_bad_archive():
+    with pytest.raises(ValueError, match="broken.zip"):
+        asyncio.run(plan_uploads([Upload("broken.zip", b"not a zip")]))
+
+
+def test_stage_files(monkeypatch):
+    stored = {}
+
+    async def upload_stream(bucket, object_name, chunks, content_type, keep_local=False):
+        data = await drain(chunks)
+        if data == b"boom":
+            raise RuntimeError("storage unavailable")
+        stored[object_name] = (data, content_type, keep_local)
+        return {"uri": f"{bucket}/{object_name}", "size": len(data), "etag": '"e"'}
+
+    monkeypatch.setattr(ingestion.async_minio, "upload_stream", upload_stream)
+    monkeypatch.setattr(ingestion.settings, "UPLOAD_MAX_MB", 1)
+    user_id = uuid.uuid4()
+
+    def entry(name, data, size=None):
+        async def chunks():
+            yield data
+
+        return (name, "text/plain", len(data) if size is None else size, lambda: chunks())
+
+    plan = [
+        entry("a.txt", b"first"),
+        entry("big.txt", b"x", size=2 * 1024 * 1024),
+        entry("b.txt", b"boom"),
+    ]
+    (source, error), (big, big_error), (failed, failed_error) = asyncio.run(
+        stage_files(user_id, plan)
+    )
+
+    assert error is None
+    assert source["filename"] == "a.txt" and source["contentType"] == "text/plain"
+    assert source["objectName"] == staged_object_name(user_id, source["documentId"], "a.txt")
+    assert stored == {source["objectName"]: (b"first", "text/plain", True)}
+    assert big is None and "1 MB" in big_error
+    assert failed is None and failed_error == "storage unavailable"
+
+
+def test_hash_upload(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingestion, "STREAM_CHUNK", 3)
+    path = tmp_path / "upload.bin"
+    path.write_bytes(b"streamed in small chunks")
+    digest = hashlib.sha256(b"streamed in small chunks").hexdigest()
+    assert _hash_upload(str(path)) == (digest, 24)
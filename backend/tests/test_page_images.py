@@ -0,0 +1,165 @@
+# tests/test_page_images.py
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import documents as documents_api
+from app.core.security import get_current_user
+from app.db.session import get_db
+from app.processing.render_pages import render_page, render_pages
+from app.services.page_images import PageImageService, _MemoryLRU, image_etag, image_key
+
+DOC_ID = uuid.UUID("00000000-0000-0000-0000-000000000001")
+
+
+def pdf_bytes(pages: int) -> bytes:
+    import fitz
+
+    pdf = fitz.open()
+    for number in range(1, pages + 1):
+        pdf.new_page(width=200, height=100).insert_text((20, 50), f"page {number}")
+    return pdf.tobytes()
+
+
+def test_keys_and_etags_follow_revisions():
+    first = image_key(DOC_ID, 3, 150, "png")
+    assert first == image_key(DOC_ID, 3, 150, "png", revision=1)
+    assert first.startswith(f"{DOC_ID}/3-150-")
+
+    second = image_key(DOC_ID, 3, 150, "png", revision=2)
+    assert second.startswith(f"{DOC_ID}/r2/") and second != first
+    assert len({first, second, image_key(DOC_ID, 3, 150, "png", revision=3)}) == 3
+    assert image_key(DOC_ID, 3, 72, "png") != first
+    assert image_key(DOC_ID, 3, 150, "webp") != first
+
+    etag = image_etag(DOC_ID, 3, 150, "png", revision=2)
+    assert etag.startswith('"') and etag.endswith('"') and "/" not in etag
+    assert etag != image_etag(DOC_ID, 3, 150, "png")
+
+
+def test_memory_lru_evicts_least_recently_used():
+    lru = _MemoryLRU(max_bytes=10)
+    lru.put("a", b"1234")
+    lru.put("b", b"1234")
+    assert lru.get("a") == b"1234"  # "b" is now the oldest
+    lru.put("c", b"1234")
+    assert lru.get("b") is None
+    assert lru.get("a") == b"1234" and lru.get("c") == b"1234"
+
+    lru.put("a", b"12")  # replacing an entry frees its old size
+    lru.put("d", b"1234")
+    assert lru._size == 10 and lru.get("c") == b"1234"
+
+    lru.put("huge", b"x" * 11)  # never cached, nothing evicted for it
+    assert lru.get("huge") is None and lru.get("a") == b"12"
+
+
+def test_concurrent_requests_share_one_render(monkeypatch):
+    service = PageImageService()
+    calls = []
+
+    async def load_or_render(key, document, page, dpi, fmt):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        service.memory.put(key, b"image")
+        return b"image"
+
+    monkeypatch.setattr(service, "_load_or_render", load_or_render)
+    document = SimpleNamespace(id=DOC_ID, revision=2)
+
+    async def run():
+        results = await asyncio.gather(
+            *[service.get_image(document, 1, 150, "png") for _ in range(5)]
+        )
+        # Later requests are memory hits
+        results.append(await service.get_image(document, 1, 150, "png"))
+        return results
+
+    assert asyncio.run(run()) == [b"image"] * 6
+    assert calls == [image_key(DOC_ID, 1, 150, "png", 2)]
+    assert service._inflight == {}
+
+
+def test_failed_render_reaches_every_waiter(monkeypatch):
+    service = PageImageService()
+    calls = []
+
+    async def load_or_render(key, document, page, dpi, fmt):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        raise LookupError("source missing")
+
+    monkeypatch.setattr(service, "_load_or_render", load_or_render)
+    document = SimpleNamespace(id=DOC_ID, revision=None)
+
+    async def run():
+        return await asyncio.gather(
+            *[service.get_image(document, 1, 150, "png") for _ in range(3)],
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(isinstance(r, LookupError) for r in results)
+    assert service._inflight == {}
+    with pytest.raises(ValueError):
+        asyncio.run(service.get_image(document, 1, 150, "gif"))
+
+
+def test_render_pages():
+    source = pdf_bytes(3)
+    image = render_page(source, 2, 36)
+    assert image.startswith(b"\x89PNG")
+    assert render_pages(source, 36, max_pages=2) == [render_page(source, 1, 36), image]
+    with pytest.raises(IndexError):
+        render_page(source, 4, 36)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    user = SimpleNamespace(id=uuid.uuid4())
+    doc = SimpleNamespace(
+        id=DOC_ID, owner_id=user.id, content_type="application/pdf", page_count=3, revision=2
+    )
+    rendered = []
+
+    async def get_document_by_id(db, doc_id):
+        return doc if doc_id == doc.id else None
+
+    async def get_image(document, page, dpi, fmt):
+        rendered.append((page, dpi, fmt))
+        return b"image"
+
+    async def no_db():
+        yield None
+
+    monkeypatch.setattr(documents_api.doc_crud, "get_document_by_id", get_document_by_id)
+    monkeypatch.setattr(documents_api.page_image_service, "get_image", get_image)
+    app = FastAPI()
+    app.include_router(documents_api.router)
+    app.dependency_overrides[get_db] = no_db
+    app.dependency_overrides[get_current_user] = lambda: user
+    test_client = TestClient(app)
+    test_client.rendered = rendered
+    return test_client
+
+
+def test_image_etag_revalidation(client):
+    url = f"/{DOC_ID}/page/2/image?dpi=100"
+    first = client.get(url)
+    assert first.status_code == 200 and first.content == b"image"
+    etag = first.headers["etag"]
+    assert etag == image_etag(DOC_ID, 2, 100, "png", 2)
+
+    again = client.get(url, headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.content == b""
+    assert again.headers["etag"] == etag
+    assert client.rendered == [(2, 100, "png")]
+
+    stale = client.get(url, headers={"If-None-Match": image_etag(DOC_ID, 2, 100, "png", 1)})
+    assert stale.status_code == 200
+    assert len(client.rendered) == 2
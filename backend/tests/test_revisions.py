@@ -0,0 +1,182 @@
+# tests/test_revisions.py
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from app.processing.chunking import chunk_pages
+from app.processing.extract_content import extract_content
+from app.services import revisions
+from app.services.revisions import apply_revision
+
+MAX_TOKENS = 64
+LINES = [f"line {n}: " + " ".join(["alpha", "beta", "gamma"][: n % 4]) for n in range(1, 301)]
+
+
+def count_tokens(texts):
+    return [len(t) // 4 + 1 for t in texts]
+
+
+class Index:
+    """In-memory stand-in for the document's vectors in Qdrant."""
+
+    def __init__(self, log):
+        self.points, self.log = {}, log
+
+    async def scroll(self, document_id):
+        return [(point_id, dict(payload)) for point_id, payload in self.points.items()]
+
+    async def upsert(self, vectors, payloads, ids):
+        self.log.append("upsert")
+        self.points.update({point_id: dict(p) for point_id, p in zip(ids, payloads)})
+
+    async def set_payloads(self, updates):
+        self.log.append("set_payloads")
+        for point_id, payload in updates:
+            self.points[point_id].update(payload)
+
+    async def delete(self, ids):
+        self.log.append("delete")
+        for point_id in ids:
+            self.points.pop(point_id, None)
+
+
+class Session:
+    def __init__(self, log):
+        self.log, self.fail_commit = log, False
+
+    def add(self, row):
+        pass
+
+    async def commit(self):
+        if self.fail_commit:
+            raise RuntimeError("connection lost")
+        self.log.append("commit")
+
+    async def rollback(self):
+        self.log.append("rollback")
+
+
+@pytest.fixture
+def env(monkeypatch, tmp_path):
+    log = []
+    index, db, pages = Index(log), Session(log), {}
+    doc = SimpleNamespace(
+        id=uuid.uuid4(),
+        owner_id=uuid.uuid4(),
+        filename="notes.txt",
+        revision=None,
+        meta_data={},
+        content_type="text/plain",
+        size=0,
+        content_hash=None,
+        page_count=0,
+        uploaded_at=None,
+    )
+
+    async def lock_document(db, doc_id):
+        log.append("lock")
+        return doc
+
+    async def get_revisions(db, doc_id):
+        return ["earlier"]
+
+    async def get_page_hashes(db, doc_id):
+        return dict(pages)
+
+    async def replace_pages(db, doc_id, changed, page_count):
+        for page in changed:
+            pages[page["page"]] = revisions.doc_crud.page_hash(page["content"])
+
+    async def replace_lsh_rows(db, doc):
+        pass
+
+    model = SimpleNamespace(embed_documents=lambda texts: [[0.0] for _ in texts])
+    monkeypatch.setattr(revisions, "get_token_counter", lambda: (count_tokens, MAX_TOKENS))
+    monkeypatch.setattr(revisions, "get_embedding_model", lambda: model)
+    monkeypatch.setattr(revisions, "scroll_document_points", index.scroll)
+    monkeypatch.setattr(revisions, "upsert_vectors", index.upsert)
+    monkeypatch.setattr(revisions, "set_payloads", index.set_payloads)
+    monkeypatch.setattr(revisions, "delete_points", index.delete)
+    for name, stub in [
+        ("lock_document", lock_document),
+        ("get_revisions", get_revisions),
+        ("get_page_hashes", get_page_hashes),
+        ("replace_pages", replace_pages),
+        ("replace_lsh_rows", replace_lsh_rows),
+    ]:
+        monkeypatch.setattr(revisions.doc_crud, name, stub)
+
+    def apply(lines):
+        path = tmp_path / f"{uuid.uuid4().hex}.txt"
+        path.write_text("\n".join(lines), encoding="utf-8")
+        upload = {
+            "filename": "notes.txt",
+            "content_type": "text/plain",
+            "path": str(path),
+            "size": path.stat().st_size,
+            "content_hash": uuid.uuid4().hex,
+            "minio_uri": f"documents/{path.name}",
+        }
+        return asyncio.run(apply_revision(db, doc.id, upload))
+
+    return SimpleNamespace(apply=apply, index=index, db=db, log=log, tmp_path=tmp_path)
+
+
+def expected_chunks(lines, tmp_path):
+    path = tmp_path / "expected.txt"
+    path.write_text("\n".join(lines), encoding="utf-8")
+    return chunk_pages(extract_content(str(path))["pages"], count_tokens, MAX_TOKENS)
+
+
+def by_index(index):
+    return sorted(index.points.items(), key=lambda item: item[1]["chunk_index"])
+
+
+def test_revision_reuses_unchanged_chunks(env):
+    first = env.apply(LINES)
+    assert first["changes"]["chunksReused"] == 0
+    before = dict(env.index.points)
+
+    edited = LINES[:150] + ["an inserted line"] + LINES[150:]
+    env.log.clear()
+    result = env.apply(edited)
+    changes = result["changes"]
+    chunks = expected_chunks(edited, env.tmp_path)
+
+    # The index holds exactly the new revision's chunks, one per position
+    points = by_index(env.index)
+    assert [p["chunk_index"] for _, p in points] == list(range(len(chunks)))
+    assert [p["text"] for _, p in points] == [c["content"] for c in chunks]
+    assert [p["lines"] for _, p in points] == [c["lines"] for c in chunks]
+
+    # Only the chunks around the edit were embedded again
+    old_texts = {p["text"] for p in before.values()}
+    assert changes["chunksEmbedded"] == sum(c["content"] not in old_texts for c in chunks)
+    assert 0 < changes["chunksEmbedded"] < len(chunks) // 4
+    assert changes["chunksReused"] == len(chunks) - changes["chunksEmbedded"]
+    assert changes["chunksRemoved"] == len(before) - changes["chunksReused"]
+    reused = [point_id for point_id, _ in points if point_id in before]
+    assert len(reused) == changes["chunksReused"]
+    assert result["revision"] == 3
+
+    # Every index update happens under the lock, before the commit
+    assert env.log[0] == "lock" and env.log[-1] == "commit"
+    assert "delete" in env.log and "set_payloads" in env.log
+
+
+def test_failed_revision_undoes_its_index_changes(env):
+    env.apply(LINES)
+    before = {point_id: dict(p) for point_id, p in env.index.points.items()}
+
+    env.db.fail_commit = True
+    with pytest.raises(RuntimeError):
+        env.apply(["a new first line"] + LINES)
+
+    # New vectors are gone and moved chunks are back where they were; only
+    # the stale ones deleted just before the failed commit are missing
+    assert env.index.points.keys() <= before.keys()
+    assert all(env.index.points[i] == before[i] for i in env.index.points)
+    assert len(env.index.points) >= len(before) - 3
+    assert env.log[-3:] == ["rollback", "delete", "set_payloads"]
@@ -0,0 +1,62 @@
+# tests/test_similarity.py
+import random
+
+import pytest
+
+from app.processing.similarity import (
+    NUM_PERM,
+    MinHashBuilder,
+    estimate_jaccard,
+    lsh_buckets,
+    minhash_signature,
+    pages_text,
+    shingles,
+)
+
+random.seed(3)
+VOCABULARY = [f"w{i}" for i in range(300)]
+PAGES = [" ".join(random.choices(VOCABULARY, k=random.randint(0, 60))) for _ in range(20)]
+
+
+def build(pages):
+    builder = MinHashBuilder()
+    for page in pages:
+        builder.update(page)
+    return builder.signature()
+
+
+@pytest.mark.parametrize(
+    "pages",
+    [PAGES, PAGES[:1], ["one two"], ["one", "", "two three"], ["a b c d e f g"]],
+)
+def test_builder_matches_signature(pages):
+    assert build(pages) == minhash_signature(pages_text(pages))
+
+
+def test_signature_of_text_and_shingles():
+    text = pages_text(PAGES)
+    signature = minhash_signature(text)
+    assert len(signature) == NUM_PERM
+    assert signature == minhash_signature(shingles(text))
+
+
+@pytest.mark.parametrize("pages", [[], [""], ["  ", "...", "\n"]])
+def test_no_words_no_signature(pages):
+    assert minhash_signature(pages_text(pages)) == []
+    assert build(pages) == []
+    assert lsh_buckets([]) == []
+
+
+def test_estimate_jaccard():
+    a = minhash_signature(pages_text(PAGES))
+    b = minhash_signature(pages_text(PAGES[:10]))
+    assert estimate_jaccard(a, a) == 1.0
+    assert 0.0 < estimate_jaccard(a, b) < 1.0
+    with pytest.raises(ValueError):
+        estimate_jaccard(a, [])
+
+
+def test_similar_documents_share_buckets():
+    a = minhash_signature(pages_text(PAGES))
+    b = minhash_signature(pages_text(PAGES[:-1]))
+    assert set(lsh_buckets(a)) & set(lsh_buckets(b))
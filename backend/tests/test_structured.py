@@ -0,0 +1,81 @@
+# tests/test_structured.py
+import io
+import json
+
+import pytest
+
+from app.processing import structured
+from app.processing.structured import iter_csv_records, iter_json_records
+
+
+class SplitReader(io.StringIO):
+    """A text stream whose first read stops at `split`, wherever that falls."""
+
+    def __init__(self, text: str, split: int):
+        super().__init__(text)
+        self.split = split
+
+    def read(self, size=-1):
+        position = self.tell()
+        if position < self.split:
+            size = self.split - position if size < 0 else min(size, self.split - position)
+        return super().read(size)
+
+
+DOCUMENT = json.dumps(
+    {
+        "meta": {"name": "export", "version": 3, "ratio": 0.25, "ok": True, "gap": None},
+        "items": [1.5, -2e-3, 3e10, 12345, -0.0, "text, with \"quotes\"", False, None],
+        "rows": [{"id": 7, "score": 98.125}, [1, 2.75e-8], {"deep": {"x": {"y": 1}}}],
+    }
+) + "  \n"
+
+
+def test_json_same_records_at_every_split(monkeypatch):
+    monkeypatch.setattr(structured, "READ_SIZE", 8)
+    expected = list(iter_json_records(io.StringIO(DOCUMENT)))
+    for split in range(len(DOCUMENT) + 1):
+        assert list(iter_json_records(SplitReader(DOCUMENT, split))) == expected, split
+
+
+def test_json_numbers_are_not_truncated(monkeypatch):
+    monkeypatch.setattr(structured, "READ_SIZE", 8)
+    numbers = [1.5, -2e-3, 3e10, 12345, 6.02214076e23, -17.25]
+    text = json.dumps(numbers)
+    for split in range(len(text) + 1):
+        records = list(iter_json_records(SplitReader(text, split)))
+        assert [json.loads(r[2]) for r in records] == numbers, split
+
+
+def test_json_records():
+    records = list(iter_json_records(io.StringIO('{"a": 1, "data": {"items": [{"x": 1}, 2]}}')))
+    assert records == [
+        ("$", 0, '"a": 1'),
+        ("$.data.items", 0, '{"x": 1}'),
+        ("$.data.items", 1, "2"),
+    ]
+
+
+@pytest.mark.parametrize("text", ["", "   ", "[1, 2", '{"a" 1}', "[1] 2", "[1.]"])
+def test_json_invalid(text):
+    with pytest.raises(ValueError):
+        list(iter_json_records(io.StringIO(text)))
+
+
+def test_json_empty_containers():
+    assert list(iter_json_records(io.StringIO("[]"))) == []
+    assert list(iter_json_records(io.StringIO("{}"))) == []
+
+
+def test_csv_records():
+    text = 'a,b\r\n1,"x\ny"\r\n\r\n2,z\r\n'
+    assert list(iter_csv_records(io.StringIO(text, newline=""))) == [
+        ("a,b", 1, "1,x y"),
+        ("a,b", 2, ""),
+        ("a,b", 3, "2,z"),
+    ]
+
+
+def test_csv_header_only_and_empty():
+    assert list(iter_csv_records(io.StringIO("a,b\n"))) == [("a,b", 0, "")]
+    assert list(iter_csv_records(io.StringIO(""))) == []